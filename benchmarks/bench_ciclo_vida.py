@@ -0,0 +1,89 @@
+# benchmarks/bench_ciclo_vida.py
+"""
+Compara la latencia por update entre el modo anterior (una Application y un
+ciclo de eventos nuevos por cada webhook) y el modo persistente de BotRuntime.
+
+La API de Telegram se sustituye por un servidor HTTP local con latencia
+inyectada, así que no hace falta red ni un token real.
+
+Uso:
+    python -m benchmarks.bench_ciclo_vida --updates 200 --latencia-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.falsos import telegram_falso
+
+def _update(i: int) -> dict:
+    return {
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Bench"},
+            "text": "hola",
+        },
+    }
+
+def _resumen(nombre: str, tiempos: list) -> dict:
+    ms = sorted(t * 1000 for t in tiempos)
+    return {
+        "modo": nombre,
+        "updates": len(ms),
+        "p50_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(ms[int(len(ms) * 0.95) - 1], 2),
+        "media_ms": round(statistics.fmean(ms), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=100)
+    parser.add_argument('--latencia-ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    servidor = telegram_falso(args.latencia_ms / 1000)
+
+    os.environ.setdefault("TELEGRAM_TOKEN", "123:bench")
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "bench")
+    os.environ["TELEGRAM_API_URL"] = f"{servidor.url}/bot"
+    # Todos los updates van al mismo chat: con límites se mediría el ritmo por chat y no el ciclo de vida
+    os.environ["ENVIOS_LIMITAR"] = "0"
+
+    from src.main import BotRuntime, build_application, process_update_async
+
+    async def por_update(update_data):
+        # Reproduce el flujo previo: App nueva + initialize/shutdown por update
+        bot_app = build_application()
+        async with bot_app:
+            await process_update_async(bot_app, update_data)
+
+    resultados = []
+
+    tiempos = []
+    for i in range(args.updates):
+        t0 = time.perf_counter()
+        asyncio.run(por_update(_update(i)))
+        tiempos.append(time.perf_counter() - t0)
+    resultados.append(_resumen("por_update", tiempos))
+
+    runtime = BotRuntime()
+    runtime.iniciar()
+    tiempos = []
+    for i in range(args.updates):
+        t0 = time.perf_counter()
+        runtime.procesar(_update(i))
+        tiempos.append(time.perf_counter() - t0)
+    runtime.detener()
+    resultados.append(_resumen("persistente", tiempos))
+
+    servidor.shutdown()
+    print(json.dumps({"latencia_api_ms": args.latencia_ms, "resultados": resultados}, indent=2))
+
+if __name__ == '__main__':
+    main()
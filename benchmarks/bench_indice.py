@@ -0,0 +1,119 @@
+# benchmarks/bench_indice.py
+"""
+Memoria y latencia del índice de nombres de subtemas (src/indice.py) con un temario
+sintético: tiempo de carga, memoria retenida, búsqueda exacta (con mayúsculas,
+acentos y espacios cambiados), sugerencias para nombres con errores, autocompletado
+del modo inline (prefijos de 3 a 12 letras) y altas/bajas.
+
+Uso:
+    python -m benchmarks.bench_indice --subtemas 50000 --consultas 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from src.indice import IndiceNombres
+
+PALABRAS = (
+    "análisis álgebra cálculo integral derivadas límites series matrices vectores espacios "
+    "probabilidad estadística teorema función ecuación diferencial lineal numérico método "
+    "transformada fourier laplace óptica mecánica cuántica termodinámica circuitos señales "
+    "sistemas control redes grafos árboles algoritmos complejidad memoria procesos química "
+    "orgánica enlaces reacciones equilibrio cinética biología célula genética evolución"
+).split()
+
+def _temario(n: int, rng: random.Random) -> list:
+    filas, vistos = [], set()
+    while len(filas) < n:
+        subtema = " ".join(rng.sample(PALABRAS, rng.randint(2, 4))).capitalize() + f" {rng.randint(1, 99)}"
+        if subtema in vistos:
+            continue
+        vistos.add(subtema)
+        i = len(filas)
+        filas.append((f"Materia {i % 40}", f"Tema {i % 400}", subtema, "repasar" if i % 3 == 0 else "pendiente"))
+    return filas
+
+def _con_error(nombre: str, rng: random.Random) -> str:
+    # Una letra cambiada o borrada, como un error de dedo
+    i = rng.randrange(len(nombre))
+    if rng.random() < 0.5:
+        return nombre[:i] + nombre[i + 1:]
+    return nombre[:i] + rng.choice("aeiourstn") + nombre[i + 1:]
+
+def _alterado(nombre: str) -> str:
+    sin_acentos = nombre.translate(str.maketrans("áéíóú", "aeiou"))
+    return "  " + sin_acentos.upper().replace(" ", "   ") + " "
+
+def _tiempos(nombre: str, fn, entradas: list) -> dict:
+    ms = []
+    for e in entradas:
+        t0 = time.perf_counter()
+        fn(e)
+        ms.append((time.perf_counter() - t0) * 1000)
+    ms.sort()
+    return {
+        "operacion": nombre,
+        "n": len(ms),
+        "p50_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[int(len(ms) * 0.95) - 1], 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subtemas', type=int, default=50000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--semilla', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    filas = _temario(args.subtemas, rng)
+
+    t0 = time.perf_counter()
+    indice = IndiceNombres()
+    indice.cargar(filas)
+    carga_s = time.perf_counter() - t0
+
+    # La memoria se mide en una segunda carga: tracemalloc frena mucho las altas
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    copia = IndiceNombres()
+    copia.cargar(filas)
+    memoria = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    del copia
+
+    muestra = [rng.choice(filas)[2] for _ in range(args.consultas)]
+    errores = [_con_error(s, rng) for s in muestra]
+    encontrados = sum(indice.buscar(_alterado(s)) == s for s in muestra)
+    acertadas = sum(s in indice.sugerir(e) for s, e in zip(muestra, errores))
+    # Lo que alguien llevaría escrito: el inicio del nombre o de una de sus palabras
+    prefijos = []
+    for s in muestra:
+        palabra = rng.choice(range(len(s.split())))
+        prefijos.append(" ".join(s.split()[palabra:])[:rng.randint(3, 12)])
+
+    nuevas = [(f"Materia {i}", "Tema nuevo", f"Subtema nuevo {i}", "pendiente") for i in range(args.consultas)]
+    resultados = [
+        _tiempos("buscar_exacto", lambda s: indice.buscar(_alterado(s)), muestra),
+        _tiempos("sugerir_con_error", indice.sugerir, errores),
+        _tiempos("completar_prefijo", indice.completar, prefijos),
+        _tiempos("agregar", lambda f: indice.agregar(*f), nuevas),
+        _tiempos("quitar", lambda f: indice.quitar(f[:3]), nuevas),
+    ]
+
+    print(json.dumps({
+        **indice.estadisticas(),
+        "carga_s": round(carga_s, 3),
+        "memoria_mb": round(memoria / 2 ** 20, 2),
+        "bytes_por_subtema": round(memoria / len(filas)),
+        "exactos_encontrados": f"{encontrados}/{len(muestra)}",
+        "sugerencia_correcta_top3": f"{acertadas}/{len(errores)}",
+        "resultados": resultados,
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/bench_webhook.py
+"""
+Benchmark de punta a punta de la ruta /webhook: genera Updates sintéticos para cada
+comando registrado y los reproduce contra la app de Flask. La Bot API y Supabase se
+sustituyen por servidores locales con latencia inyectada (benchmarks/falsos.py).
+
+Por escenario reporta p50/p95/p99, throughput y llamadas salientes por update
+(Telegram y Supabase), y guarda todo en JSON para comparar entre commits.
+
+Uso:
+    python -m benchmarks.bench_webhook --updates 50 --latencia-telegram-ms 20 --latencia-supabase-ms 10
+    python -m benchmarks.bench_webhook --comparar benchmarks/resultados/webhook-abc1234.json
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.falsos import supabase_falso, telegram_falso
+
+MATERIAS = 5
+
+def _update(i: int, texto: str, chat_id: int = 1) -> dict:
+    mensaje = {
+        "message_id": i,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+        "text": texto,
+    }
+    if texto.startswith('/'):
+        comando = texto.split()[0]
+        mensaje["entities"] = [{"type": "bot_command", "offset": 0, "length": len(comando)}]
+    return {"update_id": i, "message": mensaje}
+
+def _temario(i: int, lineas: int) -> str:
+    return "/agregar_temas\n" + "\n".join(
+        f"Bench{i % MATERIAS}/Tema{j // 20}/S{i}-{j}" for j in range(lineas)
+    )
+
+def escenarios(lineas_temario: int):
+    """(nombre, texto del update i). El orden importa: agregar_temas siembra los datos."""
+    return [
+        ("start", lambda i: "/start"),
+        ("agregar_temas", lambda i: _temario(i, lineas_temario)),
+        ("materias", lambda i: "/materias"),
+        ("temario", lambda i: f"/temario Bench{i % MATERIAS}"),
+        ("temasFaltantes", lambda i: "/temasFaltantes"),
+        ("materias_metricas", lambda i: "/materias_metricas"),
+        ("estudiar_temas", lambda i: f"/estudiar_temas Bench{i % MATERIAS} 5"),
+        ("estudiar", lambda i: f"/estudiar S{i}-0, S{i}-1, s{i}-2, NoExiste{i}"),
+        ("repasar", lambda i: "/repasar"),
+        ("ver_calendario", lambda i: "/ver_calendario"),
+        ("dominado", lambda i: f"/dominado S{i}-3, S{i}-4"),
+        ("eliminar", lambda i: f'/eliminar subtema "S{i}-5"'),
+        ("texto", lambda i: "hola"),
+    ]
+
+def _percentil(ms: list, q: float) -> float:
+    return ms[max(math.ceil(q * len(ms)) - 1, 0)]
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+def correr_escenario(cliente, nombre, texto, updates, hilos, base_id, telegram, supabase) -> dict:
+    telegram.reiniciar()
+    supabase.reiniciar()
+
+    def enviar(i):
+        t0 = time.perf_counter()
+        r = cliente.post('/webhook', json=_update(base_id + i, texto(i)))
+        return time.perf_counter() - t0, r.status_code
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        medidas = list(ejecutor.map(enviar, range(updates)))
+    total = time.perf_counter() - inicio
+
+    errores = sum(1 for _, estado in medidas if estado != 200)
+    ms = sorted(t * 1000 for t, _ in medidas)
+    return {
+        "escenario": nombre,
+        "updates": updates,
+        "errores_http": errores,
+        "p50_ms": round(_percentil(ms, 0.50), 2),
+        "p95_ms": round(_percentil(ms, 0.95), 2),
+        "p99_ms": round(_percentil(ms, 0.99), 2),
+        "media_ms": round(statistics.fmean(ms), 2),
+        "updates_por_s": round(updates / total, 2),
+        "telegram_por_update": round(telegram.total() / updates, 2),
+        "supabase_por_update": round(supabase.total() / updates, 2),
+        "supabase_detalle": dict(sorted(supabase.llamadas.items())),
+    }
+
+def comparar(actual: dict, base: dict) -> None:
+    previos = {e["escenario"]: e for e in base["escenarios"]}
+    print(f"\nComparación contra {base.get('commit', '?')}:")
+    print(f"{'escenario':<20}{'p50 ms':>18}{'p95 ms':>18}{'supabase/upd':>18}")
+    for e in actual["escenarios"]:
+        p = previos.get(e["escenario"])
+        if not p:
+            continue
+        celdas = [
+            f"{p[k]:>7} → {e[k]:<7}" for k in ("p50_ms", "p95_ms", "supabase_por_update")
+        ]
+        print(f"{e['escenario']:<20}" + "".join(f"{c:>18}" for c in celdas))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=50, help="Updates por escenario")
+    parser.add_argument('--hilos', type=int, default=1, help="Peticiones concurrentes al webhook")
+    parser.add_argument('--lineas-temario', type=int, default=500, help="Líneas por /agregar_temas")
+    parser.add_argument('--latencia-telegram-ms', type=float, default=20.0)
+    parser.add_argument('--latencia-supabase-ms', type=float, default=10.0)
+    parser.add_argument('--sin-cache', action='store_true', help="Desactiva las cachés de lectura (TTL 0)")
+    parser.add_argument('--con-limites', action='store_true',
+                        help="Aplica los límites de envío de Telegram (todos los updates van al mismo chat)")
+    parser.add_argument('--salida', help="Archivo JSON (por defecto benchmarks/resultados/webhook-<commit>.json)")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para mostrar la diferencia")
+    args = parser.parse_args()
+
+    telegram = telegram_falso(args.latencia_telegram_ms / 1000)
+    supabase = supabase_falso(args.latencia_supabase_ms / 1000)
+
+    os.environ["TELEGRAM_TOKEN"] = "123:bench"
+    os.environ["TELEGRAM_API_URL"] = f"{telegram.url}/bot"
+    os.environ["SUPABASE_URL"] = supabase.url
+    os.environ["SUPABASE_KEY"] = "bench"
+    os.environ["DB_BACKEND"] = "supabase"
+    os.environ["ESPEJO_LOCAL"] = "0"
+    if args.sin_cache:
+        os.environ["CACHE_TTL"] = "0"
+    # Sin límites se mide el bot y no el ritmo de 1 mensaje/s por chat que impone Telegram
+    os.environ["ENVIOS_LIMITAR"] = "1" if args.con_limites else "0"
+
+    from src.main import flask_app, runtime
+
+    runtime.iniciar()
+    cliente = flask_app.test_client()
+    resultados = []
+    try:
+        for n, (nombre, texto) in enumerate(escenarios(args.lineas_temario)):
+            resultado = correr_escenario(cliente, nombre, texto, args.updates, args.hilos,
+                                         n * args.updates, telegram, supabase)
+            resultados.append(resultado)
+            print(f"{nombre:<20} p50 {resultado['p50_ms']:>8} ms  p95 {resultado['p95_ms']:>8} ms  "
+                  f"{resultado['updates_por_s']:>7} upd/s  supabase/upd {resultado['supabase_por_update']}")
+    finally:
+        runtime.detener()
+        telegram.shutdown()
+        supabase.shutdown()
+
+    commit = _commit()
+    informe = {
+        "commit": commit,
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "parametros": vars(args),
+        "escenarios": resultados,
+    }
+    salida = Path(args.salida or f"benchmarks/resultados/webhook-{commit}.json")
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps(informe, indent=2, ensure_ascii=False))
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        comparar(informe, json.loads(Path(args.comparar).read_text()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# benchmarks/falsos.py
+"""
+Servidores HTTP locales que sustituyen a la Bot API de Telegram y a Supabase
+(el subconjunto de PostgREST que usa src/database.py) en los benchmarks.
+Ambos inyectan una latencia fija por petición y cuentan las llamadas recibidas.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from src.sqlite_backend import SQLiteDatabaseManager
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latencia: float):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latencia = latencia
+        self.llamadas: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def contar(self, clave: str) -> None:
+        with self._lock:
+            self.llamadas[clave] = self.llamadas.get(clave, 0) + 1
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.llamadas.values())
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self.llamadas.clear()
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Sin Nagle: cabeceras y cuerpo van en escrituras separadas y el ACK diferido sumaría ~40 ms
+    disable_nagle_algorithm = True
+
+    def _cuerpo(self) -> Any:
+        datos = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        tipo = self.headers.get('Content-Type', '')
+        if not datos:
+            return None
+        if tipo.startswith('application/json'):
+            return json.loads(datos)
+        if tipo.startswith('application/x-www-form-urlencoded'):
+            return dict(parse_qsl(datos.decode()))
+        return None
+
+    def _responder(self, estado: int, datos: Any) -> None:
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+class _Telegram(_Manejador):
+    _siguiente_id = 0
+
+    def do_POST(self):
+        metodo = self.path.rsplit('/', 1)[-1]
+        self.server.contar(metodo)
+        datos = self._cuerpo() or {}
+        time.sleep(self.server.latencia)
+
+        if metodo == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif metodo in ('deleteMessage', 'answerCallbackQuery', 'answerInlineQuery', 'setMyCommands'):
+            result = True
+        else:
+            _Telegram._siguiente_id += 1
+            chat = {"id": int(datos.get("chat_id", 1)), "type": "private"}
+            result = {"message_id": _Telegram._siguiente_id, "date": int(time.time()), "chat": chat,
+                      "text": datos.get("text", "")}
+        self._responder(200, {"ok": True, "result": result})
+
+def telegram_falso(latencia: float) -> ServidorFalso:
+    """Bot API falsa; la URL para TELEGRAM_API_URL es f'{servidor.url}/bot'."""
+    return ServidorFalso(_Telegram, latencia)
+
+# --- PostgREST sobre SQLite ---
+_COLUMNA = re.compile(r'^\w+$')
+_OPERADORES = {"eq": "=", "neq": "<>", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+_ESPECIALES = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+def _columna(nombre: str) -> str:
+    nombre = nombre.strip()
+    if not _COLUMNA.match(nombre):
+        raise ValueError(f"columna inválida: {nombre}")
+    return nombre
+
+def _lista_in(valor: str) -> List[str]:
+    """'(a,"b,c",d)' -> ['a', 'b,c', 'd'] con las comillas de postgrest-py."""
+    return [a or b for a, b in re.findall(r'"((?:[^"\\]|\\.)*)"|([^,]+)', valor[1:-1])]
+
+def _filtros(params: List[Tuple[str, str]]) -> Tuple[str, List[Any]]:
+    condiciones, valores = [], []
+    for clave, valor in params:
+        if clave in _ESPECIALES:
+            continue
+        col = _columna(clave)
+        op, arg = valor.split('.', 1)
+        if op in _OPERADORES:
+            condiciones.append(f"{col} {_OPERADORES[op]} ?")
+            valores.append(arg)
+        elif op == 'ilike':
+            condiciones.append(f"ilike(?, {col})")
+            valores.append(arg.replace('*', '%'))
+        elif op == 'in':
+            items = _lista_in(arg)
+            condiciones.append(f"{col} in ({', '.join('?' * len(items))})" if items else "0")
+            valores += items
+        elif op == 'is' and arg == 'null':
+            condiciones.append(f"{col} is null")
+        else:
+            raise ValueError(f"operador no soportado: {op}")
+    return (" where " + " and ".join(condiciones)) if condiciones else "", valores
+
+def _select(params: Dict[str, str]) -> str:
+    columnas = params.get("select", "*")
+    return "*" if columnas.strip() == "*" else ", ".join(_columna(c) for c in columnas.split(','))
+
+def _order_limit(params: Dict[str, str]) -> str:
+    sql = ""
+    if "order" in params:
+        partes = []
+        for termino in params["order"].split(','):
+            col, _, sentido = termino.partition('.')
+            partes.append(f"{_columna(col)} {'desc' if sentido.startswith('desc') else 'asc'}")
+        sql += " order by " + ", ".join(partes)
+    if "limit" in params:
+        sql += f" limit {int(params['limit'])}"
+        if "offset" in params:
+            sql += f" offset {int(params['offset'])}"
+    return sql
+
+class _Supabase(_Manejador):
+    def _ruta(self) -> Tuple[str, List[Tuple[str, str]]]:
+        partes = urlsplit(self.path)
+        return partes.path.removeprefix('/rest/v1/'), parse_qsl(partes.query, keep_blank_values=True)
+
+    def _atender(self, metodo: str) -> None:
+        recurso, lista = self._ruta()
+        self.server.contar(f"{metodo} {recurso}")
+        cuerpo = self._cuerpo()
+        time.sleep(self.server.latencia)
+        try:
+            if recurso.startswith('rpc/'):
+                datos = self._rpc(recurso[4:], cuerpo or {})
+            else:
+                datos = self._tabla(metodo, _columna(recurso), lista, cuerpo)
+        except Exception as e:
+            self._responder(400, {"message": str(e), "code": "BENCH", "hint": None, "details": None})
+            return
+        self._responder(200, datos)
+
+    def _rpc(self, funcion: str, p: Dict[str, Any]) -> Any:
+        db: SQLiteDatabaseManager = self.server.db
+        if funcion == 'procesar_estudio':
+            return db.procesar_estudio(p["p_subtema"], p["p_hoy"])
+        if funcion == 'procesar_estudio_lote':
+            return db.procesar_estudio_lote(p["p_subtemas"], p["p_hoy"])
+        if funcion == 'compactar_historial':
+            return db.compactar_historial(p.get("p_dias_detalle", 90), p.get("p_simular", True))
+        if funcion == 'reconciliar_progreso':
+            return db.reconciliar_progreso(p.get("p_aplicar", True))
+        raise ValueError(f"rpc desconocida: {funcion}")
+
+    def _tabla(self, metodo: str, tabla: str, lista: List[Tuple[str, str]], cuerpo: Any) -> List[Dict[str, Any]]:
+        db: SQLiteDatabaseManager = self.server.db
+        params = dict(lista)
+        donde, valores = _filtros(lista)
+
+        if metodo == 'GET':
+            return db._leer(f"select {_select(params)} from {tabla}{donde}{_order_limit(params)}", valores)
+
+        with db._transaccion() as conn:
+            if metodo == 'DELETE':
+                return [dict(r) for r in conn.execute(f"delete from {tabla}{donde} returning *", valores)]
+            if metodo == 'PATCH':
+                columnas = [_columna(c) for c in cuerpo]
+                asignaciones = ", ".join(f"{c} = ?" for c in columnas)
+                return [dict(r) for r in conn.execute(
+                    f"update {tabla} set {asignaciones}{donde} returning *", [cuerpo[c] for c in columnas] + valores
+                )]
+
+            # POST: insert / upsert
+            filas = cuerpo if isinstance(cuerpo, list) else [cuerpo]
+            sufijo = ""
+            if "on_conflict" in params and "resolution=ignore-duplicates" in self.headers.get('Prefer', ''):
+                conflicto = ", ".join(_columna(c) for c in params["on_conflict"].split(','))
+                sufijo = f" on conflict ({conflicto}) do nothing"
+            insertadas = []
+            for f in filas:
+                columnas = [_columna(c) for c in f]
+                insertadas += [dict(r) for r in conn.execute(
+                    f"insert into {tabla} ({', '.join(columnas)}) values ({', '.join('?' * len(columnas))})"
+                    f"{sufijo} returning *",
+                    [f[c] for c in columnas],
+                )]
+            return insertadas
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def do_PATCH(self):
+        self._atender('PATCH')
+
+    def do_DELETE(self):
+        self._atender('DELETE')
+
+def supabase_falso(latencia: float) -> ServidorFalso:
+    """PostgREST falso respaldado por SQLiteDatabaseManager en memoria (mismo esquema y RPCs)."""
+    servidor = ServidorFalso(_Supabase, latencia)
+    servidor.db = SQLiteDatabaseManager(":memory:")
+    return servidor
@@ -0,0 +1,12 @@
+-- sql/000_estudios.sql
+-- Esquema base de la tabla única que usa el bot (referencia para las migraciones siguientes).
+
+create table if not exists estudios (
+    id             bigint generated by default as identity primary key,
+    tipo           text not null check (tipo in ('pendiente', 'repasar', 'estudiado', 'dominado')),
+    materia        text not null,
+    tema           text not null,
+    subtema        text not null,
+    fecha          date,
+    repasos_count  integer default 0
+);
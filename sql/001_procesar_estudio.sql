@@ -0,0 +1,64 @@
+-- sql/001_procesar_estudio.sql
+-- Transición pendiente->repasar / repasar->repasar en una sola llamada y una sola transacción.
+-- Equivalente en proceso: SQLiteDatabaseManager.procesar_estudio (src/sqlite_backend.py).
+
+create or replace function procesar_estudio(p_subtema text, p_hoy date default current_date)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_anterior estudios%rowtype;
+    v_nuevo    estudios%rowtype;
+    v_count    integer;
+begin
+    -- 1. Repasos activos primero, igual que el flujo original
+    select * into v_anterior
+      from estudios
+     where tipo = 'repasar' and subtema ilike p_subtema
+     order by id
+     limit 1
+       for update;
+
+    -- 2. Después pendientes
+    if not found then
+        select * into v_anterior
+          from estudios
+         where tipo = 'pendiente' and subtema ilike p_subtema
+         order by id
+         limit 1
+           for update;
+    end if;
+
+    if not found then
+        return null;
+    end if;
+
+    insert into estudios (tipo, materia, tema, subtema, fecha)
+    values ('estudiado', v_anterior.materia, v_anterior.tema, v_anterior.subtema, p_hoy);
+
+    delete from estudios where id = v_anterior.id;
+
+    if v_anterior.tipo = 'pendiente' then
+        insert into estudios (tipo, materia, tema, subtema, fecha, repasos_count)
+        values ('repasar', v_anterior.materia, v_anterior.tema, v_anterior.subtema, p_hoy + 1, 1)
+        returning * into v_nuevo;
+    else
+        v_count := coalesce(v_anterior.repasos_count, 0);
+        -- Mismos intervalos que SQLiteDatabaseManager.procesar_estudio_lote
+        if v_count < 4 then
+            insert into estudios (tipo, materia, tema, subtema, fecha, repasos_count)
+            values (
+                'repasar', v_anterior.materia, v_anterior.tema, v_anterior.subtema,
+                p_hoy + case v_count when 1 then 3 when 2 then 7 else 30 end,
+                v_count + 1
+            )
+            returning * into v_nuevo;
+        end if;
+    end if;
+
+    return jsonb_build_object(
+        'anterior', to_jsonb(v_anterior),
+        'nuevo', case when v_nuevo.id is null then null else to_jsonb(v_nuevo) end
+    );
+end;
+$$;
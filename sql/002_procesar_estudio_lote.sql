@@ -0,0 +1,69 @@
+-- sql/002_procesar_estudio_lote.sql
+-- Versión por lotes de procesar_estudio: una búsqueda ilike para todos los nombres,
+-- un borrado y dos inserciones masivas, todo en la misma transacción.
+-- Equivalente en proceso: SQLiteDatabaseManager.procesar_estudio_lote (src/sqlite_backend.py).
+
+create or replace function procesar_estudio_lote(p_subtemas text[], p_hoy date default current_date)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_resultado jsonb;
+begin
+    -- Bloquea de una vez todas las filas candidatas
+    perform 1
+       from estudios
+      where tipo in ('repasar', 'pendiente') and subtema ilike any (p_subtemas)
+        for update;
+
+    with entrada as (
+        select u.subtema_input, u.ord
+          from unnest(p_subtemas) with ordinality as u(subtema_input, ord)
+    ),
+    elegidos as (
+        -- Por cada nombre: primero repasos activos, luego pendientes
+        select distinct on (en.ord) en.ord, e.id
+          from entrada en
+          join estudios e
+            on e.tipo in ('repasar', 'pendiente') and e.subtema ilike en.subtema_input
+         order by en.ord, (e.tipo <> 'repasar'), e.id
+    ),
+    anteriores as (
+        select e.* from estudios e where e.id in (select id from elegidos)
+    ),
+    borrados as (
+        delete from estudios e where e.id in (select id from anteriores)
+    ),
+    logs as (
+        insert into estudios (tipo, materia, tema, subtema, fecha)
+        select 'estudiado', a.materia, a.tema, a.subtema, p_hoy from anteriores a
+    ),
+    nuevos as (
+        -- Mismos intervalos que SQLiteDatabaseManager.procesar_estudio_lote
+        insert into estudios (tipo, materia, tema, subtema, fecha, repasos_count)
+        select 'repasar', a.materia, a.tema, a.subtema,
+               p_hoy + case
+                   when a.tipo = 'pendiente' then 1
+                   when coalesce(a.repasos_count, 0) = 1 then 3
+                   when coalesce(a.repasos_count, 0) = 2 then 7
+                   else 30
+               end,
+               case when a.tipo = 'pendiente' then 1 else coalesce(a.repasos_count, 0) + 1 end
+          from anteriores a
+         where a.tipo = 'pendiente' or coalesce(a.repasos_count, 0) < 4
+        returning *
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'subtema', en.subtema_input,
+               'anterior', to_jsonb(a),
+               'nuevo', to_jsonb(n)
+           ) order by en.ord), '[]'::jsonb)
+      into v_resultado
+      from entrada en
+      left join elegidos el on el.ord = en.ord
+      left join anteriores a on a.id = el.id
+      left join nuevos n on (n.materia, n.tema, n.subtema) = (a.materia, a.tema, a.subtema);
+
+    return v_resultado;
+end;
+$$;
@@ -0,0 +1,8 @@
+-- sql/003_estudios_conteos.sql
+-- Conteos agregados por (materia, tipo): las métricas solo descargan estos números,
+-- no cada fila de la tabla.
+
+create or replace view estudios_conteos as
+select materia, tipo, count(*)::integer as total
+  from estudios
+ group by materia, tipo;
@@ -0,0 +1,87 @@
+-- sql/004_progreso.sql
+-- Contadores de progreso por (materia, tipo) mantenidos de forma incremental.
+-- Los triggers por sentencia cubren todas las escrituras (agregar_temas, procesar_estudio,
+-- marcar_dominados, eliminar_por_campo...) sin que el bot tenga que recordarlo.
+
+create table if not exists progreso (
+    materia  text    not null,
+    tipo     text    not null,
+    total    integer not null default 0,
+    primary key (materia, tipo)
+);
+
+create or replace function _progreso_aplicar_delta()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('INSERT', 'UPDATE') then
+        insert into progreso (materia, tipo, total)
+        select n.materia, n.tipo, count(*) from nuevas n group by n.materia, n.tipo
+        on conflict (materia, tipo) do update set total = progreso.total + excluded.total;
+    end if;
+
+    if TG_OP in ('DELETE', 'UPDATE') then
+        update progreso p
+           set total = p.total - v.n
+          from (select materia, tipo, count(*) as n from viejas group by materia, tipo) v
+         where p.materia = v.materia and p.tipo = v.tipo;
+    end if;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists progreso_insert on estudios;
+drop trigger if exists progreso_delete on estudios;
+drop trigger if exists progreso_update on estudios;
+
+create trigger progreso_insert after insert on estudios
+    referencing new table as nuevas
+    for each statement execute function _progreso_aplicar_delta();
+
+create trigger progreso_delete after delete on estudios
+    referencing old table as viejas
+    for each statement execute function _progreso_aplicar_delta();
+
+create trigger progreso_update after update on estudios
+    referencing old table as viejas new table as nuevas
+    for each statement execute function _progreso_aplicar_delta();
+
+-- Recalcula desde la tabla base y devuelve los desvíos encontrados.
+-- Con p_aplicar = false solo informa.
+create or replace function reconciliar_progreso(p_aplicar boolean default true)
+returns table (materia text, tipo text, esperado integer, registrado integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    lock table progreso in share row exclusive mode;
+
+    return query
+    with reales as (
+        select e.materia, e.tipo, count(*)::integer as total
+          from estudios e
+         group by e.materia, e.tipo
+    )
+    select coalesce(r.materia, p.materia), coalesce(r.tipo, p.tipo),
+           coalesce(r.total, 0), coalesce(p.total, 0)
+      from reales r
+      full join progreso p on p.materia = r.materia and p.tipo = r.tipo
+     where coalesce(r.total, 0) <> coalesce(p.total, 0);
+
+    if p_aplicar then
+        delete from progreso;
+        insert into progreso (materia, tipo, total)
+        select e.materia, e.tipo, count(*) from estudios e group by e.materia, e.tipo;
+    end if;
+end;
+$$;
+
+-- Las métricas siguen leyendo estudios_conteos, ahora O(#materias)
+create or replace view estudios_conteos as
+select materia, tipo, total
+  from progreso
+ where total > 0;
+
+select * from reconciliar_progreso(true);
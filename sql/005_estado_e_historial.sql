@@ -0,0 +1,181 @@
+-- sql/005_estado_e_historial.sql
+-- Migración única: separa 'estudios' en
+--   * estudios_estado:    una fila por subtema con su etapa, repasos y próxima fecha
+--   * estudios_historial: log de solo-inserción de cada estudio/repaso
+-- La tabla original se conserva como 'estudios_legado'.
+
+begin;
+
+create table estudios_estado (
+    id             bigint generated by default as identity primary key,
+    tipo           text    not null check (tipo in ('pendiente', 'repasar', 'dominado')),
+    materia        text    not null,
+    tema           text    not null,
+    subtema        text    not null,
+    fecha          date,
+    repasos_count  integer not null default 0,
+    unique (materia, tema, subtema)
+);
+
+create index estudios_estado_tipo_subtema on estudios_estado (tipo, subtema);
+create index estudios_estado_materia on estudios_estado (materia);
+create index estudios_estado_tipo_fecha on estudios_estado (tipo, fecha);
+
+create table estudios_historial (
+    id       bigint generated by default as identity primary key,
+    materia  text not null,
+    tema     text not null,
+    subtema  text not null,
+    fecha    date not null
+);
+
+create index estudios_historial_fecha on estudios_historial (fecha);
+create index estudios_historial_materia on estudios_historial (materia);
+
+-- Estado actual: si hubiera varias filas vivas de un mismo subtema, gana la etapa más avanzada
+insert into estudios_estado (id, tipo, materia, tema, subtema, fecha, repasos_count)
+select distinct on (materia, tema, subtema)
+       id, tipo, materia, tema, subtema, fecha, coalesce(repasos_count, 0)
+  from estudios
+ where tipo in ('pendiente', 'repasar', 'dominado')
+ order by materia, tema, subtema,
+          case tipo when 'dominado' then 0 when 'repasar' then 1 else 2 end,
+          id desc;
+
+insert into estudios_historial (id, materia, tema, subtema, fecha)
+select id, materia, tema, subtema, coalesce(fecha, current_date)
+  from estudios
+ where tipo = 'estudiado';
+
+select setval(pg_get_serial_sequence('estudios_estado', 'id'), coalesce((select max(id) from estudios_estado), 0) + 1, false);
+select setval(pg_get_serial_sequence('estudios_historial', 'id'), coalesce((select max(id) from estudios_historial), 0) + 1, false);
+
+-- La tabla vieja queda como respaldo, sin los triggers de progreso
+drop trigger if exists progreso_insert on estudios;
+drop trigger if exists progreso_delete on estudios;
+drop trigger if exists progreso_update on estudios;
+alter table estudios rename to estudios_legado;
+
+-- Los contadores de progreso ahora siguen al estado (el historial no cuenta como avance)
+create trigger progreso_insert after insert on estudios_estado
+    referencing new table as nuevas
+    for each statement execute function _progreso_aplicar_delta();
+
+create trigger progreso_delete after delete on estudios_estado
+    referencing old table as viejas
+    for each statement execute function _progreso_aplicar_delta();
+
+create trigger progreso_update after update on estudios_estado
+    referencing old table as viejas new table as nuevas
+    for each statement execute function _progreso_aplicar_delta();
+
+create or replace function reconciliar_progreso(p_aplicar boolean default true)
+returns table (materia text, tipo text, esperado integer, registrado integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    lock table progreso in share row exclusive mode;
+
+    return query
+    with reales as (
+        select e.materia, e.tipo, count(*)::integer as total
+          from estudios_estado e
+         group by e.materia, e.tipo
+    )
+    select coalesce(r.materia, p.materia), coalesce(r.tipo, p.tipo),
+           coalesce(r.total, 0), coalesce(p.total, 0)
+      from reales r
+      full join progreso p on p.materia = r.materia and p.tipo = r.tipo
+     where coalesce(r.total, 0) <> coalesce(p.total, 0);
+
+    if p_aplicar then
+        delete from progreso;
+        insert into progreso (materia, tipo, total)
+        select e.materia, e.tipo, count(*) from estudios_estado e group by e.materia, e.tipo;
+    end if;
+end;
+$$;
+
+-- Transiciones de estudio: la fila de estado se actualiza en su lugar y el historial solo crece.
+-- Equivalente en proceso: SQLiteDatabaseManager.procesar_estudio_lote (src/sqlite_backend.py).
+create or replace function procesar_estudio_lote(p_subtemas text[], p_hoy date default current_date)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_resultado jsonb;
+begin
+    -- Bloquea de una vez todas las filas candidatas
+    perform 1
+       from estudios_estado
+      where tipo in ('repasar', 'pendiente') and subtema ilike any (p_subtemas)
+        for update;
+
+    with entrada as (
+        select u.subtema_input, u.ord
+          from unnest(p_subtemas) with ordinality as u(subtema_input, ord)
+    ),
+    elegidos as (
+        -- Por cada nombre: primero repasos activos, luego pendientes
+        select distinct on (en.ord) en.ord, e.id
+          from entrada en
+          join estudios_estado e
+            on e.tipo in ('repasar', 'pendiente') and e.subtema ilike en.subtema_input
+         order by en.ord, (e.tipo <> 'repasar'), e.id
+    ),
+    anteriores as (
+        select e.* from estudios_estado e where e.id in (select id from elegidos)
+    ),
+    logs as (
+        insert into estudios_historial (materia, tema, subtema, fecha)
+        select a.materia, a.tema, a.subtema, p_hoy from anteriores a
+    ),
+    graduados as (
+        -- Repasos que ya cumplieron su ciclo salen del estado, como antes
+        delete from estudios_estado e
+         using anteriores a
+         where e.id = a.id and a.tipo = 'repasar' and a.repasos_count >= 4
+    ),
+    nuevos as (
+        -- Mismos intervalos que SQLiteDatabaseManager.procesar_estudio_lote
+        update estudios_estado e
+           set tipo = 'repasar',
+               fecha = p_hoy + case
+                   when a.tipo = 'pendiente' then 1
+                   when a.repasos_count = 1 then 3
+                   when a.repasos_count = 2 then 7
+                   else 30
+               end,
+               repasos_count = case when a.tipo = 'pendiente' then 1 else a.repasos_count + 1 end
+          from anteriores a
+         where e.id = a.id and (a.tipo = 'pendiente' or a.repasos_count < 4)
+        returning e.*
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'subtema', en.subtema_input,
+               'anterior', to_jsonb(a),
+               'nuevo', to_jsonb(n)
+           ) order by en.ord), '[]'::jsonb)
+      into v_resultado
+      from entrada en
+      left join elegidos el on el.ord = en.ord
+      left join anteriores a on a.id = el.id
+      left join nuevos n on n.id = a.id;
+
+    return v_resultado;
+end;
+$$;
+
+create or replace function procesar_estudio(p_subtema text, p_hoy date default current_date)
+returns jsonb
+language sql
+as $$
+    select case when r -> 'anterior' = 'null'::jsonb then null
+                else jsonb_build_object('anterior', r -> 'anterior', 'nuevo', r -> 'nuevo') end
+      from jsonb_array_elements(procesar_estudio_lote(array[p_subtema], p_hoy)) as r;
+$$;
+
+select * from reconciliar_progreso(true);
+
+commit;
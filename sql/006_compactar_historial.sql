@@ -0,0 +1,57 @@
+-- sql/006_compactar_historial.sql
+-- Compactación del historial: las filas más viejas que el horizonte se resumen por
+-- (día, materia) y se borran; los días recientes conservan todo el detalle.
+
+create table if not exists estudios_historial_resumen (
+    fecha    date    not null,
+    materia  text    not null,
+    total    integer not null,
+    primary key (fecha, materia)
+);
+
+create or replace function compactar_historial(p_dias_detalle integer default 90, p_simular boolean default true)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_corte          date := current_date - p_dias_detalle;
+    v_filas          integer;
+    v_bytes          bigint;
+    v_resumen        integer;
+    v_bytes_resumen  bigint;
+begin
+    select count(*), coalesce(sum(pg_column_size(h.*)), 0)
+      into v_filas, v_bytes
+      from estudios_historial h
+     where h.fecha < v_corte;
+
+    select count(*), coalesce(sum(pg_column_size(r.*)), 0)
+      into v_resumen, v_bytes_resumen
+      from (
+          select h.fecha, h.materia, count(*)::integer as total
+            from estudios_historial h
+           where h.fecha < v_corte
+           group by h.fecha, h.materia
+      ) r;
+
+    if not p_simular then
+        with movidas as (
+            delete from estudios_historial
+             where fecha < v_corte
+            returning fecha, materia
+        )
+        insert into estudios_historial_resumen (fecha, materia, total)
+        select fecha, materia, count(*) from movidas group by fecha, materia
+        on conflict (fecha, materia) do update
+            set total = estudios_historial_resumen.total + excluded.total;
+    end if;
+
+    return jsonb_build_object(
+        'corte', v_corte,
+        'simulado', p_simular,
+        'filas_eliminadas', v_filas,
+        'filas_resumen', v_resumen,
+        'bytes_liberados', greatest(v_bytes - v_bytes_resumen, 0)
+    );
+end;
+$$;
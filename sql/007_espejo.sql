@@ -0,0 +1,83 @@
+-- sql/007_espejo.sql
+-- Soporte para espejos locales con sincronización incremental (src/espejo.py):
+--   * estado y resumen llevan 'actualizado_en', que sube en cada insert/update
+--   * el historial es de solo-inserción: basta con su id como marca de agua
+--   * los borrados dejan una lápida en estudios_borrados (id creciente como marca de agua)
+
+begin;
+
+alter table estudios_estado
+    add column if not exists actualizado_en timestamptz not null default clock_timestamp();
+alter table estudios_historial_resumen
+    add column if not exists actualizado_en timestamptz not null default clock_timestamp();
+
+create index if not exists estudios_estado_actualizado_en on estudios_estado (actualizado_en, id);
+create index if not exists estudios_historial_resumen_actualizado_en on estudios_historial_resumen (actualizado_en);
+
+-- clock_timestamp() y no now(): dentro de una transacción larga now() queda fijo al inicio
+-- y el espejo podría saltarse filas que se confirmaron después de su marca de agua
+create or replace function _tocar_actualizado_en()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.actualizado_en := clock_timestamp();
+    return new;
+end;
+$$;
+
+drop trigger if exists estado_actualizado_en on estudios_estado;
+create trigger estado_actualizado_en before update on estudios_estado
+    for each row execute function _tocar_actualizado_en();
+
+drop trigger if exists resumen_actualizado_en on estudios_historial_resumen;
+create trigger resumen_actualizado_en before update on estudios_historial_resumen
+    for each row execute function _tocar_actualizado_en();
+
+create table if not exists estudios_borrados (
+    id          bigint generated always as identity primary key,
+    tabla       text        not null,
+    fila_id     bigint,
+    fecha       date,
+    materia     text,
+    borrado_en  timestamptz not null default clock_timestamp()
+);
+
+create index if not exists estudios_borrados_borrado_en on estudios_borrados (borrado_en);
+
+create or replace function _registrar_borrados()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_TABLE_NAME = 'estudios_historial_resumen' then
+        insert into estudios_borrados (tabla, fecha, materia)
+        select TG_TABLE_NAME, v.fecha, v.materia from viejas v;
+    else
+        insert into estudios_borrados (tabla, fila_id)
+        select TG_TABLE_NAME, v.id from viejas v;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists estado_borrados on estudios_estado;
+create trigger estado_borrados after delete on estudios_estado
+    referencing old table as viejas
+    for each statement execute function _registrar_borrados();
+
+drop trigger if exists historial_borrados on estudios_historial;
+create trigger historial_borrados after delete on estudios_historial
+    referencing old table as viejas
+    for each statement execute function _registrar_borrados();
+
+drop trigger if exists resumen_borrados on estudios_historial_resumen;
+create trigger resumen_borrados after delete on estudios_historial_resumen
+    referencing old table as viejas
+    for each statement execute function _registrar_borrados();
+
+-- Las lápidas solo le sirven a un espejo que se haya quedado atrás; un espejo nuevo
+-- parte de una carga completa. Purga periódica sugerida:
+--   delete from estudios_borrados where borrado_en < now() - interval '7 days';
+
+commit;
@@ -0,0 +1,18 @@
+-- sql/008_cronograma_ventana.sql
+-- Índices para /ver_calendario por ventana de fechas (obtener_cronograma en src/database.py):
+-- cada fuente se lee con fecha entre desde y hasta, en el mismo orden que usa el
+-- cursor, así una página es un recorrido corto del índice y no un sort del rango.
+--   * resumen: ya sirve su clave primaria (fecha, materia)
+--   * historial: (fecha, id)
+--   * repasos: (tipo, fecha, id), con los repasos sin fecha primero como en la consulta
+
+begin;
+
+create index if not exists estudios_historial_fecha_id on estudios_historial (fecha, id);
+create index if not exists estudios_estado_tipo_fecha_id on estudios_estado (tipo, fecha nulls first, id);
+
+-- Los de 005 quedan cubiertos por los nuevos
+drop index if exists estudios_historial_fecha;
+drop index if exists estudios_estado_tipo_fecha;
+
+commit;
@@ -0,0 +1,14 @@
+-- sql/009_subtema_trigramas.sql
+-- procesar_estudio_lote busca con 'subtema ilike ...', que ningún índice btree atiende:
+-- con un índice GIN de trigramas Postgres resuelve el ilike por índice en vez de
+-- recorrer todo el estado. El bot ya manda el nombre exacto que guarda la tabla
+-- (resuelto en memoria, ver src/indice.py), así que cada búsqueda toca pocas filas.
+
+begin;
+
+create extension if not exists pg_trgm;
+
+create index if not exists estudios_estado_subtema_trgm
+    on estudios_estado using gin (subtema gin_trgm_ops);
+
+commit;
@@ -0,0 +1,77 @@
+-- sql/010_compactar_conserva_graduados.sql
+-- Un subtema que completó su ciclo sale de estudios_estado y solo queda en el historial:
+-- si la compactación borraba todas sus filas, existe_subtema dejaba de verlo y
+-- /agregar_temas lo volvía a dar de alta como pendiente. Ahora se conserva la última
+-- fila de historial de cada subtema que ya no está en el estado.
+
+begin;
+
+create index if not exists estudios_historial_tripleta on estudios_historial (materia, tema, subtema, id);
+
+-- Filas del historial anteriores al corte que se pueden resumir
+create or replace function _historial_compactable(p_corte date)
+returns setof estudios_historial
+language sql
+stable
+as $$
+    select h.*
+      from estudios_historial h
+     where h.fecha < p_corte
+       and (
+           exists (
+               select 1 from estudios_estado e
+                where (e.materia, e.tema, e.subtema) = (h.materia, h.tema, h.subtema)
+           )
+           or exists (
+               select 1 from estudios_historial h2
+                where (h2.materia, h2.tema, h2.subtema) = (h.materia, h.tema, h.subtema) and h2.id > h.id
+           )
+       );
+$$;
+
+create or replace function compactar_historial(p_dias_detalle integer default 90, p_simular boolean default true)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_corte          date := current_date - p_dias_detalle;
+    v_filas          integer;
+    v_bytes          bigint;
+    v_resumen        integer;
+    v_bytes_resumen  bigint;
+begin
+    select count(*), coalesce(sum(pg_column_size(h.*)), 0)
+      into v_filas, v_bytes
+      from _historial_compactable(v_corte) h;
+
+    select count(*), coalesce(sum(pg_column_size(r.*)), 0)
+      into v_resumen, v_bytes_resumen
+      from (
+          select h.fecha, h.materia, count(*)::integer as total
+            from _historial_compactable(v_corte) h
+           group by h.fecha, h.materia
+      ) r;
+
+    if not p_simular then
+        with movidas as (
+            delete from estudios_historial
+             where id in (select id from _historial_compactable(v_corte))
+            returning fecha, materia
+        )
+        insert into estudios_historial_resumen (fecha, materia, total)
+        select fecha, materia, count(*) from movidas group by fecha, materia
+        on conflict (fecha, materia) do update
+            set total = estudios_historial_resumen.total + excluded.total;
+    end if;
+
+    return jsonb_build_object(
+        'corte', v_corte,
+        'simulado', p_simular,
+        'filas_eliminadas', v_filas,
+        'filas_resumen', v_resumen,
+        'bytes_liberados', greatest(v_bytes - v_bytes_resumen, 0)
+    );
+end;
+$$;
+
+commit;
@@ -0,0 +1,117 @@
+# src/almacen.py
+"""
+Piezas comunes a todos los backends de almacenamiento (Supabase, SQLite):
+nombres de tablas, reparto de filas, contador de versión y utilidades de consulta.
+"""
+import asyncio
+import contextvars
+import functools
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .cache import VersionDatos
+
+# Estado actual (una fila por subtema) e historial de solo-inserción
+TABLA_ESTADO = "estudios_estado"
+TABLA_HISTORIAL = "estudios_historial"
+TABLA_RESUMEN = "estudios_historial_resumen"
+TIPO_HISTORIAL = "estudiado"
+
+Triple = Tuple[str, str, str]
+
+# Cursor del calendario: cuántas filas de (resumen, historial, repasos) de la ventana saltar.
+# Cada fuente se ordena por (fecha, clave) y como_cronograma las intercala en ese orden,
+# así que avanzar o retroceder una página es mover estos tres desplazamientos.
+Tramo = Tuple[int, int, int]
+
+# Sube con cada escritura hecha desde este proceso (ver CacheRespuestas)
+version_datos = VersionDatos()
+
+# Escrituras intentadas por el update en curso (ver ColaUpdates): un update que ya pudo
+# escribir no se reintenta. Las tareas y hilos que lanza heredan el contador.
+_escrituras_update: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("escrituras_update", default=None)
+
+def contar_escrituras() -> Tuple[List[int], contextvars.Token]:
+    """Empieza a contar las escrituras del contexto actual; devuelve el contador y el token para reset."""
+    contador = [0]
+    return contador, _escrituras_update.set(contador)
+
+def dejar_de_contar(token: contextvars.Token) -> None:
+    _escrituras_update.reset(token)
+
+def _escribiendo() -> None:
+    contador = _escrituras_update.get()
+    if contador is not None:
+        contador[0] += 1
+
+def escritura(metodo):
+    """
+    Marca un método como escritura: al terminar, con o sin error, sube la versión de datos.
+    Se cuenta como escritura del update en curso desde que empieza, porque aunque falle
+    (p. ej. se corta la red) el servidor pudo haberla confirmado.
+    """
+    if asyncio.iscoroutinefunction(metodo):
+        @functools.wraps(metodo)
+        async def envoltura_async(*args, **kwargs):
+            _escribiendo()
+            try:
+                return await metodo(*args, **kwargs)
+            finally:
+                version_datos.incrementar()
+        return envoltura_async
+
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        _escribiendo()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            version_datos.incrementar()
+    return envoltura
+
+def coincide_ilike(patron: str, valor: str) -> bool:
+    """Réplica en Python de ILIKE: '%' y '_' como comodines, sin distinguir mayúsculas."""
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in patron)
+    return re.fullmatch(regex, valor, re.IGNORECASE | re.DOTALL) is not None
+
+def separar_filas(filas: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Reparte filas con 'tipo' entre el estado y el historial ('estudiado')."""
+    estado, historial = [], []
+    for f in filas:
+        if f.get("tipo") == TIPO_HISTORIAL:
+            historial.append({k: v for k, v in f.items() if k != "tipo"})
+        else:
+            estado.append(f)
+    return estado, historial
+
+def como_cronograma(resumen: List[Dict[str, Any]], historial: List[Dict[str, Any]],
+                    repasos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Une lo estudiado (resúmenes compactados + historial detallado) y lo programado
+    (repasos) en una sola lista por fecha. Los resúmenes llevan tipo 'resumen' y 'total'.
+    """
+    eventos = [{**r, "tipo": "resumen"} for r in resumen]
+    eventos += [{**h, "tipo": TIPO_HISTORIAL} for h in historial] + repasos
+    return sorted(eventos, key=lambda r: r["fecha"] or "")
+
+def lotes(items: List[Any], tamano: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), tamano):
+        yield items[i:i + tamano]
+
+class EnHilo:
+    """
+    Expone un manager síncrono con la interfaz de AsyncDatabaseManager: cada método
+    se ejecuta en un hilo aparte para no bloquear el ciclo de eventos del bot.
+    """
+
+    def __init__(self, base):
+        self._base = base
+
+    def __getattr__(self, nombre: str):
+        atributo = getattr(self._base, nombre)
+        if not callable(atributo):
+            return atributo
+
+        @functools.wraps(atributo)
+        async def en_hilo(*args, **kwargs):
+            return await asyncio.to_thread(atributo, *args, **kwargs)
+        return en_hilo
@@ -0,0 +1,165 @@
+# src/asgi.py
+"""
+Modo de servicio ASGI (SERVIDOR=asgi): la App de Telegram vive en el ciclo de eventos
+del servidor y los updates pasan por DespachadorChats, así que chats distintos se
+atienden en paralelo sin hilos y cada chat conserva su orden. Con COLA_TRABAJO=1 van
+en cambio a la cola de trabajo (src/cola.py) y el webhook responde sin esperar.
+
+Uso:
+    SERVIDOR=asgi python -m src.main
+    uvicorn src.asgi:app --port 10000
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+from .config import settings
+from .database import espejo
+from .cola import ColaUpdates, update_valido
+from .despacho import ColaLlena, DespachadorChats
+from .duplicados import deduplicador
+from .main import build_application, cerrar_aplicacion, crear_cola, process_update_async
+from .metricas import registro
+from .perfilado import CABECERA as CABECERA_PERFIL, perfilador
+from .pool import pool
+
+logger = logging.getLogger(__name__)
+
+class AppASGI:
+    """Aplicación ASGI mínima con las mismas rutas que la de Flask: /webhook, /health y /metrics."""
+
+    def __init__(self):
+        self.bot_app = None
+        self.despachador: Optional[DespachadorChats] = None
+        self.cola: Optional[ColaUpdates] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._ciclo_de_vida(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        ruta, metodo = scope["path"], scope["method"]
+        if ruta == "/webhook" and metodo == "POST":
+            estado, cuerpo, extra = await self._webhook(scope, receive)
+        elif ruta == "/health" and metodo == "GET":
+            estado, cuerpo, extra = 200, "Bot activo 🚀", []
+        elif ruta == "/metrics" and metodo == "GET":
+            estado, cuerpo, extra = 200, registro.exportar(), [(b"content-type", b"text/plain; version=0.0.4")]
+        else:
+            estado, cuerpo, extra = 404, "No encontrado", []
+        await _responder(send, estado, cuerpo, extra)
+
+    async def _ciclo_de_vida(self, receive, send) -> None:
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] == "lifespan.startup":
+                try:
+                    await self.iniciar()
+                except Exception as e:
+                    logger.error(f"No se pudo iniciar la App: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif mensaje["type"] == "lifespan.shutdown":
+                await self.detener()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def iniciar(self) -> None:
+        app = build_application()
+        await app.initialize()
+        self.bot_app = app
+        self.despachador = DespachadorChats(
+            lambda data, **opciones: process_update_async(app, data, **opciones),
+            max_concurrencia=settings.MAX_CONCURRENCIA,
+            max_pendientes=settings.COLA_MAXIMA,
+        )
+        registro.agregar_colector("despachador", self.despachador.estadisticas)
+        if settings.COLA_TRABAJO:
+            self.cola = crear_cola(app)
+            await self.cola.iniciar()
+            registro.agregar_colector("cola_updates", self.cola.estadisticas)
+        if espejo is not None:
+            espejo.iniciar()
+        logger.info("Application inicializada en el ciclo ASGI.")
+
+    async def detener(self) -> None:
+        if self.cola is not None:
+            await self.cola.detener(settings.UPDATE_TIMEOUT)
+            self.cola.almacen.cerrar()
+            self.cola = None
+        if self.despachador is not None:
+            await self.despachador.esperar()
+        if self.bot_app is not None:
+            await cerrar_aplicacion(self.bot_app)
+            self.bot_app = None
+        # Lo mismo que main() al terminar waitress: cliente síncrono y deduplicador
+        pool.cerrar()
+        deduplicador.cerrar()
+
+    async def _webhook(self, scope, receive) -> Tuple[int, str, List[Tuple[bytes, bytes]]]:
+        try:
+            update_data = json.loads(await _leer_cuerpo(receive) or b"null")
+        except ValueError:
+            update_data = None
+        if not update_data:
+            return 400, "No data", []
+        if not update_valido(update_data):
+            return 400, "Update inválido", []
+        if not deduplicador.nuevo(update_data["update_id"]):
+            # Reenvío de Telegram de un update ya recibido: no se vuelve a procesar
+            return 200, "Duplicado", []
+
+        perfilar = perfilador.pedido_por_cabecera(_cabeceras(scope).get(CABECERA_PERFIL.lower()))
+        try:
+            if self.cola is not None:
+                # Respuesta inmediata: los trabajadores de la cola lo procesan después
+                self.cola.encolar(update_data, perfilar=perfilar)
+                return 200, "OK", []
+            futuro = self.despachador.encolar(update_data, perfilar=perfilar)
+        except ColaLlena as e:
+            # Telegram reintenta lo que no recibe 2xx: así la cola deja de crecer
+            logger.warning(f"Webhook rechazado por contrapresión: {e}")
+            deduplicador.olvidar(update_data["update_id"])
+            return 503, "Saturado", [(b"retry-after", b"1")]
+
+        try:
+            # shield: si se agota la espera, el update sigue su curso en la cola
+            await asyncio.wait_for(asyncio.shield(futuro), settings.UPDATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update {update_data.get('update_id')} sigue en proceso tras {settings.UPDATE_TIMEOUT}s")
+        except Exception as e:
+            logger.error(f"Error crítico en webhook: {e}")
+            return 200, "Error procesado", []
+        return 200, "OK", []
+
+async def _leer_cuerpo(receive) -> bytes:
+    partes = []
+    while True:
+        mensaje = await receive()
+        partes.append(mensaje.get("body", b""))
+        if not mensaje.get("more_body"):
+            return b"".join(partes)
+
+def _cabeceras(scope) -> Dict[str, str]:
+    return {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+async def _responder(send, estado: int, cuerpo: str, extra: List[Tuple[bytes, bytes]]) -> None:
+    datos = cuerpo.encode()
+    cabeceras = [(b"content-length", str(len(datos)).encode())]
+    if not any(k == b"content-type" for k, _ in extra):
+        cabeceras.append((b"content-type", b"text/plain; charset=utf-8"))
+    await send({"type": "http.response.start", "status": estado, "headers": cabeceras + extra})
+    await send({"type": "http.response.body", "body": datos})
+
+app = AppASGI()
+
+def servir() -> None:
+    """Arranca uvicorn con la app ASGI (dependencia opcional, solo para este modo)."""
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise RuntimeError("SERVIDOR=asgi requiere uvicorn: pip install uvicorn") from e
+    uvicorn.run(app, host="0.0.0.0", port=settings.PORT, lifespan="on")
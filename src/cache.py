@@ -0,0 +1,226 @@
+# src/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Etiquetas de invalidación: cada entrada se marca con las partes de los datos que refleja
+MATERIAS = "materias"
+REPASOS = "repasos"
+CRONOGRAMA = "cronograma"
+
+def etiqueta_materia(materia: str) -> str:
+    return f"materia:{materia}"
+
+class CacheLectura:
+    """
+    Caché de lectura en memoria delante de AsyncDatabaseManager.
+    Sirve materias, temario, repasos y calendario sin ir a Supabase y se invalida en
+    cada escritura que pasa por aquí. El TTL cubre cambios hechos fuera del bot y el
+    tamaño está acotado con desalojo LRU. Los métodos sin caché se delegan tal cual.
+    Los valores devueltos se comparten entre llamadas: no deben mutarse.
+    """
+
+    def __init__(self, base, ttl: float, max_entradas: int):
+        self._base = base
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        # clave -> (expira_en, etiquetas, valor)
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Se incrementa en cada escritura para no guardar lecturas que se cruzaron con ella
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def __getattr__(self, nombre: str):
+        return getattr(self._base, nombre)
+
+    # --- Núcleo ---
+    async def _leer(self, clave: Hashable, etiquetas: Iterable[str], cargar: Callable[[], Awaitable[Any]]) -> Any:
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada[0] > time.monotonic():
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[2]
+
+        self.fallos += 1
+        generacion = self._generacion
+        valor = await cargar()
+        if generacion == self._generacion:
+            self._guardar(clave, frozenset(etiquetas), valor)
+        return valor
+
+    def _guardar(self, clave: Hashable, etiquetas: FrozenSet[str], valor: Any) -> None:
+        self._entradas[clave] = (time.monotonic() + self.ttl, etiquetas, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def invalidar(self, etiquetas: Optional[Set[str]] = None) -> None:
+        """Descarta las entradas con alguna de las etiquetas (todas si es None)."""
+        self._generacion += 1
+        if etiquetas is None:
+            self._entradas.clear()
+            return
+        for clave in [c for c, (_, tags, _) in self._entradas.items() if tags & etiquetas]:
+            del self._entradas[clave]
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "entradas": len(self._entradas),
+        }
+
+    # --- Lecturas con caché ---
+    async def obtener_materias_unicas(self) -> List[str]:
+        return await self._leer("materias", {MATERIAS}, self._base.obtener_materias_unicas)
+
+    async def obtener_detalle_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return await self._leer(
+            ("detalle", materia), {etiqueta_materia(materia)},
+            lambda: self._base.obtener_detalle_materia(materia)
+        )
+
+    async def obtener_repasos_para_fecha(self, fecha_limite: str) -> List[Dict[str, Any]]:
+        return await self._leer(
+            ("repasos", fecha_limite), {REPASOS},
+            lambda: self._base.obtener_repasos_para_fecha(fecha_limite)
+        )
+
+    async def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
+        return await self._leer("cronograma", {CRONOGRAMA}, self._base.obtener_cronograma_completo)
+
+    async def obtener_temario_pagina(self, materia: str, desde: int, limite: int) -> List[Dict[str, Any]]:
+        return await self._leer(
+            ("temario", materia, desde, limite), {etiqueta_materia(materia)},
+            lambda: self._base.obtener_temario_pagina(materia, desde, limite)
+        )
+
+    async def obtener_cronograma(self, desde: Optional[str], hasta: Optional[str],
+                                 cursor: Tuple[int, int, int] = (0, 0, 0), limite: int = 100) -> List[Dict[str, Any]]:
+        return await self._leer(
+            ("cronograma", desde, hasta, cursor, limite), {CRONOGRAMA},
+            lambda: self._base.obtener_cronograma(desde, hasta, cursor, limite)
+        )
+
+    # --- Escrituras con invalidación ---
+    async def insertar_registro(self, data: Dict[str, Any]) -> None:
+        await self.insertar_registros([data])
+
+    async def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        try:
+            await self._base.insertar_registros(filas)
+        finally:
+            self.invalidar({MATERIAS, REPASOS, CRONOGRAMA} | {etiqueta_materia(f["materia"]) for f in filas})
+
+    async def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        try:
+            resultado = await self._base.procesar_estudio(subtema, hoy)
+        except Exception:
+            self.invalidar()
+            raise
+        if resultado:
+            self.invalidar({REPASOS, CRONOGRAMA, etiqueta_materia(resultado["anterior"]["materia"])})
+        return resultado
+
+    async def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        try:
+            resultados = await self._base.procesar_estudio_lote(subtemas, hoy)
+        except Exception:
+            self.invalidar()
+            raise
+        materias = {etiqueta_materia(r["anterior"]["materia"]) for r in resultados if r["anterior"]}
+        if materias:
+            self.invalidar({REPASOS, CRONOGRAMA} | materias)
+        return resultados
+
+    # Estas escrituras no dicen a qué materia afectan: se descarta todo
+    async def marcar_como_dominado(self, subtema: str) -> bool:
+        return subtema in await self.marcar_dominados([subtema])
+
+    async def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        try:
+            return await self._base.marcar_dominados(subtemas)
+        finally:
+            self.invalidar()
+
+    async def eliminar_por_id(self, registro_id: int) -> None:
+        try:
+            await self._base.eliminar_por_id(registro_id)
+        finally:
+            self.invalidar()
+
+    async def eliminar_por_campo(self, campo: str, valor: str) -> None:
+        try:
+            await self._base.eliminar_por_campo(campo, valor)
+        finally:
+            self.invalidar()
+
+    async def compactar_historial(self, dias_detalle: int, simular: bool = True) -> Dict[str, Any]:
+        try:
+            return await self._base.compactar_historial(dias_detalle, simular)
+        finally:
+            if not simular:
+                self.invalidar({CRONOGRAMA})
+
+class VersionDatos:
+    """Contador monótono de escrituras: cualquier cambio en la base lo incrementa."""
+
+    def __init__(self):
+        self._valor = 0
+        self._lock = threading.Lock()
+
+    @property
+    def actual(self) -> int:
+        return self._valor
+
+    def incrementar(self) -> int:
+        with self._lock:
+            self._valor += 1
+            return self._valor
+
+class CacheRespuestas:
+    """
+    Caché de respuestas ya renderizadas, por (comando, argumentos) y versión de datos.
+    Si la versión no cambió desde que se generó, se devuelve el texto sin consultar
+    la base ni volver a construir el Markdown.
+    """
+
+    def __init__(self, version: VersionDatos, ttl: float, max_entradas: int):
+        self._version = version
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        # clave -> (version, expira_en, valor)
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    async def obtener(self, clave: Hashable, producir: Callable[[], Awaitable[Any]]) -> Any:
+        version = self._version.actual
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada[0] == version and entrada[1] > time.monotonic():
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[2]
+
+        self.fallos += 1
+        # Se guarda con la versión leída antes de producir: si hubo una escritura
+        # mientras tanto, la siguiente consulta no coincidirá y se regenerará
+        valor = await producir()
+        self._entradas[clave] = (version, time.monotonic() + self.ttl, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+        return valor
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "entradas": len(self._entradas),
+            "version_datos": self._version.actual,
+        }
@@ -0,0 +1,322 @@
+# src/cola.py
+"""
+Cola de trabajo para responder el webhook al instante (COLA_TRABAJO=1).
+El webhook valida el update, lo encola y devuelve 200; un grupo de trabajadores en el
+ciclo del bot lo procesa después. Los updates que fallan antes de escribir en la base
+se reintentan con espera creciente; agotados los intentos, o si ya habían escrito (un
+reintento repetiría la escritura), pasan a la tabla de fallidos (dead letter).
+Con COLA_RUTA apuntando a un archivo, la cola pendiente sobrevive a un reinicio.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+from .almacen import contar_escrituras, dejar_de_contar
+from .despacho import ColaLlena, clave_chat
+from .metricas import registro
+
+logger = logging.getLogger(__name__)
+
+registro.histograma("cola_espera_segundos", "Tiempo que un update pasa en la cola antes de procesarse")
+registro.histograma("cola_proceso_segundos", "Tiempo de procesamiento de un update tomado de la cola")
+
+ESQUEMA = """
+create table if not exists cola_updates (
+    id           integer primary key autoincrement,
+    update_id    integer,
+    datos        text    not null,
+    intentos     integer not null default 0,
+    encolado_en  real    not null
+);
+create table if not exists updates_fallidos (
+    id           integer primary key autoincrement,
+    update_id    integer,
+    datos        text    not null,
+    intentos     integer not null,
+    error        text    not null,
+    fallado_en   real    not null
+);
+"""
+
+def update_valido(update_data: Any) -> bool:
+    """Lo mínimo para aceptar un update: un objeto JSON con update_id entero."""
+    return isinstance(update_data, dict) and isinstance(update_data.get("update_id"), int)
+
+@dataclass
+class Trabajo:
+    update_data: Dict[str, Any]
+    opciones: Dict[str, Any] = field(default_factory=dict)
+    fila: Optional[int] = None
+    intentos: int = 0
+    encolado_en: float = field(default_factory=time.time)
+
+@dataclass
+class _Reanudar:
+    """Aviso en la cola global: el chat 'clave' terminó la espera de un reintento."""
+    clave: Hashable
+
+class AlmacenCola:
+    """
+    Updates pendientes y fallidos en SQLite. Con ':memory:' solo se guardan los fallidos
+    (para inspeccionarlos); los pendientes viven únicamente en la cola en memoria.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.persistente = ruta != ":memory:"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("pragma journal_mode = wal")
+        self._conn.execute("pragma synchronous = normal")
+        self._conn.executescript(ESQUEMA)
+
+    def guardar(self, trabajo: Trabajo) -> None:
+        if not self.persistente:
+            return
+        with self._lock:
+            cursor = self._conn.execute(
+                "insert into cola_updates (update_id, datos, intentos, encolado_en) values (?, ?, ?, ?)",
+                (trabajo.update_data.get("update_id"), json.dumps(trabajo.update_data), trabajo.intentos, trabajo.encolado_en),
+            )
+            trabajo.fila = cursor.lastrowid
+
+    def reintento(self, trabajo: Trabajo) -> None:
+        if trabajo.fila is None:
+            return
+        with self._lock:
+            self._conn.execute("update cola_updates set intentos = ? where id = ?", (trabajo.intentos, trabajo.fila))
+
+    def completar(self, trabajo: Trabajo) -> None:
+        if trabajo.fila is None:
+            return
+        with self._lock:
+            self._conn.execute("delete from cola_updates where id = ?", (trabajo.fila,))
+
+    def fallar(self, trabajo: Trabajo, error: str) -> None:
+        """Pasa el update a la tabla de fallidos y lo saca de la cola, en una transacción."""
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                self._conn.execute(
+                    "insert into updates_fallidos (update_id, datos, intentos, error, fallado_en) values (?, ?, ?, ?, ?)",
+                    (trabajo.update_data.get("update_id"), json.dumps(trabajo.update_data),
+                     trabajo.intentos, error, time.time()),
+                )
+                if trabajo.fila is not None:
+                    self._conn.execute("delete from cola_updates where id = ?", (trabajo.fila,))
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+            self._conn.execute("commit")
+
+    def pendientes(self) -> List[Trabajo]:
+        """Lo que quedó sin procesar en la ejecución anterior, en orden de llegada."""
+        with self._lock:
+            filas = self._conn.execute("select * from cola_updates order by id").fetchall()
+        return [
+            Trabajo(json.loads(f["datos"]), fila=f["id"], intentos=f["intentos"], encolado_en=f["encolado_en"])
+            for f in filas
+        ]
+
+    def fallidos(self, limite: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            filas = self._conn.execute(
+                "select id, update_id, intentos, error, fallado_en from updates_fallidos order by id desc limit ?",
+                (limite,),
+            ).fetchall()
+        return [dict(f) for f in filas]
+
+    def total_fallidos(self) -> int:
+        with self._lock:
+            return self._conn.execute("select count(*) from updates_fallidos").fetchone()[0]
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class ColaUpdates:
+    """
+    Cola en memoria drenada por 'trabajadores' tareas en el ciclo del bot.
+    encolar() se puede llamar desde cualquier hilo (los de waitress) o desde el propio ciclo.
+    Los updates de un mismo chat se procesan en orden: si un trabajador toma uno cuyo chat
+    ya está en curso, lo deja en espera y lo procesa quien tiene ese chat al terminar.
+    Un update que se reintenta vuelve al frente de la espera de su chat, que sigue
+    ocupado (sin trabajador) hasta que pasa la espera del reintento.
+    """
+
+    def __init__(self, procesar: Callable[..., Awaitable[Any]], almacen: AlmacenCola, trabajadores: int,
+                 max_pendientes: int, max_intentos: int, espera_reintento: float, timeout: float):
+        self._procesar = procesar
+        self.almacen = almacen
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self.max_intentos = max_intentos
+        self.espera_reintento = espera_reintento
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cola: Optional[asyncio.Queue] = None
+        self._tareas: List[asyncio.Task] = []
+        self._en_curso: Dict[Hashable, Deque[Trabajo]] = {}
+        self._lock = threading.Lock()
+        self.pendientes = 0
+        self.en_proceso = 0
+        self.procesados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+        self.rechazados = 0
+        self.recuperados = 0
+
+    async def iniciar(self) -> None:
+        """Arranca los trabajadores en el ciclo actual y reencola lo que quedó pendiente."""
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue()
+        for trabajo in self.almacen.pendientes():
+            self._poner(trabajo)
+            self.recuperados += 1
+        if self.recuperados:
+            logger.info(f"Cola: {self.recuperados} updates pendientes recuperados de {self.almacen.ruta}")
+        self._tareas = [self._loop.create_task(self._trabajador()) for _ in range(self.trabajadores)]
+
+    def encolar(self, update_data: Dict[str, Any], **opciones) -> None:
+        """Acepta el update (y lo persiste si corresponde) o lanza ColaLlena."""
+        with self._lock:
+            if self.pendientes >= self.max_pendientes:
+                self.rechazados += 1
+                raise ColaLlena(f"{self.pendientes} updates en espera")
+            self.pendientes += 1
+        trabajo = Trabajo(update_data, opciones)
+        try:
+            self.almacen.guardar(trabajo)
+        except Exception:
+            with self._lock:
+                self.pendientes -= 1
+            raise
+        self._loop.call_soon_threadsafe(self._cola.put_nowait, trabajo)
+
+    def _poner(self, trabajo: Trabajo) -> None:
+        with self._lock:
+            self.pendientes += 1
+        self._cola.put_nowait(trabajo)
+
+    async def _trabajador(self) -> None:
+        while True:
+            item = await self._cola.get()
+            try:
+                await self._atender(item)
+            except Exception:
+                # Nada de un update puede dejar la cola sin este trabajador
+                logger.exception("Cola: error inesperado al atender un update")
+
+    async def _atender(self, item: Any) -> None:
+        if isinstance(item, _Reanudar):
+            clave = item.clave
+            trabajo = self._en_curso[clave].popleft()
+        else:
+            trabajo = item
+            try:
+                clave = clave_chat(trabajo.update_data)
+            except Exception:
+                # Sin chat reconocible se procesa sin orden por chat y el handler decide
+                clave = None
+            if clave is not None:
+                if clave in self._en_curso:
+                    self._en_curso[clave].append(trabajo)
+                    return
+                self._en_curso[clave] = deque()
+
+        while trabajo is not None:
+            try:
+                espera = await self._ejecutar(trabajo)
+            except Exception:
+                # Falló el almacén de la cola, no el update: se da por fallido y el chat
+                # sigue con lo suyo en vez de quedar tomado para siempre
+                logger.exception(f"Cola: no se pudo registrar el update {trabajo.update_data.get('update_id')}")
+                self.fallidos += 1
+                espera = None
+            if espera is not None:
+                if clave is None:
+                    self._loop.call_later(espera, self._cola.put_nowait, trabajo)
+                else:
+                    # El chat queda tomado: nada suyo se procesa antes del reintento
+                    self._en_curso[clave].appendleft(trabajo)
+                    self._loop.call_later(espera, self._cola.put_nowait, _Reanudar(clave))
+                break
+            trabajo = None
+            if clave is not None:
+                pendientes = self._en_curso[clave]
+                if pendientes:
+                    trabajo = pendientes.popleft()
+                else:
+                    del self._en_curso[clave]
+
+    async def _ejecutar(self, trabajo: Trabajo) -> Optional[float]:
+        """Procesa el update; devuelve la espera antes de reintentarlo, o None si no hay reintento."""
+        with self._lock:
+            self.pendientes -= 1
+        inicio = time.time()
+        registro.observar("cola_espera_segundos", max(inicio - trabajo.encolado_en, 0.0))
+        self.en_proceso += 1
+        escrituras, token = contar_escrituras()
+        try:
+            # Un update colgado cuenta como fallo en vez de ocupar al trabajador
+            await asyncio.wait_for(self._procesar(trabajo.update_data, **trabajo.opciones), self.timeout)
+        except Exception as e:
+            return self._fallo(trabajo, e, escribio=escrituras[0] > 0)
+        else:
+            self.almacen.completar(trabajo)
+            self.procesados += 1
+            return None
+        finally:
+            dejar_de_contar(token)
+            self.en_proceso -= 1
+            registro.observar("cola_proceso_segundos", time.time() - inicio)
+
+    def _fallo(self, trabajo: Trabajo, error: Exception, escribio: bool) -> Optional[float]:
+        trabajo.intentos += 1
+        update_id = trabajo.update_data.get("update_id")
+        if escribio or trabajo.intentos >= self.max_intentos:
+            motivo = "ya había escrito en la base" if escribio else f"falló {trabajo.intentos} veces"
+            logger.error(f"Update {update_id} {motivo}; pasa a fallidos sin reintentar: {error!r}")
+            self.almacen.fallar(trabajo, repr(error))
+            self.fallidos += 1
+            return None
+
+        # Espera creciente: 1x, 2x, 4x... la base configurada
+        espera = self.espera_reintento * 2 ** (trabajo.intentos - 1)
+        logger.warning(f"Update {update_id} falló (intento {trabajo.intentos}); se reintenta en {espera:.1f}s: {error!r}")
+        self.almacen.reintento(trabajo)
+        self.reintentos += 1
+        with self._lock:
+            self.pendientes += 1
+        return espera
+
+    async def detener(self, timeout: float) -> None:
+        """Espera hasta 'timeout' a que se vacíe la cola y luego detiene los trabajadores."""
+        limite = time.monotonic() + timeout
+        while (self.pendientes or self.en_proceso) and time.monotonic() < limite:
+            await asyncio.sleep(0.05)
+        if self.pendientes:
+            destino = "quedan guardados" if self.almacen.persistente else "se pierden"
+            logger.warning(f"Cola detenida con {self.pendientes} updates pendientes; {destino}")
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "pendientes": self.pendientes,
+            "en_proceso": self.en_proceso,
+            "procesados": self.procesados,
+            "reintentos": self.reintentos,
+            "fallidos": self.fallidos,
+            "rechazados": self.rechazados,
+            "recuperados": self.recuperados,
+            "trabajadores": self.trabajadores,
+        }
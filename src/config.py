@@ -14,11 +14,60 @@ class Config:
     TELEGRAM_TOKEN: str = os.environ.get("TELEGRAM_TOKEN")
     SUPABASE_URL: str = os.environ.get("SUPABASE_URL")
     SUPABASE_KEY: str = os.environ.get("SUPABASE_KEY")
+    SUPABASE_POOL_SIZE: int = int(os.environ.get("SUPABASE_POOL_SIZE", 10))
+    SUPABASE_TIMEOUT: float = float(os.environ.get("SUPABASE_TIMEOUT", 10))
+    SUPABASE_KEEPALIVE: float = float(os.environ.get("SUPABASE_KEEPALIVE", 30))
     PORT: int = int(os.environ.get("PORT", 10000))
+    TELEGRAM_API_URL: str = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+    CACHE_TTL: float = float(os.environ.get("CACHE_TTL", 300))
+    CACHE_MAX_ENTRADAS: int = int(os.environ.get("CACHE_MAX_ENTRADAS", 256))
+    # Índice de nombres de subtemas (src/indice.py); se recarga de la base pasado este tiempo
+    INDICE_TTL: float = float(os.environ.get("INDICE_TTL", 300))
+    HISTORIAL_DIAS_DETALLE: int = int(os.environ.get("HISTORIAL_DIAS_DETALLE", 90))
+    UPDATE_TIMEOUT: float = float(os.environ.get("UPDATE_TIMEOUT", 60))
+    # Servidor: "waitress" (WSGI, un update por hilo) o "asgi" (uvicorn, colas por chat)
+    SERVIDOR: str = os.environ.get("SERVIDOR", "waitress").lower()
+    MAX_CONCURRENCIA: int = int(os.environ.get("MAX_CONCURRENCIA", 16))
+    COLA_MAXIMA: int = int(os.environ.get("COLA_MAXIMA", 1000))
+    # Cola de trabajo (src/cola.py): el webhook responde al instante y los updates se procesan después
+    COLA_TRABAJO: bool = os.environ.get("COLA_TRABAJO", "0").lower() in ("1", "true", "si", "sí")
+    TRABAJADORES: int = int(os.environ.get("TRABAJADORES", 8))
+    COLA_RUTA: str = os.environ.get("COLA_RUTA", ":memory:")
+    COLA_INTENTOS: int = int(os.environ.get("COLA_INTENTOS", 3))
+    COLA_ESPERA_REINTENTO: float = float(os.environ.get("COLA_ESPERA_REINTENTO", 2))
+    # Envíos a la Bot API (src/envios.py): límites de flood de Telegram y reintentos de RetryAfter
+    ENVIOS_LIMITAR: bool = os.environ.get("ENVIOS_LIMITAR", "1").lower() in ("1", "true", "si", "sí")
+    ENVIOS_GLOBAL_POR_S: float = float(os.environ.get("ENVIOS_GLOBAL_POR_S", 30))
+    ENVIOS_CHAT_POR_S: float = float(os.environ.get("ENVIOS_CHAT_POR_S", 1))
+    # Un /estudiar manda varios mensajes seguidos al mismo chat: la ráfaga cubre un par de comandos
+    ENVIOS_RAFAGA_CHAT: int = int(os.environ.get("ENVIOS_RAFAGA_CHAT", 10))
+    ENVIOS_GRUPO_POR_MIN: float = float(os.environ.get("ENVIOS_GRUPO_POR_MIN", 20))
+    ENVIOS_REINTENTOS: int = int(os.environ.get("ENVIOS_REINTENTOS", 3))
+    ENVIOS_CONEXIONES: int = int(os.environ.get("ENVIOS_CONEXIONES", 32))
+    # Deduplicación por update_id (src/duplicados.py); con un archivo en DEDUPE_RUTA sobrevive a reinicios
+    DEDUPE_CAPACIDAD: int = int(os.environ.get("DEDUPE_CAPACIDAD", 10000))
+    DEDUPE_RUTA: str = os.environ.get("DEDUPE_RUTA", ":memory:")
+    # Almacenamiento: "supabase" (por defecto) o "sqlite" (archivo local en SQLITE_PATH)
+    DB_BACKEND: str = os.environ.get("DB_BACKEND", "supabase").lower()
+    SQLITE_PATH: str = os.environ.get("SQLITE_PATH", "estudios.db")
+    # Espejo local de Supabase para las lecturas pesadas (solo con DB_BACKEND=supabase)
+    ESPEJO_LOCAL: bool = os.environ.get("ESPEJO_LOCAL", "0").lower() in ("1", "true", "si", "sí")
+    ESPEJO_RUTA: str = os.environ.get("ESPEJO_RUTA", ":memory:")
+    ESPEJO_INTERVALO: float = float(os.environ.get("ESPEJO_INTERVALO", 30))
+    # Perfilado de updates (src/perfilado.py); todo apagado por defecto
+    PERFILAR: bool = os.environ.get("PERFILAR", "0").lower() in ("1", "true", "si", "sí")
+    PERFIL_MUESTREO: float = float(os.environ.get("PERFIL_MUESTREO", 0))
+    PERFIL_TOKEN: str = os.environ.get("PERFIL_TOKEN", "")
+    PERFIL_DIR: str = os.environ.get("PERFIL_DIR", "perfiles")
+    PERFIL_TOP: int = int(os.environ.get("PERFIL_TOP", 25))
 
     def validate(self) -> None:
         """Verifica que todas las variables críticas estén definidas."""
-        missing = [key for key, val in self.__dict__.items() if val is None]
+        if self.DB_BACKEND not in ("supabase", "sqlite"):
+            raise ValueError(f"DB_BACKEND desconocido: {self.DB_BACKEND}")
+        # Con SQLite las credenciales de Supabase no hacen falta
+        opcionales = {"SUPABASE_URL", "SUPABASE_KEY"} if self.DB_BACKEND == "sqlite" else set()
+        missing = [key for key, val in self.__dict__.items() if val is None and key not in opcionales]
         if missing:
             raise ValueError(f"Faltan variables de entorno críticas: {', '.join(missing)}")
 
@@ -1,102 +1,458 @@
 # src/database.py
-from supabase import create_client, Client
-from typing import List, Dict, Any, Optional
+import asyncio
+from datetime import datetime
+from typing import Iterable, List, Dict, Any, Optional, Set
+from .almacen import (
+    TABLA_ESTADO, TABLA_HISTORIAL, TABLA_RESUMEN, Tramo, Triple, EnHilo,
+    como_cronograma, escritura, lotes, separar_filas,
+)
+from .cache import CacheLectura
 from .config import settings
+from .espejo import EspejoLocal
+from .indice import IndiceSubtemas
+from .metricas import Medido
+from .pool import PoolSupabase, pool as pool_global
+from .sqlite_backend import SQLiteDatabaseManager
 
-class DatabaseManager:
-    def __init__(self):
-        # No creamos el cliente aquí para evitar que se ate a un ciclo de eventos muerto
-        pass
+# Las búsquedas por lote viajan en la URL; las inserciones en el cuerpo
+LOTE_CONSULTA = 100
+LOTE_INSERCION = 500
+# PostgREST corta cada respuesta en 1000 filas (max-rows): las lecturas completas van por páginas
+PAGINA_LECTURA = 1000
+
+def _insertar_estado(tabla, filas: List[Dict[str, Any]]):
+    """Inserta en el estado ignorando subtemas que ya existan (unique materia, tema, subtema)."""
+    return tabla.upsert(filas, on_conflict="materia,tema,subtema", ignore_duplicates=True, default_to_null=False)
+
+def _ventana(consulta, desde: Optional[str], hasta: Optional[str]):
+    if desde:
+        consulta = consulta.gte("fecha", desde)
+    if hasta:
+        consulta = consulta.lte("fecha", hasta)
+    return consulta
+
+def _primera(res) -> Optional[Dict[str, Any]]:
+    return res.data[0] if res.data else None
+
+def _tripletas(respuestas) -> Set[Triple]:
+    return {(r['materia'], r['tema'], r['subtema']) for res in respuestas for r in res.data}
+
+class _ConsultasSupabase:
+    """
+    Arma las consultas de PostgREST y procesa sus respuestas. DatabaseManager y
+    AsyncDatabaseManager solo eligen el cliente (_tabla, _rpc) y llaman a execute():
+    cualquier cambio en una consulta vale para los dos.
+    """
+
+    def __init__(self, pool: PoolSupabase = pool_global):
+        self._pool = pool
+
+    def _tabla(self, nombre: str):
+        raise NotImplementedError
+
+    def _rpc(self, funcion: str, params: Dict[str, Any]):
+        raise NotImplementedError
 
     def _get_table(self):
-        """Genera una conexión fresca y segura para la operación actual."""
-        client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        return client.table("estudios")
+        """Tabla de estado sobre el cliente de la subclase (conexiones keep-alive del pool)."""
+        return self._tabla(TABLA_ESTADO)
+
+    def _get_historial(self):
+        return self._tabla(TABLA_HISTORIAL)
+
+    def estadisticas_pool(self) -> Dict[str, int]:
+        return self._pool.estadisticas()
+
+    # --- Verificaciones ---
+    def _existe(self, materia: str, tema: str, subtema: str) -> list:
+        # Un subtema que ya completó su ciclo solo queda en el historial
+        return [
+            tabla.select("id").eq("materia", materia).eq("tema", tema).eq("subtema", subtema).limit(1)
+            for tabla in (self._get_table(), self._get_historial())
+        ]
+
+    def _existentes(self, buscados: Set[Triple]) -> list:
+        subtemas = sorted({t[2] for t in buscados})
+        return [
+            tabla.select("materia, tema, subtema").in_("subtema", lote)
+            for lote in lotes(subtemas, LOTE_CONSULTA)
+            for tabla in (self._get_table(), self._get_historial())
+        ]
+
+    # --- Inserción / Actualización ---
+    def _inserciones(self, filas: List[Dict[str, Any]]) -> list:
+        """Una inserción por lote; cada fila va al almacén que le corresponde."""
+        estado, historial = separar_filas(filas)
+        return [
+            *(_insertar_estado(self._get_table(), lote) for lote in lotes(estado, LOTE_INSERCION)),
+            *(self._get_historial().insert(lote) for lote in lotes(historial, LOTE_INSERCION)),
+        ]
+
+    def _dominar(self, subtemas: List[str]):
+        hoy = datetime.now().strftime('%Y-%m-%d')
+        # Un subtema ya dominado no se vuelve a fechar
+        return (
+            self._get_table().update({"tipo": "dominado", "fecha": hoy})
+            .in_("subtema", subtemas).in_("tipo", ["pendiente", "repasar"])
+        )
+
+    def _estudio(self, subtema: str, hoy: str):
+        return self._rpc("procesar_estudio", {"p_subtema": subtema, "p_hoy": hoy})
+
+    def _estudio_lote(self, subtemas: List[str], hoy: str):
+        return self._rpc("procesar_estudio_lote", {"p_subtemas": subtemas, "p_hoy": hoy})
+
+    def _borrar_id(self, registro_id: int):
+        return self._get_table().delete().eq("id", registro_id)
+
+    def _borrados(self, campo: str, valor: str) -> list:
+        tablas = [self._get_table(), self._get_historial()]
+        if campo == "materia":
+            tablas.append(self._tabla(TABLA_RESUMEN))
+        return [tabla.delete().eq(campo, valor) for tabla in tablas]
+
+    def _compactacion(self, dias_detalle: int, simular: bool):
+        return self._rpc("compactar_historial", {"p_dias_detalle": dias_detalle, "p_simular": simular})
+
+    # --- Consultas ---
+    def _pendientes_materia(self, materia: str):
+        return self._get_table().select("*").eq("tipo", "pendiente").eq("materia", materia)
+
+    def _pendientes(self):
+        return self._get_table().select("*").eq("tipo", "pendiente")
+
+    def _repasos_para_fecha(self, fecha_limite: str):
+        return self._get_table().select("*").eq("tipo", "repasar").lte("fecha", fecha_limite)
+
+    def _especifico(self, tipo: str, subtema: str):
+        # Usamos ilike para que no importe si escribes "sistemas" o "Sistemas"
+        return self._get_table().select("*").eq("tipo", tipo).ilike("subtema", subtema)
+
+    # --- Métricas ---
+    def _pagina_registros(self, desde: int):
+        # PostgREST corta en PAGINA_LECTURA filas: se pide por páginas en orden de id
+        return (self._get_table().select("materia, tema, subtema, tipo").order("id")
+                .range(desde, desde + PAGINA_LECTURA - 1))
+
+    def _conteos(self):
+        return self._tabla("estudios_conteos").select("materia, tipo, total").order("materia")
+
+    def _reconciliacion(self, aplicar: bool):
+        return self._rpc("reconciliar_progreso", {"p_aplicar": aplicar})
+
+    def _detalle_materia(self, materia: str):
+        return self._get_table().select("*").eq("materia", materia)
+
+    def _cronograma_completo(self) -> tuple:
+        """(resumen, historial, repasos) completos, en el orden que espera como_cronograma."""
+        return (
+            self._tabla(TABLA_RESUMEN).select("*").order("fecha"),
+            self._get_historial().select("*").order("fecha"),
+            self._get_table().select("*").eq("tipo", "repasar").order("fecha"),
+        )
+
+    def _temario_pagina(self, materia: str, desde: int, limite: int):
+        return (
+            self._get_table().select("*").eq("materia", materia)
+            .order("tema").order("subtema").range(desde, desde + limite - 1)
+        )
+
+    def _cronograma(self, desde: Optional[str], hasta: Optional[str], cursor: Tramo, limite: int) -> tuple:
+        """(resumen, historial, repasos) de la ventana, 'limite' filas por fuente desde 'cursor' (ver Tramo)."""
+        consultas = (
+            self._tabla(TABLA_RESUMEN).select("*").order("fecha").order("materia"),
+            self._get_historial().select("*").order("fecha").order("id"),
+            self._get_table().select("*").eq("tipo", "repasar").order("fecha", nullsfirst=True).order("id"),
+        )
+        return tuple(_ventana(c, desde, hasta).range(d, d + limite - 1) for c, d in zip(consultas, cursor))
+
+class DatabaseManager(_ConsultasSupabase):
+    """Manager síncrono para scripts; el pool es seguro entre hilos y no se ata a ningún ciclo de eventos."""
+
+    def _tabla(self, nombre: str):
+        return self._pool.tabla(nombre)
+
+    def _rpc(self, funcion: str, params: Dict[str, Any]):
+        return self._pool.rpc(funcion, params)
 
     # --- Verificaciones ---
     def existe_subtema(self, materia: str, tema: str, subtema: str) -> bool:
-        res = self._get_table().select("id").eq("materia", materia).eq("tema", tema).eq("subtema", subtema).execute()
-        return len(res.data) > 0
+        return any(c.execute().data for c in self._existe(materia, tema, subtema))
+
+    def existen_subtemas(self, triples: Iterable[Triple]) -> Set[Triple]:
+        """Devuelve cuáles de las tripletas (materia, tema, subtema) ya existen, en pocas consultas."""
+        buscados = set(triples)
+        return _tripletas(c.execute() for c in self._existentes(buscados)) & buscados
 
     # --- Inserción / Actualización ---
+    @escritura
     def insertar_registro(self, data: Dict[str, Any]) -> None:
-        self._get_table().insert(data).execute()
+        self.insertar_registros([data])
+
+    @escritura
+    def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        """Inserción multi-fila en lotes; cada fila va al almacén que le corresponde."""
+        for c in self._inserciones(filas):
+            c.execute()
 
+    @escritura
     def marcar_como_dominado(self, subtema: str) -> bool:
-        table = self._get_table()
-        # Buscar si existe en repasos o pendientes
-        res = table.select("*").eq("subtema", subtema).neq("tipo", "estudiado").execute()
-        
-        if not res.data:
-            return False
-
-        # Eliminamos registros viejos
-        for row in res.data:
-            table.delete().eq("id", row['id']).execute()
-
-        # Insertamos como dominado
-        from datetime import datetime
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        table.insert({
-            "tipo": "dominado",
-            "materia": res.data[0]['materia'],
-            "tema": res.data[0]['tema'],
-            "subtema": subtema,
-            "fecha": hoy
-        }).execute()
-        return True
+        return subtema in self.marcar_dominados([subtema])
+
+    @escritura
+    def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        """Marca varios subtemas como dominados con una sola actualización en el estado."""
+        subtemas = list(dict.fromkeys(subtemas))
+        if not subtemas:
+            return set()
+        return {row['subtema'] for row in self._dominar(subtemas).execute().data}
+
+    @escritura
+    def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        """
+        Transición de estudio atómica en el servidor (RPC 'procesar_estudio').
+        Devuelve {'anterior': fila, 'nuevo': fila | None} o None si no existe.
+        """
+        return self._estudio(subtema, hoy).execute().data
 
+    @escritura
+    def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        """
+        Versión por lotes (RPC 'procesar_estudio_lote'): una entrada por nombre pedido,
+        {'subtema', 'anterior', 'nuevo'}, con 'anterior' en None si no se encontró.
+        """
+        return self._estudio_lote(subtemas, hoy).execute().data
+
+    @escritura
     def eliminar_por_id(self, registro_id: int) -> None:
-        self._get_table().delete().eq("id", registro_id).execute()
+        self._borrar_id(registro_id).execute()
 
+    @escritura
     def eliminar_por_campo(self, campo: str, valor: str) -> None:
-        self._get_table().delete().eq(campo, valor).execute()
+        for c in self._borrados(campo, valor):
+            c.execute()
+
+    @escritura
+    def compactar_historial(self, dias_detalle: int, simular: bool = True) -> Dict[str, Any]:
+        """
+        Resume por (día, materia) el historial anterior a 'dias_detalle' días (RPC 'compactar_historial').
+        Con simular=True solo calcula el reporte: filas_eliminadas, filas_resumen, bytes_liberados.
+        """
+        return self._compactacion(dias_detalle, simular).execute().data
 
     # --- Consultas ---
     def obtener_pendientes_materia(self, materia: str) -> List[Dict[str, Any]]:
-        return self._get_table().select("*").eq("tipo", "pendiente").eq("materia", materia).execute().data
+        return self._pendientes_materia(materia).execute().data
 
     def obtener_pendientes(self) -> List[Dict[str, Any]]:
-        return self._get_table().select("*").eq("tipo", "pendiente").execute().data
+        return self._pendientes().execute().data
 
     def obtener_repasos_para_fecha(self, fecha_limite: str) -> List[Dict[str, Any]]:
-        return self._get_table().select("*").eq("tipo", "repasar").lte("fecha", fecha_limite).execute().data
+        return self._repasos_para_fecha(fecha_limite).execute().data
 
     def buscar_repaso_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
-        res = self._get_table().select("*").eq("tipo", "repasar").eq("subtema", subtema).execute()
-        return res.data[0] if res.data else None
+        return _primera(self._especifico("repasar", subtema).execute())
 
     def buscar_pendiente_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
-        res = self._get_table().select("*").eq("tipo", "pendiente").eq("subtema", subtema).execute()
-        return res.data[0] if res.data else None
+        return _primera(self._especifico("pendiente", subtema).execute())
 
     # --- Métricas ---
     def obtener_todos_registros(self) -> List[Dict[str, Any]]:
-        return self._get_table().select("materia, tema, subtema, tipo").execute().data
+        filas = []
+        while True:
+            pagina = self._pagina_registros(len(filas)).execute().data
+            filas += pagina
+            if len(pagina) < PAGINA_LECTURA:
+                return filas
+
+    def obtener_conteos(self) -> List[Dict[str, Any]]:
+        """Filas {materia, tipo, total} agregadas en el servidor (vista estudios_conteos)."""
+        return self._conteos().execute().data
+
+    @escritura
+    def reconciliar_progreso(self, aplicar: bool = True) -> List[Dict[str, Any]]:
+        """Recalcula los contadores desde la tabla base; devuelve los desvíos {materia, tipo, esperado, registrado}."""
+        return self._reconciliacion(aplicar).execute().data
 
     def obtener_materias_unicas(self) -> List[str]:
-        res = self._get_table().select("materia").execute()
-        if not res.data:
-            return []
-        return sorted(list(set(r['materia'] for r in res.data)))
+        return sorted(set(c['materia'] for c in self.obtener_conteos()))
 
     def obtener_detalle_materia(self, materia: str) -> List[Dict[str, Any]]:
-        return self._get_table().select("*").eq("materia", materia).execute().dat
+        return self._detalle_materia(materia).execute().data
 
-    def buscar_repaso_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
-        # Usamos ilike para que no importe si escribes "sistemas" o "Sistemas"
-        res = self._get_table().select("*").eq("tipo", "repasar").ilike("subtema", subtema).execute()
-        return res.data[0] if res.data else None
+    def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
+        """Obtiene tanto lo estudiado (pasado) como lo programado (futuro)"""
+        return como_cronograma(*(c.execute().data for c in self._cronograma_completo()))
 
-    def buscar_pendiente_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
-        res = self._get_table().select("*").eq("tipo", "pendiente").ilike("subtema", subtema).execute()
-        return res.data[0] if res.data else None
+    def obtener_temario_pagina(self, materia: str, desde: int, limite: int) -> List[Dict[str, Any]]:
+        """Filas de la materia ordenadas por (tema, subtema), de la 'desde' en adelante."""
+        return self._temario_pagina(materia, desde, limite).execute().data
 
-    def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
+    def obtener_cronograma(self, desde: Optional[str], hasta: Optional[str],
+                           cursor: Tramo = (0, 0, 0), limite: int = 100) -> List[Dict[str, Any]]:
+        """
+        Eventos con fecha entre 'desde' y 'hasta' (inclusive; None = sin límite), hasta
+        'limite' por fuente a partir de la posición 'cursor' (ver Tramo).
+        """
+        return como_cronograma(*(c.execute().data for c in self._cronograma(desde, hasta, cursor, limite)))
+
+class AsyncDatabaseManager(_ConsultasSupabase):
+    """
+    Versión asíncrona de DatabaseManager sobre un cliente HTTP asíncrono; las consultas
+    independientes salen juntas con asyncio.gather.
+    Es el que usan los handlers para no bloquear el ciclo de eventos del bot.
+    """
+
+    def _tabla(self, nombre: str):
+        """Tabla sobre el cliente asíncrono del ciclo de eventos actual."""
+        return self._pool.tabla_async(nombre)
+
+    def _rpc(self, funcion: str, params: Dict[str, Any]):
+        return self._pool.rpc_async(funcion, params)
+
+    # --- Verificaciones ---
+    async def existe_subtema(self, materia: str, tema: str, subtema: str) -> bool:
+        respuestas = await asyncio.gather(*(c.execute() for c in self._existe(materia, tema, subtema)))
+        return any(res.data for res in respuestas)
+
+    async def existen_subtemas(self, triples: Iterable[Triple]) -> Set[Triple]:
+        """Devuelve cuáles de las tripletas (materia, tema, subtema) ya existen, en pocas consultas."""
+        buscados = set(triples)
+        return _tripletas(await asyncio.gather(*(c.execute() for c in self._existentes(buscados)))) & buscados
+
+    # --- Inserción / Actualización ---
+    @escritura
+    async def insertar_registro(self, data: Dict[str, Any]) -> None:
+        await self.insertar_registros([data])
+
+    @escritura
+    async def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        """Inserción multi-fila en lotes; cada fila va al almacén que le corresponde."""
+        await asyncio.gather(*(c.execute() for c in self._inserciones(filas)))
+
+    @escritura
+    async def marcar_como_dominado(self, subtema: str) -> bool:
+        return subtema in await self.marcar_dominados([subtema])
+
+    @escritura
+    async def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        """Marca varios subtemas como dominados con una sola actualización en el estado."""
+        subtemas = list(dict.fromkeys(subtemas))
+        if not subtemas:
+            return set()
+        return {row['subtema'] for row in (await self._dominar(subtemas).execute()).data}
+
+    @escritura
+    async def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        """
+        Transición de estudio atómica en el servidor (RPC 'procesar_estudio').
+        Devuelve {'anterior': fila, 'nuevo': fila | None} o None si no existe.
+        """
+        return (await self._estudio(subtema, hoy).execute()).data
+
+    @escritura
+    async def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        """
+        Versión por lotes (RPC 'procesar_estudio_lote'): una entrada por nombre pedido,
+        {'subtema', 'anterior', 'nuevo'}, con 'anterior' en None si no se encontró.
+        """
+        return (await self._estudio_lote(subtemas, hoy).execute()).data
+
+    @escritura
+    async def eliminar_por_id(self, registro_id: int) -> None:
+        await self._borrar_id(registro_id).execute()
+
+    @escritura
+    async def eliminar_por_campo(self, campo: str, valor: str) -> None:
+        await asyncio.gather(*(c.execute() for c in self._borrados(campo, valor)))
+
+    @escritura
+    async def compactar_historial(self, dias_detalle: int, simular: bool = True) -> Dict[str, Any]:
+        """
+        Resume por (día, materia) el historial anterior a 'dias_detalle' días (RPC 'compactar_historial').
+        Con simular=True solo calcula el reporte: filas_eliminadas, filas_resumen, bytes_liberados.
+        """
+        return (await self._compactacion(dias_detalle, simular).execute()).data
+
+    # --- Consultas ---
+    async def obtener_pendientes_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return (await self._pendientes_materia(materia).execute()).data
+
+    async def obtener_pendientes(self) -> List[Dict[str, Any]]:
+        return (await self._pendientes().execute()).data
+
+    async def obtener_repasos_para_fecha(self, fecha_limite: str) -> List[Dict[str, Any]]:
+        return (await self._repasos_para_fecha(fecha_limite).execute()).data
+
+    async def buscar_repaso_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
+        return _primera(await self._especifico("repasar", subtema).execute())
+
+    async def buscar_pendiente_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
+        return _primera(await self._especifico("pendiente", subtema).execute())
+
+    # --- Métricas ---
+    async def obtener_todos_registros(self) -> List[Dict[str, Any]]:
+        filas = []
+        while True:
+            pagina = (await self._pagina_registros(len(filas)).execute()).data
+            filas += pagina
+            if len(pagina) < PAGINA_LECTURA:
+                return filas
+
+    async def obtener_conteos(self) -> List[Dict[str, Any]]:
+        """Filas {materia, tipo, total} agregadas en el servidor (vista estudios_conteos)."""
+        return (await self._conteos().execute()).data
+
+    @escritura
+    async def reconciliar_progreso(self, aplicar: bool = True) -> List[Dict[str, Any]]:
+        """Recalcula los contadores desde la tabla base; devuelve los desvíos {materia, tipo, esperado, registrado}."""
+        return (await self._reconciliacion(aplicar).execute()).data
+
+    async def obtener_materias_unicas(self) -> List[str]:
+        return sorted(set(c['materia'] for c in await self.obtener_conteos()))
+
+    async def obtener_detalle_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return (await self._detalle_materia(materia).execute()).data
+
+    async def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
         """Obtiene tanto lo estudiado (pasado) como lo programado (futuro)"""
-        # Traemos registros de tipo estudiado y repasar
-        res = self._get_table().select("*").in_("tipo", ["estudiado", "repasar"]).order("fecha").execute()
-        return res.data
+        respuestas = await asyncio.gather(*(c.execute() for c in self._cronograma_completo()))
+        return como_cronograma(*(res.data for res in respuestas))
+
+    async def obtener_temario_pagina(self, materia: str, desde: int, limite: int) -> List[Dict[str, Any]]:
+        """Filas de la materia ordenadas por (tema, subtema), de la 'desde' en adelante."""
+        return (await self._temario_pagina(materia, desde, limite).execute()).data
+
+    async def obtener_cronograma(self, desde: Optional[str], hasta: Optional[str],
+                                 cursor: Tramo = (0, 0, 0), limite: int = 100) -> List[Dict[str, Any]]:
+        """
+        Eventos con fecha entre 'desde' y 'hasta' (inclusive; None = sin límite), hasta
+        'limite' por fuente a partir de la posición 'cursor' (ver Tramo).
+        """
+        respuestas = await asyncio.gather(*(c.execute() for c in self._cronograma(desde, hasta, cursor, limite)))
+        return como_cronograma(*(res.data for res in respuestas))
+
+def crear_managers(backend: str = settings.DB_BACKEND):
+    """Devuelve (manager síncrono, manager asíncrono) del backend configurado en DB_BACKEND."""
+    if backend == "sqlite":
+        local = SQLiteDatabaseManager(settings.SQLITE_PATH)
+        return local, EnHilo(local)
+    return DatabaseManager(), AsyncDatabaseManager()
+
+# Instancias globales: 'db' para scripts síncronos, 'adb' para los handlers.
+# Con ESPEJO_LOCAL las lecturas ya salen de memoria y el espejo se mantiene al día solo;
+# si no, 'adb' lleva delante la caché de lectura.
+db, _adb_base = crear_managers()
+espejo: Optional[EspejoLocal] = None
+if settings.ESPEJO_LOCAL and settings.DB_BACKEND == "supabase":
+    espejo = EspejoLocal(_adb_base, SQLiteDatabaseManager(settings.ESPEJO_RUTA), pool_global, settings.ESPEJO_INTERVALO)
+    adb = espejo
+else:
+    adb = CacheLectura(_adb_base, ttl=settings.CACHE_TTL, max_entradas=settings.CACHE_MAX_ENTRADAS)
+
+# Los nombres de subtemas se resuelven en memoria antes de llegar a la base (ver src/indice.py)
+adb = IndiceSubtemas(adb, ttl=settings.INDICE_TTL)
 
-# Instancia global (ahora segura porque es "stateless")
-db = DatabaseManager()
\ No newline at end of file
+# Latencia por método (ver src/metricas.py); la caché queda dentro, así que se mide lo que ve el bot
+db = Medido(db)
+adb = Medido(adb)
@@ -0,0 +1,111 @@
+# src/despacho.py
+"""
+Despacho concurrente de updates: los de chats distintos se procesan en paralelo
+(hasta un límite global) y los de un mismo chat, en estricto orden de llegada.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+class ColaLlena(Exception):
+    """No se aceptan más updates hasta que baje la cola (contrapresión)."""
+
+def clave_chat(update_data: Dict[str, Any]) -> Optional[Hashable]:
+    """Chat (o usuario) al que pertenece el update; None si no tiene ninguno."""
+    for campo in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        mensaje = update_data.get(campo)
+        if mensaje and "chat" in mensaje:
+            return mensaje["chat"]["id"]
+    callback = update_data.get("callback_query")
+    if callback and callback.get("message"):
+        return callback["message"]["chat"]["id"]
+    for valor in update_data.values():
+        if isinstance(valor, dict) and "from" in valor:
+            return ("usuario", valor["from"]["id"])
+    return None
+
+class DespachadorChats:
+    """
+    Una cola y una tarea por chat con trabajo pendiente (la tarea termina cuando su cola
+    se vacía) y un semáforo global que limita cuántos updates se procesan a la vez.
+    Con 'max_pendientes' updates en espera, encolar() lanza ColaLlena.
+    """
+
+    def __init__(self, procesar: Callable[..., Awaitable[Any]],
+                 max_concurrencia: int, max_pendientes: int):
+        self._procesar = procesar
+        self.max_concurrencia = max_concurrencia
+        self.max_pendientes = max_pendientes
+        self._semaforo = asyncio.Semaphore(max_concurrencia)
+        self._colas: Dict[Hashable, asyncio.Queue] = {}
+        self._tareas = set()
+        self.pendientes = 0
+        self.en_proceso = 0
+        self.procesados = 0
+        self.rechazados = 0
+
+    def encolar(self, update_data: Dict[str, Any], **opciones) -> "asyncio.Future":
+        """
+        Encola el update (llamar desde el ciclo de eventos) y devuelve un futuro con su
+        resultado. Las opciones se pasan tal cual a la función de procesamiento.
+        """
+        if self.pendientes >= self.max_pendientes:
+            self.rechazados += 1
+            raise ColaLlena(f"{self.pendientes} updates en espera")
+
+        futuro = asyncio.get_running_loop().create_future()
+        clave = clave_chat(update_data)
+        self.pendientes += 1
+        if clave is None:
+            # Sin chat no hay orden que respetar
+            self._lanzar(self._uno(update_data, opciones, futuro))
+            return futuro
+
+        cola = self._colas.get(clave)
+        if cola is None:
+            cola = self._colas[clave] = asyncio.Queue()
+            self._lanzar(self._drenar(clave, cola))
+        cola.put_nowait((update_data, opciones, futuro))
+        return futuro
+
+    def _lanzar(self, corrutina) -> None:
+        tarea = asyncio.get_running_loop().create_task(corrutina)
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+    async def _uno(self, update_data: Dict[str, Any], opciones: Dict[str, Any], futuro: "asyncio.Future") -> None:
+        async with self._semaforo:
+            self.pendientes -= 1
+            self.en_proceso += 1
+            try:
+                resultado = await self._procesar(update_data, **opciones)
+            except Exception as e:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            else:
+                if not futuro.done():
+                    futuro.set_result(resultado)
+            finally:
+                self.en_proceso -= 1
+                self.procesados += 1
+
+    async def _drenar(self, clave: Hashable, cola: asyncio.Queue) -> None:
+        # Sin 'await' entre el empty() y el borrado: ningún encolar() puede colarse en medio
+        while not cola.empty():
+            update_data, opciones, futuro = cola.get_nowait()
+            await self._uno(update_data, opciones, futuro)
+        del self._colas[clave]
+
+    async def esperar(self) -> None:
+        """Espera a que terminen todos los updates en curso o en cola."""
+        while self._tareas:
+            await asyncio.gather(*list(self._tareas), return_exceptions=True)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "pendientes": self.pendientes,
+            "en_proceso": self.en_proceso,
+            "procesados": self.procesados,
+            "rechazados": self.rechazados,
+            "chats_activos": len(self._colas),
+            "max_concurrencia": self.max_concurrencia,
+        }
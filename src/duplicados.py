@@ -0,0 +1,91 @@
+# src/duplicados.py
+"""
+Deduplicación de updates por update_id. Telegram reenvía un update si el webhook tarda
+o falla, y procesarlo dos veces duplica escrituras (p. ej. dos filas 'repasar' por un
+mismo /estudiar). El webhook consulta aquí antes de procesar o encolar nada.
+Se guardan los últimos DEDUPE_CAPACIDAD ids en un LRU en memoria y, si DEDUPE_RUTA
+apunta a un archivo, también en SQLite para que sobrevivan a un reinicio.
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from .config import settings
+
+# Cada cuántas altas se recorta la tabla a la capacidad configurada
+RECORTE_CADA = 500
+
+class RegistroUpdates:
+    def __init__(self, capacidad: int, ruta: str = ":memory:"):
+        self.capacidad = capacidad
+        self.ruta = ruta
+        self._vistos: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._altas = 0
+        self.nuevos = 0
+        self.duplicados = 0
+        if ruta != ":memory:":
+            self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+            self._conn.execute("pragma journal_mode = wal")
+            self._conn.execute("pragma synchronous = normal")
+            self._conn.execute("create table if not exists updates_vistos ("
+                "orden integer primary key autoincrement, update_id integer not null unique)")
+            # El LRU arranca con los más recientes de la tabla
+            filas = self._conn.execute(
+                "select update_id from updates_vistos order by orden desc limit ?", (capacidad,)
+            ).fetchall()
+            for (update_id,) in reversed(filas):
+                self._vistos[update_id] = None
+
+    def nuevo(self, update_id: int) -> bool:
+        """Registra el update_id; False si ya se había visto (hay que descartar el update)."""
+        with self._lock:
+            if update_id in self._vistos:
+                self._vistos.move_to_end(update_id)
+                self.duplicados += 1
+                return False
+            if self._conn is not None:
+                cursor = self._conn.execute("insert or ignore into updates_vistos (update_id) values (?)", (update_id,))
+                if cursor.rowcount == 0:
+                    # Visto hace tanto que ya salió del LRU, pero sigue en la tabla
+                    self._recordar(update_id)
+                    self.duplicados += 1
+                    return False
+                self._altas += 1
+                if self._altas % RECORTE_CADA == 0:
+                    self._conn.execute(
+                        "delete from updates_vistos where orden <= (select max(orden) from updates_vistos) - ?",
+                        (self.capacidad,),
+                    )
+            self._recordar(update_id)
+            self.nuevos += 1
+            return True
+
+    def _recordar(self, update_id: int) -> None:
+        self._vistos[update_id] = None
+        if len(self._vistos) > self.capacidad:
+            self._vistos.popitem(last=False)
+
+    def olvidar(self, update_id: int) -> None:
+        """Deshace nuevo(): para updates rechazados que Telegram va a volver a mandar."""
+        with self._lock:
+            self._vistos.pop(update_id, None)
+            if self._conn is not None:
+                self._conn.execute("delete from updates_vistos where update_id = ?", (update_id,))
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "nuevos": self.nuevos,
+            "duplicados": self.duplicados,
+            "en_memoria": len(self._vistos),
+            "capacidad": self.capacidad,
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+deduplicador = RegistroUpdates(settings.DEDUPE_CAPACIDAD, settings.DEDUPE_RUTA)
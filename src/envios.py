@@ -0,0 +1,181 @@
+# src/envios.py
+"""
+Planificador de envíos a la Bot API.
+- LimitadorEnvios se engancha en PTB como rate limiter: cubos de tokens global, por chat
+  privado y por grupo (límites de flood de Telegram) y reintento transparente de RetryAfter.
+- agrupar_mensajes junta respuestas consecutivas en un solo mensaje cuando caben,
+  para ahorrar idas a la API.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from .config import settings
+from .metricas import registro
+
+logger = logging.getLogger(__name__)
+
+# Límite de Telegram para el texto de un mensaje
+MAX_MENSAJE = 4096
+# Más allá de esto se olvidan los cubos de chats inactivos
+MAX_CUBOS = 10000
+# Llamadas con chat_id que no publican un mensaje: no cuentan para el límite del chat
+SIN_CUPO_CHAT = frozenset({"deleteMessage", "deleteMessages", "sendChatAction", "getChat", "getChatMember"})
+
+registro.histograma("envio_segundos", "Latencia de un envío a la Bot API, con esperas por límites y reintentos")
+registro.histograma("envio_espera_segundos", "Espera impuesta por los límites de envío antes de cada llamada")
+
+class CuboTokens:
+    """
+    Cubo de tokens en forma de GCRA: en vez de contar tokens guarda el instante teórico
+    de la próxima llamada, así reservar() calcula la espera sin locks ni tareas.
+    """
+
+    def __init__(self, por_segundo: float, rafaga: int):
+        self.intervalo = 1.0 / por_segundo
+        self.tolerancia = (rafaga - 1) * self.intervalo
+        self._tat = 0.0
+
+    def reservar(self, ahora: float) -> float:
+        """Aparta un turno y devuelve cuántos segundos hay que esperar para usarlo."""
+        tat = max(self._tat, ahora)
+        self._tat = tat + self.intervalo
+        return max(tat - self.tolerancia - ahora, 0.0)
+
+    def inactivo(self, ahora: float) -> bool:
+        return self._tat <= ahora
+
+def _segundos(valor: Any) -> float:
+    # PTB 20 usa int; PTB 22 puede devolver timedelta
+    return valor.total_seconds() if isinstance(valor, timedelta) else float(valor)
+
+class LimitadorEnvios(BaseRateLimiter[int]):
+    """
+    Rate limiter para Application.builder().rate_limiter(...). Las llamadas que publican
+    en un chat pasan por el cubo global y el de su chat (los grupos, id negativo, tienen
+    su propio límite por minuto); el resto (getMe, answerCallbackQuery, deleteMessage...)
+    solo por el global.
+    Ante RetryAfter se pausan todos los envíos el tiempo pedido y se reintenta la llamada
+    hasta 'max_reintentos' veces (o las que indique rate_limit_args).
+    """
+
+    def __init__(self, global_por_s: float, chat_por_s: float, rafaga_chat: int,
+                 grupo_por_min: float, max_reintentos: int):
+        self._global = CuboTokens(global_por_s, max(int(global_por_s), 1))
+        self.chat_por_s = chat_por_s
+        self.rafaga_chat = rafaga_chat
+        self.grupo_por_min = grupo_por_min
+        self.max_reintentos = max_reintentos
+        self._chats: Dict[Any, CuboTokens] = {}
+        self._pausa_hasta = 0.0
+        self.envios = 0
+        self.frenados = 0
+        self.retry_after = 0
+        self.agotados = 0
+        self.en_vuelo = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    def _cubo_chat(self, chat_id: Any, ahora: float) -> CuboTokens:
+        cubo = self._chats.get(chat_id)
+        if cubo is None:
+            if len(self._chats) >= MAX_CUBOS:
+                self._chats = {k: c for k, c in self._chats.items() if not c.inactivo(ahora)}
+            grupo = isinstance(chat_id, str) or int(chat_id) < 0
+            cubo = CuboTokens(self.grupo_por_min / 60, self.rafaga_chat) if grupo else CuboTokens(self.chat_por_s, self.rafaga_chat)
+            self._chats[chat_id] = cubo
+        return cubo
+
+    async def _turno(self, chat_id: Optional[Any]) -> None:
+        t0 = time.monotonic()
+        if self._pausa_hasta > t0:
+            await asyncio.sleep(self._pausa_hasta - t0)
+        # El turno global se pide recién al pasar el del chat: reservarlo a futuro
+        # frenaría a los demás chats por un mensaje que aún no puede salir
+        if chat_id is not None:
+            ahora = time.monotonic()
+            espera = self._cubo_chat(chat_id, ahora).reservar(ahora)
+            if espera > 0:
+                await asyncio.sleep(espera)
+        espera = self._global.reservar(time.monotonic())
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+        total = time.monotonic() - t0
+        registro.observar("envio_espera_segundos", total)
+        if total > 0.001:
+            self.frenados += 1
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        reintentos = self.max_reintentos if rate_limit_args is None else rate_limit_args
+        chat_id = None if endpoint in SIN_CUPO_CHAT else data.get("chat_id")
+        t0 = time.perf_counter()
+        self.en_vuelo += 1
+        try:
+            intento = 0
+            while True:
+                await self._turno(chat_id)
+                try:
+                    resultado = await callback(*args, **kwargs)
+                    self.envios += 1
+                    return resultado
+                except RetryAfter as e:
+                    self.retry_after += 1
+                    if intento >= reintentos:
+                        self.agotados += 1
+                        raise
+                    intento += 1
+                    # Telegram pide parar a todo el bot, no solo a este chat
+                    espera = _segundos(e.retry_after) + 0.1
+                    self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + espera)
+                    logger.warning(f"RetryAfter en {endpoint}: se reintenta en {espera:.1f}s (intento {intento})")
+        finally:
+            self.en_vuelo -= 1
+            registro.observar("envio_segundos", time.perf_counter() - t0, metodo=endpoint)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "envios": self.envios,
+            "frenados": self.frenados,
+            "retry_after": self.retry_after,
+            "agotados": self.agotados,
+            "en_vuelo": self.en_vuelo,
+            "chats": len(self._chats),
+        }
+
+def crear_limitador() -> LimitadorEnvios:
+    return LimitadorEnvios(
+        global_por_s=settings.ENVIOS_GLOBAL_POR_S,
+        chat_por_s=settings.ENVIOS_CHAT_POR_S,
+        rafaga_chat=settings.ENVIOS_RAFAGA_CHAT,
+        grupo_por_min=settings.ENVIOS_GRUPO_POR_MIN,
+        max_reintentos=settings.ENVIOS_REINTENTOS,
+    )
+
+def agrupar_mensajes(mensajes: List[str], limite: int = MAX_MENSAJE, separador: str = "\n\n") -> List[str]:
+    """
+    Junta mensajes consecutivos mientras el resultado quepa en 'limite'. Nunca parte un
+    mensaje: los que ya vienen cortados al límite (calendario largo) se quedan como están.
+    """
+    agrupados: List[str] = []
+    for m in mensajes:
+        if agrupados and len(agrupados[-1]) + len(separador) + len(m) <= limite:
+            agrupados[-1] += separador + m
+        else:
+            agrupados.append(m)
+    return agrupados
@@ -0,0 +1,278 @@
+# src/espejo.py
+"""
+Espejo local (SQLite en memoria o en archivo) de las tablas de Supabase.
+Las lecturas pesadas (temario, calendario, métricas) se responden desde aquí sin ir
+a la red; las escrituras siguen yendo a Supabase y, al terminar, se traen al espejo
+con una sincronización incremental. Ver sql/007_espejo.sql para las marcas de agua.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from .almacen import TABLA_ESTADO, TABLA_HISTORIAL, TABLA_RESUMEN, Tramo, version_datos
+from .pool import PoolSupabase
+from .sqlite_backend import SQLiteDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+TABLA_BORRADOS = "estudios_borrados"
+PAGINA = 1000
+# Se vuelve a pedir un poco antes de la marca de agua: una transacción que tardó en
+# confirmarse puede traer un actualizado_en (o un id) anterior al último visto
+MARGEN = timedelta(seconds=5)
+
+def _instante(valor: str) -> datetime:
+    return datetime.fromisoformat(valor.replace("Z", "+00:00"))
+
+def _avanzar(marca: Optional[datetime], filas: List[Dict[str, Any]]) -> Optional[datetime]:
+    """Mueve la marca de agua al actualizado_en más reciente de las filas recibidas."""
+    instantes = [_instante(f["actualizado_en"]) for f in filas]
+    if marca is not None:
+        instantes.append(marca)
+    return max(instantes, default=None)
+
+class _MarcaPorId:
+    """
+    Marca de agua de una tabla que se sigue por id (historial, lápidas). La identidad se
+    asigna al insertar pero la fila se ve al confirmar: un id menor puede aparecer después
+    de uno mayor. Por eso se relee desde la marca que se tenía hace MARGEN y se descartan
+    los ids de esa ventana que ya se aplicaron.
+    """
+
+    def __init__(self, marca: int = 0):
+        self.marca = marca
+        # (instante, marca) de cada vuelta; la inicial cuenta como antigua
+        self._anteriores: Deque[Tuple[float, int]] = deque([(float("-inf"), marca)])
+        self._vistos: Set[int] = set()
+
+    def desde(self) -> int:
+        limite = time.monotonic() - MARGEN.total_seconds()
+        # La marca más reciente que ya tiene MARGEN de antigüedad: todo id por debajo
+        # se asignó antes y su transacción ya tuvo tiempo de confirmarse
+        while len(self._anteriores) > 1 and self._anteriores[1][0] <= limite:
+            self._anteriores.popleft()
+        desde = self._anteriores[0][1]
+        self._vistos = {i for i in self._vistos if i > desde}
+        return desde
+
+    def nuevas(self, filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quita las filas ya aplicadas en una vuelta anterior."""
+        return [f for f in filas if f["id"] not in self._vistos]
+
+    def avanzar(self, filas: List[Dict[str, Any]]) -> None:
+        self._vistos.update(f["id"] for f in filas)
+        self.marca = max([self.marca] + [f["id"] for f in filas])
+        self._anteriores.append((time.monotonic(), self.marca))
+
+class EspejoLocal:
+    """
+    Envuelve AsyncDatabaseManager: lee del espejo, escribe en Supabase y sincroniza.
+    Los métodos no listados aquí (búsquedas puntuales, verificaciones) van directo a Supabase.
+    """
+
+    def __init__(self, remoto, local: SQLiteDatabaseManager, pool: PoolSupabase, intervalo: float):
+        self._remoto = remoto
+        self._local = local
+        self._pool = pool
+        self.intervalo = intervalo
+        self._lock_sync: Optional[asyncio.Lock] = None
+        self._tarea: Optional[asyncio.Task] = None
+        # Marcas de agua: None hasta la primera carga completa
+        self._marca_estado: Optional[datetime] = None
+        self._marca_resumen: Optional[datetime] = None
+        self._marca_historial = _MarcaPorId()
+        self._marca_borrados: Optional[_MarcaPorId] = None
+        # Métricas
+        self.sincronizaciones = 0
+        self.errores = 0
+        self.filas_aplicadas = 0
+        self.ultima_sync: Optional[float] = None
+        self.duracion_ultima_ms = 0.0
+        self.retraso_ultimo_s = 0.0
+
+    def __getattr__(self, nombre: str):
+        return getattr(self._remoto, nombre)
+
+    # --- Sincronización ---
+    async def _por_id(self, tabla: str, desde: int) -> List[Dict[str, Any]]:
+        filas = []
+        while True:
+            res = await self._pool.tabla_async(tabla).select("*").gt("id", desde).order("id").limit(PAGINA).execute()
+            filas += res.data
+            if len(res.data) < PAGINA:
+                return filas
+            desde = res.data[-1]["id"]
+
+    async def _por_fecha(self, tabla: str, desde: Optional[datetime], clave: tuple) -> List[Dict[str, Any]]:
+        filas = []
+        while True:
+            consulta = self._pool.tabla_async(tabla).select("*")
+            if desde is not None:
+                consulta = consulta.gte("actualizado_en", (desde - MARGEN).isoformat())
+            # La clave desempata filas con el mismo instante para que las páginas no se solapen
+            consulta = consulta.order("actualizado_en")
+            for columna in clave:
+                consulta = consulta.order(columna)
+            res = await consulta.range(len(filas), len(filas) + PAGINA - 1).execute()
+            filas += res.data
+            if len(res.data) < PAGINA:
+                return filas
+
+    async def _ultima_lapida(self) -> int:
+        res = await self._pool.tabla_async(TABLA_BORRADOS).select("id").order("id", desc=True).limit(1).execute()
+        return res.data[0]["id"] if res.data else 0
+
+    async def sincronizar(self) -> int:
+        """Trae los cambios desde las marcas de agua y los aplica al espejo. Devuelve las filas aplicadas."""
+        if self._lock_sync is None:
+            self._lock_sync = asyncio.Lock()
+        async with self._lock_sync:
+            t0 = time.perf_counter()
+            try:
+                # En la carga inicial las lápidas viejas no importan; las que lleguen
+                # durante la carga se aplican en la siguiente vuelta
+                marca_borrados = self._marca_borrados
+                if marca_borrados is None:
+                    marca_borrados = _MarcaPorId(await self._ultima_lapida())
+                    borrados = []
+                else:
+                    borrados = await self._por_id(TABLA_BORRADOS, marca_borrados.desde())
+                estado, historial, resumen = await asyncio.gather(
+                    self._por_fecha(TABLA_ESTADO, self._marca_estado, ("id",)),
+                    self._por_id(TABLA_HISTORIAL, self._marca_historial.desde()),
+                    self._por_fecha(TABLA_RESUMEN, self._marca_resumen, ("fecha", "materia")),
+                )
+                borrados = marca_borrados.nuevas(borrados)
+                historial = self._marca_historial.nuevas(historial)
+                aplicadas = self._local.aplicar_cambios(estado, historial, resumen, borrados)
+            except Exception:
+                self.errores += 1
+                raise
+
+            ahora = datetime.now(timezone.utc)
+            cambios = [_instante(f["actualizado_en"]) for f in estado + resumen]
+            if cambios:
+                self.retraso_ultimo_s = max((ahora - max(cambios)).total_seconds(), 0.0)
+            self._marca_estado = _avanzar(self._marca_estado, estado)
+            self._marca_resumen = _avanzar(self._marca_resumen, resumen)
+            self._marca_historial.avanzar(historial)
+            marca_borrados.avanzar(borrados)
+            self._marca_borrados = marca_borrados
+
+            self.sincronizaciones += 1
+            self.filas_aplicadas += aplicadas
+            self.ultima_sync = time.monotonic()
+            self.duracion_ultima_ms = (time.perf_counter() - t0) * 1000
+            if aplicadas:
+                # Las respuestas renderizadas con los datos anteriores dejan de valer
+                version_datos.incrementar()
+            return aplicadas
+
+    async def _sincronizar_siempre(self) -> None:
+        while True:
+            try:
+                await self.sincronizar()
+            except Exception as e:
+                logger.warning(f"Sincronización del espejo fallida: {e}")
+            await asyncio.sleep(self.intervalo)
+
+    def iniciar(self) -> None:
+        """Lanza la sincronización periódica en el ciclo de eventos actual."""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._sincronizar_siempre())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _listo(self) -> SQLiteDatabaseManager:
+        # Hasta la primera carga completa el espejo está vacío: se espera a tenerla
+        if self.ultima_sync is None:
+            await self.sincronizar()
+        return self._local
+
+    async def _escribir(self, metodo: str, *args):
+        try:
+            return await getattr(self._remoto, metodo)(*args)
+        finally:
+            try:
+                await self.sincronizar()
+            except Exception as e:
+                logger.warning(f"No se pudo reflejar la escritura '{metodo}' en el espejo: {e}")
+
+    def estadisticas(self) -> Dict[str, float]:
+        return {
+            "sincronizaciones": self.sincronizaciones,
+            "errores": self.errores,
+            "filas_aplicadas": self.filas_aplicadas,
+            "segundos_desde_sync": round(time.monotonic() - self.ultima_sync, 3) if self.ultima_sync else -1,
+            "retraso_ultimo_s": round(self.retraso_ultimo_s, 3),
+            "duracion_ultima_ms": round(self.duracion_ultima_ms, 2),
+        }
+
+    # --- Lecturas desde el espejo ---
+    async def obtener_pendientes_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_pendientes_materia(materia)
+
+    async def obtener_pendientes(self) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_pendientes()
+
+    async def obtener_repasos_para_fecha(self, fecha_limite: str) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_repasos_para_fecha(fecha_limite)
+
+    async def obtener_todos_registros(self) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_todos_registros()
+
+    async def obtener_conteos(self) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_conteos()
+
+    async def obtener_materias_unicas(self) -> List[str]:
+        return (await self._listo()).obtener_materias_unicas()
+
+    async def obtener_detalle_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_detalle_materia(materia)
+
+    async def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_cronograma_completo()
+
+    async def obtener_temario_pagina(self, materia: str, desde: int, limite: int) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_temario_pagina(materia, desde, limite)
+
+    async def obtener_cronograma(self, desde: Optional[str], hasta: Optional[str],
+                                 cursor: Tramo = (0, 0, 0), limite: int = 100) -> List[Dict[str, Any]]:
+        return (await self._listo()).obtener_cronograma(desde, hasta, cursor, limite)
+
+    # --- Escrituras: a Supabase y de inmediato al espejo ---
+    async def insertar_registro(self, data: Dict[str, Any]) -> None:
+        await self._escribir("insertar_registros", [data])
+
+    async def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        await self._escribir("insertar_registros", filas)
+
+    async def marcar_como_dominado(self, subtema: str) -> bool:
+        return subtema in await self.marcar_dominados([subtema])
+
+    async def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        return await self._escribir("marcar_dominados", subtemas)
+
+    async def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        return await self._escribir("procesar_estudio", subtema, hoy)
+
+    async def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        return await self._escribir("procesar_estudio_lote", subtemas, hoy)
+
+    async def eliminar_por_id(self, registro_id: int) -> None:
+        await self._escribir("eliminar_por_id", registro_id)
+
+    async def eliminar_por_campo(self, campo: str, valor: str) -> None:
+        await self._escribir("eliminar_por_campo", campo, valor)
+
+    async def compactar_historial(self, dias_detalle: int, simular: bool = True) -> Dict[str, Any]:
+        return await self._escribir("compactar_historial", dias_detalle, simular)
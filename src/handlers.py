@@ -1,8 +1,30 @@
-from telegram import Update
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from telegram import InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent, MessageEntity, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from .database import db
-from .services import SpacedRepetitionService
-from datetime import datetime
+from .almacen import Tramo, version_datos
+from .cache import CacheRespuestas
+from .config import settings
+from .database import adb
+from .envios import agrupar_mensajes
+from .paginas import ANTERIOR, SIGUIENTE, ajustar, callback, clave_materia, teclado
+from .services import SpacedRepetitionService, TemarioService
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Respuestas de los comandos de solo lectura, válidas mientras no cambie la versión de datos
+respuestas = CacheRespuestas(version_datos, ttl=settings.CACHE_TTL, max_entradas=settings.CACHE_MAX_ENTRADAS)
+
+# Filas por página de /temario y /ver_calendario (menos si no caben en un mensaje)
+FILAS_POR_PAGINA = 40
+
+async def _enviar_markdown(update: Update, mensajes: List[str]) -> None:
+    # Los mensajes que caben juntos salen en una sola llamada a la Bot API
+    for m in agrupar_mensajes(mensajes):
+        await update.message.reply_text(m, parse_mode='Markdown')
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
@@ -11,8 +33,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         '• `/agregar_temas` (Materia/Tema/Subtema)\n'
         '• `/estudiar <Subtema1, ...>` (Registra y genera prompts para Keep/Anki)\n'
         '• `/repasar` (Ver qué temas tocan hoy)\n'
-        '• `/ver_calendario` (Historial de lo estudiado y próximos repasos)\n'
-        '• `/dominado <Subtema>` (Marcar como aprendido para siempre)\n\n'
+        '• `/ver_calendario [semana|mes|todo|fechas]` (Historial de lo estudiado y próximos repasos)\n'
+        '• `/dominado <Subtema>` (Marcar como aprendido para siempre)\n'
+        '• `@bot <texto>` o `@bot dominado <texto>` (Autocompletar subtemas)\n\n'
         '**Consultas y Progreso:**\n'
         '• `/materias` (Ver tus materias registradas)\n'
         '• `/temario <Materia>` (Lista detallada de temas)\n'
@@ -26,33 +49,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def agregar_temas(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    texto = update.message.text.strip()
-    lineas = [l.strip() for l in texto.split('\n') if '/' in l]
-    
-    agregados = 0
-    ignorados = 0
-    errores = 0
-
-    for linea in lineas:
-        partes = linea.split('/')
-        if len(partes) < 3:
-            errores += 1
-            continue
-        
-        mat = partes[0].strip()
-        tem = partes[1].strip()
-        sub = "/".join(partes[2:]).strip() 
-        
-        if not db.existe_subtema(mat, tem, sub):
-            db.insertar_registro({
-                "tipo": "pendiente",
-                "materia": mat,
-                "tema": tem,
-                "subtema": sub
-            })
-            agregados += 1
-        else:
-            ignorados += 1
+    agregados, ignorados, errores = await TemarioService.importar_temario(update.message.text)
 
     await update.message.reply_text(
         f"📥 **Procesado:**\n✅ Agregados: {agregados}\n⏭ Repetidos: {ignorados}\n⚠️ Errores formato: {errores}",
@@ -72,7 +69,7 @@ async def estudiar_temas(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ La cantidad debe ser un número.")
         return
     
-    sugerencias = SpacedRepetitionService.sugerir_nuevos_temas(materia, int(cantidad_str))
+    sugerencias = await SpacedRepetitionService.sugerir_nuevos_temas(materia, int(cantidad_str))
 
     if not sugerencias:
         await update.message.reply_text(f"🎉 No hay temas pendientes en **{materia}**.", parse_mode='Markdown')
@@ -86,7 +83,7 @@ async def estudiar_temas(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def repasar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     hoy = datetime.now().strftime('%Y-%m-%d')
-    repasos = db.obtener_repasos_para_fecha(hoy)
+    repasos = await adb.obtener_repasos_para_fecha(hoy)
     
     if not repasos:
         await update.message.reply_text("✅ ¡Estás al día! No hay repasos para hoy.")
@@ -117,16 +114,40 @@ async def estudiar(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     msg_espera = await update.message.reply_text("⏳ Procesando tus temas...")
 
-    for sub in subtemas:
-        try:
-            # Ahora la búsqueda es insensible a mayúsculas gracias al cambio en database.py
-            msg_res, row = SpacedRepetitionService.procesar_estudio(sub)
-            exitosos.append(row)
-            msgs.append(f"✅ {sub}: {msg_res}")
-        except ValueError:
-            msgs.append(f"⚠️ {sub}: No encontrado. Revisa si es un SUBTEMA exacto.")
-        except Exception:
-            msgs.append(f"❌ {sub}: Error en la base de datos.")
+    # Los nombres se resuelven en el índice en memoria (sin mayúsculas, acentos ni espacios
+    # de más); los que no están ahí van tal cual, por si el servidor sí los conoce.
+    # Todo sale en una sola llamada al servidor
+    unicos = list(dict.fromkeys(subtemas))
+    try:
+        resueltos = [(sub, nombre or sub, sugerencias) for sub, nombre, sugerencias in await adb.resolver_subtemas(unicos)]
+        nombres = list(dict.fromkeys(nombre for _, nombre, _ in resueltos))
+        resultados = {
+            nombre: (msg_res, row)
+            for nombre, msg_res, row in await SpacedRepetitionService.procesar_estudio_lote(nombres)
+        }
+    except Exception:
+        logger.exception(f"/estudiar falló con {unicos}")
+        resultados = None
+
+    if resultados is None:
+        msgs = [f"❌ {sub}: Error en la base de datos." for sub in unicos]
+    else:
+        vistos = set()
+        for sub, nombre, sugerencias in resueltos:
+            # Un nombre que el servidor devolvió escrito de otra forma cuenta como no encontrado
+            msg_res, row = resultados.get(nombre, (None, None))
+            if row is None:
+                aviso = f"⚠️ {sub}: No encontrado."
+                if sugerencias:
+                    aviso += " ¿Quisiste decir " + " / ".join(f"«{s}»" for s in sugerencias) + "?"
+                msgs.append(aviso)
+            elif row["id"] in vistos:
+                # Dos formas de escribir el mismo subtema: se procesó una sola vez
+                msgs.append(f"✅ {sub}: ya procesado como «{row['subtema']}».")
+            else:
+                vistos.add(row["id"])
+                exitosos.append(row)
+                msgs.append(f"✅ {sub}: {msg_res}")
 
     await update.message.reply_text("\n".join(msgs))
 
@@ -137,16 +158,19 @@ async def estudiar(update: Update, context: ContextTypes.DEFAULT_TYPE):
         subtemas_str = ", ".join([x["subtema"] for x in exitosos])
         eventos = ", ".join([f'{x["materia"]}: {x["tema"]} -> {x["subtema"]}' for x in exitosos])
         
-        # Enviamos cada prompt en mensajes separados para que sean fáciles de copiar
-        await update.message.reply_text(f"📝 **Prompt para Google Keep:**\n`De las listas que tengo en keep agrega palomita de terminado en la lista [{', '.join(materias)}], los temas [{subtemas_str}]`", parse_mode='Markdown')
-        
-        await update.message.reply_text(f"🗓 **Prompt para Calendario:**\n`Agrega en el calendario estos eventos que acaban de pasar hoy: [{eventos}]`", parse_mode='Markdown')
-        
-        await update.message.reply_text(f"🧠 **Prompt para Anki:**\n`De estos apuntes de {', '.join(materias)}: Genera 10-15 tarjetas Anki en formato CSV (Frente;Reverso). Frente: Pregunta/concepto corto. Reverso: Respuesta detallada con ejemplos IPN.`", parse_mode='Markdown')
+        # Cada prompt va en su propio bloque de código (se copia con un toque); si caben,
+        # los tres salen en un solo mensaje
+        prompts = [
+            f"📝 **Prompt para Google Keep:**\n`De las listas que tengo en keep agrega palomita de terminado en la lista [{', '.join(materias)}], los temas [{subtemas_str}]`",
+            f"🗓 **Prompt para Calendario:**\n`Agrega en el calendario estos eventos que acaban de pasar hoy: [{eventos}]`",
+            f"🧠 **Prompt para Anki:**\n`De estos apuntes de {', '.join(materias)}: Genera 10-15 tarjetas Anki en formato CSV (Frente;Reverso). Frente: Pregunta/concepto corto. Reverso: Respuesta detallada con ejemplos IPN.`",
+        ]
+        envio = _enviar_markdown(update, prompts)
     else:
-        await update.message.reply_text("ℹ️ No se generaron prompts porque no se encontró ningún subtema válido en tus pendientes o repasos de hoy.")
+        envio = update.message.reply_text("ℹ️ No se generaron prompts porque no se encontró ningún subtema válido en tus pendientes o repasos de hoy.")
 
-    await msg_espera.delete()
+    # Borrar el aviso de espera no depende del último envío: van en paralelo
+    await asyncio.gather(envio, msg_espera.delete())
 
 async def dominado(update: Update, context: ContextTypes.DEFAULT_TYPE):
     texto = ' '.join(context.args).strip()
@@ -154,11 +178,12 @@ async def dominado(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('❌ Uso: `/dominado Subtema1, Subtema2`', parse_mode='Markdown')
         return
 
-    subtemas = [t.strip() for t in texto.split(',') if t.strip()]
+    subtemas = list(dict.fromkeys(t.strip() for t in texto.split(',') if t.strip()))
     msgs = []
 
+    dominados = await adb.marcar_dominados(subtemas)
     for sub in subtemas:
-        if db.marcar_como_dominado(sub):
+        if sub in dominados:
             msgs.append(f"🏆 **{sub}**: ¡Dominado! (Eliminado de repasos)")
         else:
             msgs.append(f"⚠️ **{sub}**: No encontrado o ya estaba dominado.")
@@ -166,36 +191,41 @@ async def dominado(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("\n".join(msgs), parse_mode='Markdown')
 
 async def metricas_globales(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    regs = db.obtener_todos_registros()
-    if not regs:
-        await update.message.reply_text("📭 Base de datos vacía.")
-        return
+    await _enviar_markdown(update, await respuestas.obtener(("temasFaltantes",), _render_metricas_globales))
+
+async def _render_metricas_globales() -> List[str]:
+    conteos = await adb.obtener_conteos()
+    if not conteos:
+        return ["📭 Base de datos vacía."]
+
+    por_tipo = {}
+    for c in conteos:
+        por_tipo[c['tipo']] = por_tipo.get(c['tipo'], 0) + c['total']
 
-    pendientes = sum(1 for r in regs if r['tipo'] == 'pendiente')
-    repasar = sum(1 for r in regs if r['tipo'] == 'repasar')
-    dominados = sum(1 for r in regs if r['tipo'] == 'dominado')
+    pendientes = por_tipo.get('pendiente', 0)
+    repasar = por_tipo.get('repasar', 0)
+    dominados = por_tipo.get('dominado', 0)
     total_activos = pendientes + repasar + dominados
     
-    msg = (
+    return [
         f"📊 **Métricas Globales**\n"
         f"🔴 Faltantes: {pendientes}/{total_activos}\n"
         f"🟡 En Progreso: {repasar}/{total_activos}\n"
         f"🟢 Dominados: {dominados}/{total_activos}\n"
-    )
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    ]
 
 async def metricas_materia(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    regs = db.obtener_todos_registros()
-    if not regs: return
+    conteos = await adb.obtener_conteos()
+    if not conteos: return
 
     stats = {}
-    for r in regs:
-        mat = r['materia']
-        if r['tipo'] != 'estudiado': 
+    for c in conteos:
+        mat = c['materia']
+        if c['tipo'] != 'estudiado': 
             if mat not in stats: stats[mat] = {'total': 0, 'vistos': 0}
-            stats[mat]['total'] += 1
-            if r['tipo'] in ['repasar', 'dominado']:
-                stats[mat]['vistos'] += 1
+            stats[mat]['total'] += c['total']
+            if c['tipo'] in ['repasar', 'dominado']:
+                stats[mat]['vistos'] += c['total']
 
     msg = "📈 **Avance por Materia**\n\n"
     for mat, s in stats.items():
@@ -216,27 +246,27 @@ async def eliminar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     nombre = ' '.join(args[1:]).strip().strip('"')
     
     if tipo == 'subtema':
-        db.eliminar_por_campo("subtema", nombre)
+        await adb.eliminar_por_campo("subtema", nombre)
         await update.message.reply_text(f'🗑️ Subtema "{nombre}" eliminado.')
     elif tipo == 'materia':
-        db.eliminar_por_campo("materia", nombre)
+        await adb.eliminar_por_campo("materia", nombre)
         await update.message.reply_text(f'🗑️ Materia "{nombre}" eliminada.')
     else:
          await update.message.reply_text('⚠️ Tipo desconocido. Usa "subtema" o "materia".')
 
 async def listar_materias(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    materias = db.obtener_materias_unicas()
+    await _enviar_markdown(update, await respuestas.obtener(("materias",), _render_materias))
+
+async def _render_materias() -> List[str]:
+    materias = await adb.obtener_materias_unicas()
     
     if not materias:
-        await update.message.reply_text("📭 No hay materias registradas aún.")
-        return
+        return ["📭 No hay materias registradas aún."]
 
-    msg = "📚 **Materias Disponibles:**\n\n"
-    for m in materias:
-        msg += f"🔹 `{m}`\n"
-    
-    msg += "\nUsa `/temario <NombreMateria>` para ver sus temas."
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    lineas = ["📚 **Materias Disponibles:**", ""]
+    lineas += [f"🔹 `{m}`" for m in materias]
+    lineas += ["", "Usa `/temario <NombreMateria>` para ver sus temas."]
+    return ["\n".join(lineas)]
 
 async def listar_temario(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args
@@ -245,72 +275,237 @@ async def listar_temario(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     materia = " ".join(args).strip()
-    registros = db.obtener_detalle_materia(materia)
+    texto, botones = await _pagina_temario(materia, 0, SIGUIENTE)
+    await update.message.reply_text(texto, parse_mode='Markdown', reply_markup=botones)
 
-    if not registros:
-        await update.message.reply_text(f"⚠️ No encontré información para la materia **{materia}**.", parse_mode='Markdown')
-        return
+SIGLAS = {'pendiente': "(p)", 'repasar': "(e)", 'dominado': "(d)"}
 
-    estructura = {}
-    
+def _render_temario(materia: str, registros: List[Dict[str, Any]]) -> str:
+    partes = [f"📂 **Temario: {materia}**\n\n", "Leyenda: (p)endiente, (e)studiado, (d)ominado\n"]
+    tema_actual = None
     for r in registros:
-        tema = r['tema']
-        sub = r['subtema']
-        tipo = r['tipo']
-        
-        sigla = "(?)"
-        if tipo == 'pendiente': sigla = "(p)"
-        elif tipo == 'repasar': sigla = "(e)" 
-        elif tipo == 'dominado': sigla = "(d)"
-        
-        if tema not in estructura:
-            estructura[tema] = []
-        estructura[tema].append((sub, sigla))
-
-    msg = f"📂 **Temario: {materia}**\n\n"
-    msg += "Leyenda: (p)endiente, (e)studiado, (d)ominado\n"
-    
-    for tema in sorted(estructura.keys()):
-        msg += f"\n📌 **{tema}**\n"
-        for sub, sigla in sorted(estructura[tema]):
-            if sigla == "(d)":
-                msg += f"   ▪️ **{sub} {sigla}**\n"
-            else:
-                msg += f"   ▫️ {sub} {sigla}\n"
-
-    if len(msg) > 4000:
-        await update.message.reply_text(msg[:4000] + "\n... (cortado)", parse_mode='Markdown')
-    else:
-        await update.message.reply_text(msg, parse_mode='Markdown')
-    
-# src/handlers.py
+        # El encabezado del tema se repite al inicio de cada página
+        if r['tema'] != tema_actual:
+            tema_actual = r['tema']
+            partes.append(f"\n📌 **{tema_actual}**\n")
+        sigla = SIGLAS.get(r['tipo'], "(?)")
+        if sigla == "(d)":
+            partes.append(f"   ▪️ **{r['subtema']} {sigla}**\n")
+        else:
+            partes.append(f"   ▫️ {r['subtema']} {sigla}\n")
+    return "".join(partes)
+
+async def _pagina_temario(materia: str, posicion: int, direccion: str) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Página del temario que empieza en 'posicion' (SIGUIENTE) o que termina justo antes (ANTERIOR)."""
+    async def producir():
+        if direccion == SIGUIENTE:
+            registros = await adb.obtener_temario_pagina(materia, posicion, FILAS_POR_PAGINA + 1)
+            filas, texto = ajustar(registros[:FILAS_POR_PAGINA], lambda f: _render_temario(materia, f))
+            inicio, hay_mas = posicion, len(registros) > len(filas)
+        else:
+            desde = max(posicion - FILAS_POR_PAGINA, 0)
+            registros = await adb.obtener_temario_pagina(materia, desde, posicion - desde)
+            filas, texto = ajustar(registros, lambda f: _render_temario(materia, f), desde_el_final=True)
+            inicio, hay_mas = posicion - len(filas), True
+
+        if not filas:
+            if posicion == 0:
+                return f"⚠️ No encontré información para la materia **{materia}**.", None
+            return "📭 No hay más temas en esta materia.", teclado(callback("t", clave_materia(materia), posicion, ANTERIOR), None)
+        clave = clave_materia(materia)
+        return texto, teclado(
+            callback("t", clave, inicio, ANTERIOR) if inicio > 0 else None,
+            callback("t", clave, inicio + len(filas), SIGUIENTE) if hay_mas else None,
+        )
+    return await respuestas.obtener(("temario", materia, posicion, direccion), producir)
 
 async def ver_calendario(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    registros = db.obtener_cronograma_completo()
-    if not registros:
-        await update.message.reply_text("📅 El calendario está vacío.")
+    try:
+        ventana = ventana_calendario(context.args, date.today())
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Uso: `/ver_calendario [semana|mes|todo|AAAA-MM-DD [AAAA-MM-DD]]`", parse_mode='Markdown'
+        )
         return
+    texto, botones = await _pagina_calendario(ventana, (0, 0, 0), SIGUIENTE)
+    await update.message.reply_text(texto, parse_mode='Markdown', reply_markup=botones)
+
+# Sin argumentos, /ver_calendario muestra de una semana atrás a dos semanas adelante
+DIAS_ATRAS = 7
+DIAS_ADELANTE = 14
 
-    # Agrupamos por fecha para mostrarlo ordenado
-    cronograma = {}
+Ventana = Tuple[Optional[date], Optional[date]]
+
+def ventana_calendario(args: List[str], hoy: date) -> Ventana:
+    """Rango de fechas pedido (inclusive); None en un extremo es sin límite. ValueError si no se entiende."""
+    if not args:
+        return hoy - timedelta(days=DIAS_ATRAS), hoy + timedelta(days=DIAS_ADELANTE)
+    clave = args[0].lower()
+    if len(args) == 1 and clave == "semana":
+        lunes = hoy - timedelta(days=hoy.weekday())
+        return lunes, lunes + timedelta(days=6)
+    if len(args) == 1 and clave == "mes":
+        siguiente = (hoy.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return hoy.replace(day=1), siguiente - timedelta(days=1)
+    if len(args) == 1 and clave == "todo":
+        return None, None
+    if len(args) > 2:
+        raise ValueError(args)
+    desde = date.fromisoformat(args[0])
+    hasta = date.fromisoformat(args[1]) if len(args) == 2 else desde
+    if hasta < desde:
+        desde, hasta = hasta, desde
+    return desde, hasta
+
+# Posición de cada tipo de evento en el Tramo (resumen, historial, repasos)
+FUENTE = {"resumen": 0, "estudiado": 1}
+
+def _render_calendario(titulo: str, registros: List[Dict[str, Any]]) -> str:
+    partes = [f"📅 **Calendario de Estudio y Repaso {titulo}**\n"]
+    fecha_actual = None
+    for item in registros:
+        fecha = item["fecha"] or "Sin fecha"
+        if fecha != fecha_actual:
+            fecha_actual = fecha
+            partes.append(f"\n🗓 `{fecha}`\n")
+        # Los días compactados solo conservan cuántos temas se estudiaron por materia
+        if item["tipo"] == "resumen":
+            partes.append(f" ✅ {item['materia']}: {item['total']} temas\n")
+            continue
+        # Icono distinto si es algo ya hecho o por hacer
+        icono = "✅" if item["tipo"] == "estudiado" else "🔄"
+        partes.append(f" {icono} {item['materia']}: {item['subtema']}\n")
+    return "".join(partes)
+
+def _consumidas(filas: List[Dict[str, Any]]) -> Tramo:
+    cuenta = [0, 0, 0]
+    for f in filas:
+        cuenta[FUENTE.get(f["tipo"], 2)] += 1
+    return tuple(cuenta)
+
+async def _pagina_calendario(ventana: Ventana, posicion: Tramo, direccion: str) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Como _pagina_temario, dentro de la ventana y con la posición repartida entre las tres fuentes."""
+    desde, hasta = (d.isoformat() if d else None for d in ventana)
+    titulo = _titulo_ventana(ventana)
+
+    async def producir():
+        if direccion == SIGUIENTE:
+            registros = await adb.obtener_cronograma(desde, hasta, posicion, FILAS_POR_PAGINA + 1)
+            filas, texto = ajustar(registros[:FILAS_POR_PAGINA], lambda f: _render_calendario(titulo, f))
+            inicio = posicion
+            fin = tuple(p + n for p, n in zip(posicion, _consumidas(filas)))
+            hay_mas = len(registros) > len(filas)
+        else:
+            # Las filas justo antes de la posición son las últimas de cada fuente antes de ella
+            atras = tuple(max(p - FILAS_POR_PAGINA, 0) for p in posicion)
+            registros = _primeras(
+                await adb.obtener_cronograma(desde, hasta, atras, FILAS_POR_PAGINA),
+                tuple(p - a for p, a in zip(posicion, atras)),
+            )
+            filas, texto = ajustar(registros[-FILAS_POR_PAGINA:], lambda f: _render_calendario(titulo, f), desde_el_final=True)
+            inicio = tuple(p - n for p, n in zip(posicion, _consumidas(filas)))
+            fin, hay_mas = posicion, True
+
+        clave = _clave_ventana(ventana)
+        if not filas:
+            if posicion == (0, 0, 0):
+                return f"📅 No hay nada en el calendario {titulo}.", None
+            return "📭 No hay más eventos en el calendario.", teclado(callback("c", clave, _tramo(posicion), ANTERIOR), None)
+        return texto, teclado(
+            callback("c", clave, _tramo(inicio), ANTERIOR) if any(inicio) else None,
+            callback("c", clave, _tramo(fin), SIGUIENTE) if hay_mas else None,
+        )
+    return await respuestas.obtener(("ver_calendario", desde, hasta, posicion, direccion), producir)
+
+def _primeras(registros: List[Dict[str, Any]], cuantas: Tramo) -> List[Dict[str, Any]]:
+    """Se queda con las primeras 'cuantas[i]' filas de cada fuente (el resto ya está en la página actual)."""
+    vistas = [0, 0, 0]
+    elegidas = []
     for r in registros:
-        fecha = r["fecha"] or "Sin fecha"
-        cronograma.setdefault(fecha, []).append(r)
-
-    msg = "📅 **Calendario de Estudio y Repaso**\n"
-    for fecha in sorted(cronograma.keys()):
-        msg += f"\n🗓 `{fecha}`\n"
-        for item in cronograma[fecha]:
-            # Icono distinto si es algo ya hecho o por hacer
-            icono = "✅" if item["tipo"] == "estudiado" else "🔄"
-            msg += f" {icono} {item['materia']}: {item['subtema']}\n"
-    
-    if len(msg) > 4000: # Por si el mensaje es muy largo para Telegram
-        for i in range(0, len(msg), 4000):
-            await update.message.reply_text(msg[i:i+4000], parse_mode='Markdown')
+        fuente = FUENTE.get(r["tipo"], 2)
+        if vistas[fuente] < cuantas[fuente]:
+            vistas[fuente] += 1
+            elegidas.append(r)
+    return elegidas
+
+def _titulo_ventana(ventana: Ventana) -> str:
+    desde, hasta = ventana
+    if desde is None and hasta is None:
+        return "completo"
+    if desde == hasta:
+        return f"del {desde.isoformat()}"
+    return f"del {desde.isoformat() if desde else '…'} al {hasta.isoformat() if hasta else '…'}"
+
+def _clave_ventana(ventana: Ventana) -> str:
+    # AAAAMMDD-AAAAMMDD para que quepa en la callback_data; '-' solo es sin límite
+    return "-".join(d.strftime("%Y%m%d") if d else "" for d in ventana)
+
+def _leer_ventana(clave: str) -> Ventana:
+    return tuple(datetime.strptime(p, "%Y%m%d").date() if p else None for p in clave.split("-"))
+
+def _tramo(posicion: Tramo) -> str:
+    return ".".join(str(p) for p in posicion)
+
+async def paginar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botones ◀️/▶️ de /temario (t:<materia>:<pos>:<dir>) y /ver_calendario (c:<ventana>:<r.h.p>:<dir>)."""
+    query = update.callback_query
+    partes = query.data.split(":")
+    if partes[0] == "t":
+        _, clave, posicion, direccion = partes
+        materia = next((m for m in await adb.obtener_materias_unicas() if clave_materia(m) == clave), None)
+        if materia is None:
+            await query.answer("Esa materia ya no existe.")
+            return
+        texto, botones = await _pagina_temario(materia, int(posicion), direccion)
     else:
-        await update.message.reply_text(msg, parse_mode='Markdown')
-
+        _, ventana, posicion, direccion = partes
+        texto, botones = await _pagina_calendario(
+            _leer_ventana(ventana), tuple(int(p) for p in posicion.split(".")), direccion
+        )
+
+    await query.answer()
+    try:
+        await query.edit_message_text(texto, parse_mode='Markdown', reply_markup=botones)
+    except BadRequest as e:
+        # Dos toques seguidos al mismo botón: el contenido ya es ese
+        if "not modified" not in str(e):
+            raise
+
+# --- Modo inline ---
+# Resultados por consulta (Telegram acepta hasta 50) y segundos que Telegram los guarda
+RESULTADOS_INLINE = 20
+CACHE_INLINE = 5
+COMANDOS_INLINE = ("estudiar", "dominado")
+
+async def autocompletar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    "@bot integ" propone los subtemas pendientes o por repasar que empiezan así (o con una
+    palabra que empieza así); elegir uno manda "/estudiar <subtema>" al chat. Con
+    "@bot dominado integ" manda "/dominado <subtema>". Se responde desde el índice en
+    memoria, sin consultar la base. Requiere activar el modo inline con @BotFather.
+    """
+    consulta = update.inline_query.query.strip()
+    comando = "estudiar"
+    primera, _, resto = consulta.partition(" ")
+    if primera.lstrip("/").lower() in COMANDOS_INLINE:
+        comando, consulta = primera.lstrip("/").lower(), resto.strip()
+
+    coincidencias = await adb.autocompletar_subtemas(consulta, RESULTADOS_INLINE)
+    texto_comando = f"/{comando}"
+    resultados = [
+        InlineQueryResultArticle(
+            id=str(i),
+            title=c["subtema"],
+            description=f"{c['materia']} → {c['tema']} · {c['tipo']}",
+            input_message_content=InputTextMessageContent(
+                f"{texto_comando} {c['subtema']}",
+                # Sin la entidad explícita, el mensaje enviado vía inline podría no contar como comando
+                entities=[MessageEntity(MessageEntity.BOT_COMMAND, 0, len(texto_comando))],
+            ),
+        )
+        for i, c in enumerate(coincidencias)
+    ]
+    await update.inline_query.answer(resultados, cache_time=CACHE_INLINE, is_personal=True)
 
 async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("🤔 No entendí. Usa /start para ver los comandos.")
\ No newline at end of file
+    await update.message.reply_text("🤔 No entendí. Usa /start para ver los comandos.")
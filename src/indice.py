@@ -0,0 +1,356 @@
+# src/indice.py
+"""
+Índice en memoria de los subtemas activos (pendiente/repasar) para resolver nombres a
+su forma guardada sin consultar la base. Los nombres se comparan normalizados (sin mayúsculas, acentos ni
+espacios de más) y, si no hay coincidencia, los trigramas dan sugerencias ordenadas
+por parecido ("¿quisiste decir...?").
+IndiceSubtemas envuelve al manager asíncrono: carga el índice por páginas, lo
+actualiza con cada escritura que pasa por él y lo recarga pasado INDICE_TTL para ver
+los cambios hechos fuera del bot.
+Para el modo inline, una lista ordenada de fragmentos (el nombre desde cada palabra)
+responde "nombres que empiezan o tienen una palabra que empieza así" con bisect.
+"""
+import asyncio
+import bisect
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .almacen import Triple
+from .metricas import CUBETAS_RAPIDAS, registro
+
+# Tipos que /estudiar puede procesar
+TIPOS_ACTIVOS = ("repasar", "pendiente")
+# Candidatos (por trigramas compartidos) que se puntúan antes de ordenar las sugerencias
+MAX_CANDIDATOS = 200
+# Parecido mínimo (coeficiente de Dice sobre trigramas) para sugerir un nombre
+MIN_PARECIDO = 0.3
+# Fragmentos que se recorren como máximo por búsqueda de autocompletado
+MAX_ESCANEO = 500
+
+registro.histograma("autocompletar_segundos", "Latencia de una búsqueda de autocompletado en el índice")
+
+def normalizar(texto: str) -> str:
+    """'  Cálculo   INTEGRAL ' -> 'calculo integral'."""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_acentos.casefold().split())
+
+def fragmentos(normalizado: str) -> List[str]:
+    """'integral de riemann' -> ['integral de riemann', 'de riemann', 'riemann']."""
+    return [normalizado[i:] for i in range(len(normalizado)) if i == 0 or normalizado[i - 1] == " "]
+
+def trigramas(normalizado: str) -> Set[str]:
+    # Relleno como pg_trgm: dos espacios al inicio y uno al final de cada palabra
+    return {
+        palabra[i:i + 3]
+        for palabra in (f"  {p} " for p in normalizado.split())
+        for i in range(len(palabra) - 2)
+    }
+
+class IndiceNombres:
+    """
+    Estructura del índice, sin E/S. Cada subtema se identifica por su tripleta
+    (materia, tema, subtema), única en el estado. Los nombres normalizados se numeran y
+    las listas de trigramas guardan esos números (8 bytes por entrada en vez de un set).
+    """
+
+    def __init__(self):
+        # tripleta -> tipo
+        self._tipos: Dict[Triple, str] = {}
+        # nombre normalizado <-> número, y número -> tripletas con ese nombre (en orden de alta)
+        self._numeros: Dict[str, int] = {}
+        self._nombres: Dict[int, str] = {}
+        self._claves: Dict[int, Dict[Triple, None]] = {}
+        self._siguiente = 0
+        # trigrama -> números de los nombres que lo contienen
+        self._trigramas: Dict[str, List[int]] = {}
+        # (fragmento, número) ordenados, para buscar por prefijo
+        self._fragmentos: List[Tuple[str, int]] = []
+        self._en_lote = False
+
+    def __len__(self) -> int:
+        return len(self._tipos)
+
+    def __contains__(self, clave: Triple) -> bool:
+        return clave in self._tipos
+
+    def agregar(self, materia: str, tema: str, subtema: str, tipo: str) -> None:
+        """Alta o cambio de tipo; los tipos que no están activos salen del índice."""
+        clave = (materia, tema, subtema)
+        if tipo not in TIPOS_ACTIVOS:
+            self.quitar(clave)
+            return
+        if clave not in self._tipos:
+            nombre = normalizar(subtema)
+            numero = self._numeros.get(nombre)
+            if numero is None:
+                numero = self._numeros[nombre] = self._siguiente
+                self._siguiente += 1
+                self._nombres[numero] = nombre
+                self._claves[numero] = {}
+                for g in trigramas(nombre):
+                    self._trigramas.setdefault(g, []).append(numero)
+                for f in fragmentos(nombre):
+                    if self._en_lote:
+                        self._fragmentos.append((f, numero))
+                    else:
+                        bisect.insort(self._fragmentos, (f, numero))
+            self._claves[numero][clave] = None
+        self._tipos[clave] = tipo
+
+    def cargar(self, filas: Iterable[Tuple[str, str, str, str]]) -> None:
+        """Alta masiva de (materia, tema, subtema, tipo): los fragmentos se ordenan una vez al final."""
+        self._en_lote = True
+        try:
+            for fila in filas:
+                self.agregar(*fila)
+        finally:
+            self._en_lote = False
+            self._fragmentos.sort()
+
+    def quitar(self, clave: Triple) -> None:
+        if self._tipos.pop(clave, None) is None:
+            return
+        nombre = normalizar(clave[2])
+        numero = self._numeros[nombre]
+        claves = self._claves[numero]
+        del claves[clave]
+        if claves:
+            return
+        del self._numeros[nombre]
+        del self._nombres[numero]
+        del self._claves[numero]
+        for g in trigramas(nombre):
+            numeros = self._trigramas[g]
+            numeros.remove(numero)
+            if not numeros:
+                del self._trigramas[g]
+        for f in fragmentos(nombre):
+            del self._fragmentos[bisect.bisect_left(self._fragmentos, (f, numero))]
+
+    def quitar_donde(self, campo: str, valor: str) -> None:
+        """Baja de las tripletas con materia, tema o subtema exactamente igual a 'valor'."""
+        posicion = ("materia", "tema", "subtema").index(campo)
+        for clave in [c for c in self._tipos if c[posicion] == valor]:
+            self.quitar(clave)
+
+    def buscar(self, nombre: str) -> Optional[str]:
+        """
+        Nombre guardado que coincide con 'nombre' normalizado, o None. Si varios subtemas
+        comparten nombre se prefiere un repaso, como en la RPC procesar_estudio_lote.
+        """
+        numero = self._numeros.get(normalizar(nombre))
+        return None if numero is None else self._elegir(numero)[2]
+
+    def _elegir(self, numero: int) -> Triple:
+        claves = self._claves[numero]
+        return next((c for c in claves if self._tipos[c] == "repasar"), next(iter(claves)))
+
+    def sugerir(self, nombre: str, cantidad: int = 3) -> List[str]:
+        """
+        Hasta 'cantidad' nombres parecidos, del más al menos parecido. Los candidatos salen
+        de la mitad más rara de los trigramas buscados (los comunes, como ' de', casi no
+        distinguen y son los que más cuesta contar); el parecido final usa todos.
+        """
+        buscado = normalizar(nombre)
+        grams = trigramas(buscado)
+        if not grams:
+            return []
+        listas = sorted((self._trigramas.get(g, ()) for g in grams), key=len)
+        compartidos: Counter = Counter()
+        for numeros in listas[:(len(listas) + 1) // 2]:
+            compartidos.update(numeros)
+
+        puntajes = []
+        for numero, _ in compartidos.most_common(MAX_CANDIDATOS):
+            candidato = self._nombres[numero]
+            otros = trigramas(candidato)
+            parecido = 2 * len(grams & otros) / (len(grams) + len(otros))
+            if parecido >= MIN_PARECIDO and candidato != buscado:
+                puntajes.append((-parecido, numero))
+        puntajes.sort()
+        return [self._elegir(numero)[2] for _, numero in puntajes[:cantidad]]
+
+    def completar(self, prefijo: str, limite: int = 20) -> List[Dict[str, str]]:
+        """
+        Subtemas cuyo nombre, o alguna de sus palabras, empieza con 'prefijo' (normalizado):
+        primero los que empiezan así, luego el resto, cada grupo en orden alfabético.
+        Se recorren a lo sumo MAX_ESCANEO fragmentos, así que un prefijo muy corto da
+        una muestra y no todos los nombres.
+        """
+        buscado = normalizar(prefijo)
+        if not buscado:
+            return []
+        elegidos: Dict[int, bool] = {}
+        i = bisect.bisect_left(self._fragmentos, (buscado,))
+        for fragmento, numero in self._fragmentos[i:i + MAX_ESCANEO]:
+            if not fragmento.startswith(buscado):
+                break
+            elegidos[numero] = elegidos.get(numero, False) or fragmento == self._nombres[numero]
+        orden = sorted(elegidos, key=lambda n: (not elegidos[n], self._nombres[n]))
+
+        salida = []
+        for numero in orden[:limite]:
+            materia, tema, subtema = clave = self._elegir(numero)
+            salida.append({"materia": materia, "tema": tema, "subtema": subtema, "tipo": self._tipos[clave]})
+        return salida
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {
+            "subtemas": len(self._tipos),
+            "nombres": len(self._numeros),
+            "trigramas": len(self._trigramas),
+            "fragmentos": len(self._fragmentos),
+        }
+
+class IndiceSubtemas:
+    """
+    Envoltura de un manager asíncrono con el índice de nombres delante. Los métodos sin
+    relación con el índice se delegan tal cual. Una escritura que no dice qué filas tocó
+    (eliminar_por_id) o que falla deja el índice para recargar en el siguiente uso.
+    """
+
+    def __init__(self, base, ttl: float):
+        self._base = base
+        self.ttl = ttl
+        self._indice = IndiceNombres()
+        self._expira_en = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        # Se incrementa en cada escritura para no quedarse con una carga que se cruzó con ella
+        self._generacion = 0
+        self.cargas = 0
+        self.resueltos = 0
+        self.no_encontrados = 0
+
+    def __getattr__(self, nombre: str):
+        return getattr(self._base, nombre)
+
+    async def _listo(self) -> IndiceNombres:
+        if self._expira_en > time.monotonic():
+            return self._indice
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Otra llamada pudo recargarlo mientras se esperaba el lock
+            if self._expira_en > time.monotonic():
+                return self._indice
+            # Se repite solo si una escritura se cruzó con la carga; con ttl <= 0 se
+            # recarga una vez por llamada
+            while True:
+                generacion = self._generacion
+                filas = await self._base.obtener_todos_registros()
+                indice = IndiceNombres()
+                indice.cargar((f["materia"], f["tema"], f["subtema"], f["tipo"]) for f in filas)
+                self._indice = indice
+                self.cargas += 1
+                if generacion == self._generacion:
+                    self._expira_en = time.monotonic() + self.ttl
+                    return self._indice
+
+    def _caducar(self) -> None:
+        self._generacion += 1
+        self._expira_en = 0.0
+
+    # --- Consultas ---
+    async def resolver_subtemas(self, nombres: List[str], sugerencias: int = 3) -> List[Tuple[str, Optional[str], List[str]]]:
+        """
+        Por cada nombre pedido: (nombre, nombre guardado o None, sugerencias si no se encontró).
+        Que no esté en el índice no prueba que no exista (cambios hechos fuera del bot,
+        patrones con '%'): quien llama debe seguir preguntando al servidor por esos nombres.
+        """
+        indice = await self._listo()
+        salida = []
+        for nombre in nombres:
+            encontrado = indice.buscar(nombre)
+            if encontrado is None:
+                self.no_encontrados += 1
+                salida.append((nombre, None, indice.sugerir(nombre, sugerencias)))
+            else:
+                self.resueltos += 1
+                salida.append((nombre, encontrado, []))
+        return salida
+
+    async def autocompletar_subtemas(self, prefijo: str, limite: int = 20) -> List[Dict[str, str]]:
+        """Subtemas activos para el modo inline (ver IndiceNombres.completar)."""
+        indice = await self._listo()
+        t0 = time.perf_counter()
+        try:
+            return indice.completar(prefijo, limite)
+        finally:
+            registro.observar("autocompletar_segundos", time.perf_counter() - t0, CUBETAS_RAPIDAS)
+
+    def estadisticas_indice(self) -> Dict[str, int]:
+        return {
+            **self._indice.estadisticas(),
+            "cargas": self.cargas,
+            "resueltos": self.resueltos,
+            "no_encontrados": self.no_encontrados,
+        }
+
+    # --- Escrituras que mantienen el índice ---
+    async def insertar_registro(self, data: Dict[str, Any]) -> None:
+        await self.insertar_registros([data])
+
+    async def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        try:
+            await self._base.insertar_registros(filas)
+        except Exception:
+            self._caducar()
+            raise
+        self._generacion += 1
+        for f in filas:
+            clave = (f["materia"], f["tema"], f["subtema"])
+            # El estado ignora tripletas repetidas y lo estudiado va al historial
+            if f.get("tipo") in TIPOS_ACTIVOS and clave not in self._indice:
+                self._indice.agregar(*clave, f["tipo"])
+
+    async def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        r = (await self.procesar_estudio_lote([subtema], hoy))[0]
+        return {"anterior": r["anterior"], "nuevo": r["nuevo"]} if r["anterior"] else None
+
+    async def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        try:
+            resultados = await self._base.procesar_estudio_lote(subtemas, hoy)
+        except Exception:
+            self._caducar()
+            raise
+        self._generacion += 1
+        for r in resultados:
+            anterior, nuevo = r["anterior"], r["nuevo"]
+            if anterior:
+                clave = (anterior["materia"], anterior["tema"], anterior["subtema"])
+                if nuevo:
+                    self._indice.agregar(*clave, nuevo["tipo"])
+                else:
+                    self._indice.quitar(clave)
+        return resultados
+
+    async def marcar_como_dominado(self, subtema: str) -> bool:
+        return subtema in await self.marcar_dominados([subtema])
+
+    async def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        try:
+            dominados = await self._base.marcar_dominados(subtemas)
+        except Exception:
+            self._caducar()
+            raise
+        self._generacion += 1
+        for subtema in dominados:
+            self._indice.quitar_donde("subtema", subtema)
+        return dominados
+
+    async def eliminar_por_id(self, registro_id: int) -> None:
+        try:
+            await self._base.eliminar_por_id(registro_id)
+        finally:
+            self._caducar()
+
+    async def eliminar_por_campo(self, campo: str, valor: str) -> None:
+        try:
+            await self._base.eliminar_por_campo(campo, valor)
+        except Exception:
+            self._caducar()
+            raise
+        self._generacion += 1
+        self._indice.quitar_donde(campo, valor)
@@ -1,13 +1,25 @@
 # src/main.py
 import asyncio
+import atexit
+import contextvars
+import threading
 import traceback
 import logging
-from flask import Flask, request
+from typing import List, Optional
+from flask import Flask, Response, request
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, InlineQueryHandler, MessageHandler, filters
 from waitress import serve
 
+from .cola import AlmacenCola, ColaUpdates, update_valido
 from .config import settings
+from .database import adb, espejo
+from .despacho import ColaLlena
+from .duplicados import deduplicador
+from .envios import crear_limitador
+from .metricas import RequestMedido, medir_handler, medir_update, nombre_comando, registro
+from .perfilado import CABECERA as CABECERA_PERFIL, perfilador
+from .pool import pool
 from . import handlers
 
 # Configuración de logs
@@ -19,36 +31,176 @@ logger = logging.getLogger(__name__)
 
 flask_app = Flask(__name__)
 
+COMANDOS = [
+    ("start", handlers.start),
+    ("agregar_temas", handlers.agregar_temas),
+    ("estudiar_temas", handlers.estudiar_temas),
+    ("estudiar", handlers.estudiar),
+    ("dominado", handlers.dominado),
+    ("repasar", handlers.repasar),
+    ("temasFaltantes", handlers.metricas_globales),
+    ("materias_metricas", handlers.metricas_materia),
+    ("eliminar", handlers.eliminar),
+    ("materias", handlers.listar_materias),
+    ("temario", handlers.listar_temario),
+    ("ver_calendario", handlers.ver_calendario),
+]
+
 def build_application():
-    """Construye una instancia nueva de la App para cada petición."""
-    app = Application.builder().token(settings.TELEGRAM_TOKEN).build()
+    """Construye la App de Telegram con todos los handlers registrados (y medidos)."""
+    builder = (
+        Application.builder()
+        .token(settings.TELEGRAM_TOKEN)
+        .base_url(settings.TELEGRAM_API_URL)
+        # Varias conexiones: los envíos de updates distintos no se esperan entre sí
+        .request(RequestMedido(connection_pool_size=settings.ENVIOS_CONEXIONES))
+    )
+    if settings.ENVIOS_LIMITAR:
+        limitador = crear_limitador()
+        builder = builder.rate_limiter(limitador)
+        registro.agregar_colector("envios", limitador.estadisticas)
+    app = builder.build()
 
     # Registro de Handlers
-    app.add_handler(CommandHandler("start", handlers.start))
-    app.add_handler(CommandHandler("agregar_temas", handlers.agregar_temas))
-    app.add_handler(CommandHandler("estudiar_temas", handlers.estudiar_temas))
-    app.add_handler(CommandHandler("estudiar", handlers.estudiar))
-    app.add_handler(CommandHandler("dominado", handlers.dominado))
-    app.add_handler(CommandHandler("repasar", handlers.repasar))
-    app.add_handler(CommandHandler("temasFaltantes", handlers.metricas_globales))
-    app.add_handler(CommandHandler("materias_metricas", handlers.metricas_materia))
-    app.add_handler(CommandHandler("eliminar", handlers.eliminar))
-    app.add_handler(CommandHandler("materias", handlers.listar_materias))
-    app.add_handler(CommandHandler("temario", handlers.listar_temario))
-    app.add_handler(CommandHandler("ver_calendario", handlers.ver_calendario))
+    for comando, handler in COMANDOS:
+        app.add_handler(CommandHandler(comando, medir_handler(comando, handler)))
+    # Botones de navegación de las vistas paginadas
+    app.add_handler(CallbackQueryHandler(medir_handler("paginar", handlers.paginar), pattern=r"^[tc]:"))
+    # Autocompletado de subtemas en modo inline (@bot texto)
+    app.add_handler(InlineQueryHandler(medir_handler("inline", handlers.autocompletar)))
     # Handler por defecto
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.unknown))
-    
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, medir_handler("texto", handlers.unknown)))
+    app.add_error_handler(registrar_error)
+
     return app
 
-async def process_update_async(update_data):
-    """Procesa el update en un contexto asíncrono aislado."""
-    bot_app = build_application()
-    
-    # 'async with' gestiona el inicio y cierre correcto de la conexión
-    async with bot_app:
-        update = Update.de_json(update_data, bot_app.bot)
-        await bot_app.process_update(update)
+# Errores de los handlers del update en curso. PTB los atrapa y los entrega al error
+# handler; aquí se recogen para que la cola de trabajo pueda reintentar el update.
+_errores_update: contextvars.ContextVar[Optional[List[BaseException]]] = contextvars.ContextVar("errores_update", default=None)
+
+async def registrar_error(update, context) -> None:
+    logger.error(f"Error procesando update: {context.error}", exc_info=context.error)
+    errores = _errores_update.get()
+    if errores is not None:
+        errores.append(context.error)
+
+def crear_cola(app) -> ColaUpdates:
+    """Cola de trabajo cuyos trabajadores procesan los updates con la App dada."""
+    return ColaUpdates(
+        lambda data, **opciones: process_update_async(app, data, **opciones),
+        AlmacenCola(settings.COLA_RUTA),
+        trabajadores=settings.TRABAJADORES,
+        max_pendientes=settings.COLA_MAXIMA,
+        max_intentos=settings.COLA_INTENTOS,
+        espera_reintento=settings.COLA_ESPERA_REINTENTO,
+        timeout=settings.UPDATE_TIMEOUT,
+    )
+
+async def cerrar_aplicacion(app) -> None:
+    """Detiene el espejo, cierra la App y el cliente asíncrono de Supabase del ciclo actual."""
+    if espejo is not None:
+        await espejo.detener()
+    await app.shutdown()
+    await pool.cerrar_async()
+
+class BotRuntime:
+    """
+    Mantiene una única Application inicializada durante toda la vida del proceso.
+    Corre sobre un ciclo de eventos dedicado en un hilo de fondo; los hilos de
+    waitress le entregan los updates con run_coroutine_threadsafe.
+    """
+
+    def __init__(self, timeout: float = settings.UPDATE_TIMEOUT):
+        self.timeout = timeout
+        self.app = None
+        self.cola: Optional[ColaUpdates] = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self) -> bool:
+        return self._loop is not None and self.app is not None
+
+    def iniciar(self) -> None:
+        """Arranca el ciclo de fondo e inicializa la App una sola vez (idempotente)."""
+        with self._lock:
+            if self.activo:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="bot-loop", daemon=True)
+            thread.start()
+            try:
+                app = build_application()
+                asyncio.run_coroutine_threadsafe(app.initialize(), loop).result(self.timeout)
+                if settings.COLA_TRABAJO:
+                    self.cola = crear_cola(app)
+                    asyncio.run_coroutine_threadsafe(self.cola.iniciar(), loop).result(self.timeout)
+                    registro.agregar_colector("cola_updates", self.cola.estadisticas)
+                if espejo is not None:
+                    loop.call_soon_threadsafe(espejo.iniciar)
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                raise
+            self.app, self._loop, self._thread = app, loop, thread
+            logger.info("Application inicializada en el ciclo de fondo.")
+
+    def procesar(self, update_data, perfilar: bool = False) -> None:
+        """Entrega un update al ciclo de fondo y espera a que termine de procesarse."""
+        if not self.activo:
+            self.iniciar()
+        futuro = asyncio.run_coroutine_threadsafe(process_update_async(self.app, update_data, perfilar), self._loop)
+        futuro.result(self.timeout)
+
+    def encolar(self, update_data, perfilar: bool = False) -> None:
+        """Deja el update en la cola de trabajo y vuelve sin esperar a que se procese."""
+        if not self.activo:
+            self.iniciar()
+        self.cola.encolar(update_data, perfilar=perfilar)
+
+    def detener(self) -> None:
+        """Vacía la cola de trabajo, cierra la App (sesiones HTTP incluidas) y detiene el ciclo de fondo."""
+        with self._lock:
+            if not self.activo:
+                return
+            app, loop, thread, cola = self.app, self._loop, self._thread, self.cola
+            self.app = self._loop = self._thread = self.cola = None
+            try:
+                if cola is not None:
+                    asyncio.run_coroutine_threadsafe(cola.detener(self.timeout), loop).result(self.timeout + 5)
+                    cola.almacen.cerrar()
+                asyncio.run_coroutine_threadsafe(cerrar_aplicacion(app), loop).result(self.timeout)
+            except Exception as e:
+                logger.error(f"Error al cerrar la Application: {e}")
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+                logger.info("Ciclo de fondo detenido.")
+
+async def process_update_async(bot_app, update_data, perfilar: bool = False):
+    """Procesa el update con la App ya inicializada (bajo cProfile si corresponde)."""
+    update = Update.de_json(update_data, bot_app.bot)
+
+    def procesar():
+        return medir_update(update, lambda: bot_app.process_update(update))
+
+    errores: List[BaseException] = []
+    token = _errores_update.set(errores)
+    try:
+        if perfilador.toca(perfilar):
+            await perfilador.perfilar(update.update_id, nombre_comando(update), procesar)
+        else:
+            await procesar()
+    finally:
+        _errores_update.reset(token)
+    if errores:
+        raise errores[0]
+
+runtime = BotRuntime()
+atexit.register(runtime.detener)
 
 @flask_app.route('/webhook', methods=['POST'])
 def webhook():
@@ -56,11 +208,25 @@ def webhook():
         try:
             update_data = request.get_json(force=True)
             if not update_data: return 'No data', 400
+            if not update_valido(update_data): return 'Update inválido', 400
+            if not deduplicador.nuevo(update_data['update_id']):
+                # Reenvío de Telegram de un update ya recibido: no se vuelve a procesar
+                return 'Duplicado', 200
             
-            # Ejecución segura del bot
-            asyncio.run(process_update_async(update_data))
+            # Se delega al ciclo de fondo donde vive la App
+            perfilar = perfilador.pedido_por_cabecera(request.headers.get(CABECERA_PERFIL))
+            if settings.COLA_TRABAJO:
+                # Respuesta inmediata: los trabajadores de la cola lo procesan después
+                runtime.encolar(update_data, perfilar)
+            else:
+                runtime.procesar(update_data, perfilar)
                 
             return 'OK', 200
+        except ColaLlena as e:
+            # Telegram reintenta lo que no recibe 2xx: así la cola deja de crecer
+            logger.warning(f"Webhook rechazado por contrapresión: {e}")
+            deduplicador.olvidar(update_data['update_id'])
+            return 'Saturado', 503, {'Retry-After': '1'}
         except Exception as e:
             logger.error(f"Error crítico en webhook: {e}")
             traceback.print_exc()
@@ -70,9 +236,31 @@ def webhook():
 def health_check():
     return 'Bot activo 🚀', 200
 
+# Valores instantáneos que acompañan a los histogramas en /metrics
+registro.agregar_colector("pool_supabase", pool.estadisticas)
+registro.agregar_colector("espejo" if espejo is not None else "cache_lectura", adb.estadisticas)
+registro.agregar_colector("indice_subtemas", adb.estadisticas_indice)
+registro.agregar_colector("cache_respuestas", handlers.respuestas.estadisticas)
+registro.agregar_colector("updates_duplicados", deduplicador.estadisticas)
+
+@flask_app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
 def main():
     print(f"Iniciando servidor en puerto {settings.PORT}...")
-    serve(flask_app, host='0.0.0.0', port=settings.PORT)
+    if settings.SERVIDOR == "asgi":
+        from .asgi import servir
+        servir()
+        return
+
+    runtime.iniciar()
+    try:
+        serve(flask_app, host='0.0.0.0', port=settings.PORT)
+    finally:
+        runtime.detener()
+        pool.cerrar()
+        deduplicador.cerrar()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
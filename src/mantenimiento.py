@@ -0,0 +1,55 @@
+# src/mantenimiento.py
+"""
+Tareas de mantenimiento de la base de datos.
+
+Uso:
+    python -m src.mantenimiento reconciliar [--solo-revisar]
+    python -m src.mantenimiento compactar [--dias N] [--aplicar]
+"""
+import argparse
+from .config import settings
+from .database import db
+
+def reconciliar(aplicar: bool) -> int:
+    """Compara los contadores de progreso con la tabla base e informa los desvíos."""
+    desvios = db.reconciliar_progreso(aplicar)
+    if not desvios:
+        print("✅ Contadores de progreso al día.")
+        return 0
+
+    print(f"⚠️ {len(desvios)} desvíos encontrados:")
+    for d in desvios:
+        print(f"   {d['materia']} / {d['tipo']}: esperado {d['esperado']}, registrado {d['registrado']}")
+    print("🔧 Contadores reconstruidos." if aplicar else "ℹ️ Solo revisión: no se modificó nada.")
+    return 1
+
+def compactar(dias: int, aplicar: bool) -> int:
+    """Resume el historial anterior al horizonte; por defecto solo simula."""
+    rep = db.compactar_historial(dias, simular=not aplicar)
+    modo = "Compactación aplicada" if aplicar else "Simulación (usa --aplicar para ejecutar)"
+    print(f"🗜 {modo}: historial anterior a {rep['corte']}")
+    print(f"   Filas de detalle eliminadas: {rep['filas_eliminadas']}")
+    print(f"   Filas de resumen (día/materia): {rep['filas_resumen']}")
+    print(f"   Bytes liberados (aprox.): {rep['bytes_liberados']}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    tareas = parser.add_subparsers(dest="tarea", required=True)
+
+    p_rec = tareas.add_parser("reconciliar", help="Reconstruye los contadores de progreso por materia")
+    p_rec.add_argument("--solo-revisar", action="store_true", help="Solo informa los desvíos, sin corregirlos")
+
+    p_comp = tareas.add_parser("compactar", help="Resume por día y materia el historial antiguo")
+    p_comp.add_argument("--dias", type=int, default=settings.HISTORIAL_DIAS_DETALLE,
+                        help="Días recientes que conservan el detalle completo")
+    p_comp.add_argument("--aplicar", action="store_true", help="Ejecuta la compactación (por defecto solo simula)")
+
+    args = parser.parse_args()
+    if args.tarea == "reconciliar":
+        raise SystemExit(reconciliar(not args.solo_revisar))
+    if args.tarea == "compactar":
+        raise SystemExit(compactar(args.dias, args.aplicar))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# src/metricas.py
+"""
+Instrumentación en proceso: histogramas de latencia por handler, por método de base
+de datos y por llamada a la Bot API, más las idas a Supabase de cada update.
+Todo se exporta en formato de texto de Prometheus en la ruta /metrics.
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from telegram import Update
+from telegram.request import HTTPXRequest
+
+PREFIJO = "estudios"
+# Mismos límites por defecto que los clientes oficiales de Prometheus (segundos)
+CUBETAS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Para búsquedas en memoria, que se miden en fracciones de milisegundo
+CUBETAS_RAPIDAS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+CUBETAS_CONTEO = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+class Histograma:
+    def __init__(self, cubetas: Tuple[float, ...]):
+        self.cubetas = cubetas
+        self.conteos = [0] * len(cubetas)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        # Se guarda por cubeta exacta; la exportación acumula como pide Prometheus
+        i = bisect.bisect_left(self.cubetas, valor)
+        if i < len(self.conteos):
+            self.conteos[i] += 1
+        self.suma += valor
+        self.total += 1
+
+class RegistroMetricas:
+    """Histogramas por (nombre, etiquetas) y valores instantáneos leídos al exportar."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas: Dict[str, Dict[Etiquetas, Histograma]] = {}
+        self._ayudas: Dict[str, str] = {}
+        self._colectores: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def histograma(self, nombre: str, ayuda: str) -> None:
+        self._ayudas[nombre] = ayuda
+        self._histogramas.setdefault(nombre, {})
+
+    def observar(self, nombre: str, valor: float, cubetas: Tuple[float, ...] = CUBETAS_LATENCIA, **etiquetas: str) -> None:
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._histogramas.setdefault(nombre, {})
+            h = serie.get(clave)
+            if h is None:
+                h = serie[clave] = Histograma(cubetas)
+            h.observar(valor)
+
+    def agregar_colector(self, nombre: str, leer: Callable[[], Dict[str, Any]]) -> None:
+        """Registra (o reemplaza) una función que devuelve {clave: número}; se exporta como gauge nombre{clave=...}."""
+        self._colectores[nombre] = leer
+
+    def exportar(self) -> str:
+        lineas = []
+        with self._lock:
+            for nombre, serie in self._histogramas.items():
+                completo = f"{PREFIJO}_{nombre}"
+                if nombre in self._ayudas:
+                    lineas.append(f"# HELP {completo} {self._ayudas[nombre]}")
+                lineas.append(f"# TYPE {completo} histogram")
+                for clave, h in serie.items():
+                    acumulado = 0
+                    for limite, n in zip(h.cubetas, h.conteos):
+                        acumulado += n
+                        lineas.append(f"{completo}_bucket{_formato(clave + (('le', _numero(limite)),))} {acumulado}")
+                    lineas.append(f"{completo}_bucket{_formato(clave + (('le', '+Inf'),))} {h.total}")
+                    lineas.append(f"{completo}_sum{_formato(clave)} {h.suma}")
+                    lineas.append(f"{completo}_count{_formato(clave)} {h.total}")
+
+        for nombre, leer in list(self._colectores.items()):
+            completo = f"{PREFIJO}_{nombre}"
+            lineas.append(f"# TYPE {completo} gauge")
+            for clave, valor in leer().items():
+                lineas.append(f"{completo}{_formato((('clave', clave),))} {valor}")
+        return "\n".join(lineas) + "\n"
+
+def _numero(valor: float) -> str:
+    return repr(float(valor))
+
+def _formato(etiquetas: Etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for k, v in etiquetas:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+registro = RegistroMetricas()
+registro.histograma("handler_segundos", "Latencia de cada handler de comando")
+registro.histograma("update_segundos", "Latencia total de un update, por comando")
+registro.histograma("db_segundos", "Latencia de cada método de acceso a datos, visto desde el bot")
+registro.histograma("telegram_segundos", "Latencia de cada llamada saliente a la Bot API")
+registro.histograma("supabase_idas_por_update", "Peticiones HTTP a Supabase hechas al procesar un update")
+
+# --- Idas a Supabase por update ---
+# Contador del update en curso; las tareas y hilos que lanza heredan el contexto
+_idas_update: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("idas_update", default=None)
+
+def contar_ida_supabase() -> None:
+    idas = _idas_update.get()
+    if idas is not None:
+        idas[0] += 1
+
+def nombre_comando(update: Update) -> str:
+    """'estudiar' para '/estudiar@bot x', 'texto' para mensajes libres, o el tipo de update."""
+    mensaje = update.effective_message
+    if update.callback_query:
+        return "callback"
+    if update.inline_query:
+        return "inline"
+    if mensaje and mensaje.text and mensaje.text.startswith('/'):
+        return mensaje.text.split()[0][1:].split('@')[0]
+    return "texto" if mensaje else "otro"
+
+async def medir_update(update: Update, procesar: Callable[[], Any]) -> None:
+    """Ejecuta el procesamiento de un update registrando su latencia y sus idas a Supabase."""
+    comando = nombre_comando(update)
+    idas = [0]
+    token = _idas_update.set(idas)
+    t0 = time.perf_counter()
+    try:
+        await procesar()
+    finally:
+        registro.observar("update_segundos", time.perf_counter() - t0, comando=comando)
+        registro.observar("supabase_idas_por_update", idas[0], CUBETAS_CONTEO, comando=comando)
+        _idas_update.reset(token)
+
+# --- Envolturas ---
+def medir_handler(nombre: str, handler):
+    @functools.wraps(handler)
+    async def envoltura(update, context):
+        t0 = time.perf_counter()
+        try:
+            return await handler(update, context)
+        finally:
+            registro.observar("handler_segundos", time.perf_counter() - t0, handler=nombre)
+    return envoltura
+
+# Diagnóstico, no acceso a datos: /metrics los lee en cada scrape
+_SIN_MEDIR = {"estadisticas", "estadisticas_pool", "estadisticas_indice"}
+
+class Medido:
+    """Envuelve un manager de datos (síncrono o asíncrono) y mide cada método público."""
+
+    def __init__(self, base):
+        self._base = base
+
+    def __getattr__(self, nombre: str):
+        atributo = getattr(self._base, nombre)
+        if nombre.startswith('_') or nombre in _SIN_MEDIR or not callable(atributo):
+            return atributo
+
+        if asyncio.iscoroutinefunction(atributo):
+            @functools.wraps(atributo)
+            async def medido_async(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await atributo(*args, **kwargs)
+                finally:
+                    registro.observar("db_segundos", time.perf_counter() - t0, metodo=nombre)
+            return medido_async
+
+        @functools.wraps(atributo)
+        def medido(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return atributo(*args, **kwargs)
+            finally:
+                registro.observar("db_segundos", time.perf_counter() - t0, metodo=nombre)
+        return medido
+
+class RequestMedido(HTTPXRequest):
+    """HTTPXRequest de PTB que mide cada llamada a la Bot API por método (sendMessage, ...)."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            registro.observar("telegram_segundos", time.perf_counter() - t0, metodo=url.rsplit('/', 1)[-1])
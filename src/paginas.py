@@ -0,0 +1,58 @@
+# src/paginas.py
+"""
+Piezas de las vistas paginadas (/temario, /ver_calendario): recorte de una página a
+filas completas dentro del límite de Telegram, teclado de navegación y callback_data.
+La callback_data (máx. 64 bytes) lleva todo lo necesario para pedir la página vecina,
+así que los botones siguen funcionando después de un reinicio.
+"""
+import hashlib
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from .envios import MAX_MENSAJE
+
+T = TypeVar("T")
+
+MAX_CALLBACK = 64
+# Dirección en la callback_data: página que empieza en la posición o que termina justo antes
+SIGUIENTE = "s"
+ANTERIOR = "a"
+
+def clave_materia(materia: str) -> str:
+    """Identificador corto y estable de una materia para la callback_data."""
+    return hashlib.sha1(materia.encode()).hexdigest()[:10]
+
+def callback(*partes: object) -> str:
+    datos = ":".join(str(p) for p in partes)
+    if len(datos.encode()) > MAX_CALLBACK:
+        raise ValueError(f"callback_data de más de {MAX_CALLBACK} bytes: {datos}")
+    return datos
+
+def ajustar(filas: Sequence[T], render: Callable[[Sequence[T]], str], desde_el_final: bool = False,
+            limite: int = MAX_MENSAJE) -> Tuple[List[T], str]:
+    """
+    Quita filas completas (del final, o del principio si 'desde_el_final') hasta que el
+    texto quepa en un mensaje. Devuelve las filas que quedaron y su texto; con una sola
+    fila que aún no cabe, su texto se corta por líneas.
+    """
+    elegidas = list(filas)
+    texto = render(elegidas)
+    while len(texto) > limite and len(elegidas) > 1:
+        elegidas = elegidas[1:] if desde_el_final else elegidas[:-1]
+        texto = render(elegidas)
+    if len(texto) > limite:
+        texto = cortar_en_linea(texto, limite)
+    return elegidas, texto
+
+def cortar_en_linea(texto: str, limite: int = MAX_MENSAJE) -> str:
+    marca = "\n…"
+    corte = texto.rfind("\n", 0, limite - len(marca))
+    return texto[:corte if corte > 0 else limite - len(marca)] + marca
+
+def teclado(anterior: Optional[str], siguiente: Optional[str]) -> Optional[InlineKeyboardMarkup]:
+    """Botones ◀️/▶️ con sus callback_data; None si no hay a dónde moverse."""
+    botones = []
+    if anterior:
+        botones.append(InlineKeyboardButton("◀️ Anterior", callback_data=anterior))
+    if siguiente:
+        botones.append(InlineKeyboardButton("Siguiente ▶️", callback_data=siguiente))
+    return InlineKeyboardMarkup([botones]) if botones else None
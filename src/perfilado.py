@@ -0,0 +1,83 @@
+# src/perfilado.py
+"""
+Perfilado bajo demanda de updates individuales con cProfile.
+Se activa con PERFILAR=1 (todos), PERFIL_MUESTREO (fracción al azar) o, si hay
+PERFIL_TOKEN, con la cabecera X-Perfilar: <token> en la petición al webhook.
+Cada perfil se guarda como {update_id}_{comando}.prof y su top-N va al log.
+Desactivado no cuesta más que una comparación por update.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CABECERA = "X-Perfilar"
+
+class Perfilador:
+    def __init__(self, siempre: bool, muestreo: float, token: Optional[str], directorio: str, top: int):
+        self.siempre = siempre
+        self.muestreo = muestreo
+        self.token = token
+        self.directorio = directorio
+        self.top = top
+        # cProfile engancha el hilo completo: un solo perfil a la vez en el ciclo del bot
+        self._ocupado = threading.Lock()
+        self.activo = siempre or muestreo > 0 or bool(token)
+
+    def pedido_por_cabecera(self, valor: Optional[str]) -> bool:
+        return bool(self.token) and valor == self.token
+
+    def toca(self, pedido: bool = False) -> bool:
+        if not self.activo:
+            return False
+        return pedido or self.siempre or (self.muestreo > 0 and random.random() < self.muestreo)
+
+    async def perfilar(self, update_id: Any, comando: str, ejecutar: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Ejecuta el update bajo cProfile. Mientras corre, el perfil también incluye lo que
+        hagan otros updates en el mismo ciclo; si ya hay uno en curso, este va sin perfil.
+        """
+        if not self._ocupado.acquire(blocking=False):
+            await ejecutar()
+            return
+
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+            try:
+                await ejecutar()
+            finally:
+                perfil.disable()
+        finally:
+            self._ocupado.release()
+        try:
+            await asyncio.to_thread(self._guardar, perfil, update_id, comando)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el perfil del update {update_id}: {e}")
+
+    def _guardar(self, perfil: cProfile.Profile, update_id: Any, comando: str) -> None:
+        os.makedirs(self.directorio, exist_ok=True)
+        nombre = re.sub(r'[^\w-]', '_', comando)
+        ruta = os.path.join(self.directorio, f"{update_id}_{nombre}.prof")
+        perfil.dump_stats(ruta)
+
+        salida = io.StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(self.top)
+        logger.info(f"Perfil de update {update_id} (/{comando}) guardado en {ruta}\n{salida.getvalue()}")
+
+perfilador = Perfilador(
+    siempre=settings.PERFILAR,
+    muestreo=settings.PERFIL_MUESTREO,
+    token=settings.PERFIL_TOKEN,
+    directorio=settings.PERFIL_DIR,
+    top=settings.PERFIL_TOP,
+)
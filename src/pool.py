@@ -0,0 +1,159 @@
+# src/pool.py
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from .config import settings
+from .metricas import contar_ida_supabase
+
+class EstadisticasPool:
+    """
+    Contadores de conexiones abiertas frente a reutilizadas.
+    Se alimentan del evento 'trace' de httpcore, así que no dependen de internals del pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.conexiones_abiertas = 0
+        self.peticiones = 0
+
+    def registrar(self, evento: str) -> None:
+        if evento == "connection.connect_tcp.complete":
+            with self._lock:
+                self.conexiones_abiertas += 1
+        elif evento.endswith(".send_request_headers.started"):
+            with self._lock:
+                self.peticiones += 1
+
+    def trace(self, evento: str, info: dict) -> None:
+        self.registrar(evento)
+
+    async def atrace(self, evento: str, info: dict) -> None:
+        self.registrar(evento)
+
+    @property
+    def conexiones_reutilizadas(self) -> int:
+        return max(self.peticiones - self.conexiones_abiertas, 0)
+
+    def como_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "peticiones": self.peticiones,
+                "conexiones_abiertas": self.conexiones_abiertas,
+                "conexiones_reutilizadas": self.conexiones_reutilizadas,
+            }
+
+class PoolSupabase:
+    """
+    Cliente PostgREST único con pool de conexiones keep-alive.
+    httpx.Client es seguro entre hilos y, al ser síncrono, no queda atado a ningún
+    ciclo de eventos: por eso puede compartirse en lugar de crear uno por consulta.
+    La variante asíncrona sí depende del ciclo, así que se mantiene un cliente por ciclo.
+    """
+
+    def __init__(self, url: str, key: str, tamano: int, timeout: float, keepalive: float):
+        self.url = url
+        self.key = key
+        self.tamano = tamano
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.stats = EstadisticasPool()
+        self._cliente: Optional[SyncPostgrestClient] = None
+        self._clientes_async = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apikey": self.key,
+            "Authorization": f"Bearer {self.key}",
+        }
+
+    def _limites(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.tamano,
+            max_keepalive_connections=self.tamano,
+            keepalive_expiry=self.keepalive,
+        )
+
+    def _instalar_trace(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self.stats.trace
+        contar_ida_supabase()
+
+    async def _instalar_atrace(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self.stats.atrace
+        contar_ida_supabase()
+
+    def cliente(self) -> SyncPostgrestClient:
+        """Devuelve el cliente compartido, creándolo la primera vez."""
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    http = httpx.Client(
+                        limits=self._limites(),
+                        timeout=self.timeout,
+                        follow_redirects=True,
+                        event_hooks={"request": [self._instalar_trace]},
+                    )
+                    self._cliente = SyncPostgrestClient(
+                        f"{self.url}/rest/v1", headers=self._headers(), http_client=http
+                    )
+        return self._cliente
+
+    def tabla(self, nombre: str):
+        return self.cliente().from_(nombre)
+
+    def rpc(self, funcion: str, params: Dict[str, Any]):
+        return self.cliente().rpc(funcion, params)
+
+    def cliente_async(self) -> AsyncPostgrestClient:
+        """Devuelve el cliente asíncrono del ciclo de eventos actual."""
+        loop = asyncio.get_running_loop()
+        cliente = self._clientes_async.get(loop)
+        if cliente is None:
+            http = httpx.AsyncClient(
+                limits=self._limites(),
+                timeout=self.timeout,
+                follow_redirects=True,
+                event_hooks={"request": [self._instalar_atrace]},
+            )
+            cliente = AsyncPostgrestClient(
+                f"{self.url}/rest/v1", headers=self._headers(), http_client=http
+            )
+            with self._lock:
+                self._clientes_async[loop] = cliente
+        return cliente
+
+    def tabla_async(self, nombre: str):
+        return self.cliente_async().from_(nombre)
+
+    def rpc_async(self, funcion: str, params: Dict[str, Any]):
+        return self.cliente_async().rpc(funcion, params)
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._cliente is not None:
+                self._cliente.aclose()
+                self._cliente = None
+
+    async def cerrar_async(self) -> None:
+        """Cierra el cliente asíncrono del ciclo actual (llamar desde ese ciclo)."""
+        with self._lock:
+            cliente = self._clientes_async.pop(asyncio.get_running_loop(), None)
+        if cliente is not None:
+            await cliente.aclose()
+
+    def estadisticas(self) -> Dict[str, int]:
+        return self.stats.como_dict()
+
+# Instancia global compartida por DatabaseManager
+pool = PoolSupabase(
+    settings.SUPABASE_URL,
+    settings.SUPABASE_KEY,
+    tamano=settings.SUPABASE_POOL_SIZE,
+    timeout=settings.SUPABASE_TIMEOUT,
+    keepalive=settings.SUPABASE_KEEPALIVE,
+)
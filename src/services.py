@@ -1,80 +1,96 @@
 # src/services.py
-from datetime import datetime, timedelta
-from typing import Tuple, Dict, Any, List
+from datetime import datetime
+from typing import Tuple, Dict, Any, List, Optional
 import random
-from .database import db
+from .database import adb
 
 class SpacedRepetitionService:
 
-    @staticmethod
-    def calcular_proxima_fecha(repasos_count: int, fecha_base: str) -> str:
-        intervalos = [3, 7, 30] 
-        idx = min(repasos_count - 1, 2)
-        dias_a_sumar = intervalos[idx]
-        fecha_obj = datetime.strptime(fecha_base, '%Y-%m-%d')
-        return (fecha_obj + timedelta(days=dias_a_sumar)).strftime('%Y-%m-%d')
-
     @classmethod
-    def procesar_estudio(cls, subtema_input: str) -> Tuple[str, Dict[str, Any]]:
+    async def procesar_estudio(cls, subtema_input: str) -> Tuple[str, Dict[str, Any]]:
         hoy = datetime.now().strftime('%Y-%m-%d')
 
-        # 1. Buscar en Repasos (Activos)
-        registro_repaso = db.buscar_repaso_especifico(subtema_input)
-        if registro_repaso:
-            cls._mover_a_historial(registro_repaso, hoy)
-            db.eliminar_por_id(registro_repaso["id"])
-            
-            count = registro_repaso.get("repasos_count", 0)
-            # Si no ha llegado a 4 repasos, se reprograma. Si llega a 4, ¿se domina o sigue?
-            # Asumiremos que sigue en ciclo hasta que usuario use /dominado
-            if count < 4:
-                nueva_fecha = cls.calcular_proxima_fecha(count, hoy) # Usamos hoy como base real
-                db.insertar_registro({
-                    "tipo": "repasar",
-                    "materia": registro_repaso["materia"],
-                    "tema": registro_repaso["tema"],
-                    "subtema": registro_repaso["subtema"],
-                    "fecha": nueva_fecha,
-                    "repasos_count": count + 1
-                })
-            return "Repaso completado", registro_repaso
-
-        # 2. Buscar en Pendientes
-        registro_pendiente = db.buscar_pendiente_especifico(subtema_input)
-        if registro_pendiente:
-            db.eliminar_por_id(registro_pendiente["id"])
-            cls._mover_a_historial(registro_pendiente, hoy)
-            
-            mañana = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-            db.insertar_registro({
-                "tipo": "repasar",
-                "materia": registro_pendiente["materia"],
-                "tema": registro_pendiente["tema"],
-                "subtema": registro_pendiente["subtema"],
-                "fecha": mañana,
-                "repasos_count": 1
-            })
-            return "Nuevo tema iniciado", registro_pendiente
-
-        raise ValueError("No encontrado (¿Ya dominado o mal escrito?)")
+        # Búsqueda, log, borrado y reprogramación ocurren en una sola transacción del servidor
+        resultado = await adb.procesar_estudio(subtema_input, hoy)
+        if not resultado:
+            raise ValueError("No encontrado (¿Ya dominado o mal escrito?)")
 
-    @staticmethod
-    def _mover_a_historial(row: Dict[str, Any], fecha: str) -> None:
-        # Solo guardamos el log de que se estudió hoy
-        db.insertar_registro({
-            "tipo": "estudiado",
-            "materia": row["materia"],
-            "tema": row["tema"],
-            "subtema": row["subtema"],
-            "fecha": fecha
-        })
+        anterior = resultado["anterior"]
+        if anterior["tipo"] == "repasar":
+            return "Repaso completado", anterior
+        return "Nuevo tema iniciado", anterior
+
+    @classmethod
+    async def procesar_estudio_lote(cls, subtemas: List[str]) -> List[Tuple[str, Optional[str], Optional[Dict[str, Any]]]]:
+        """
+        Procesa varios subtemas con una sola llamada al servidor.
+        Devuelve (subtema pedido, mensaje, registro anterior); mensaje y registro son None si no se encontró.
+        """
+        hoy = datetime.now().strftime('%Y-%m-%d')
+        resultados = await adb.procesar_estudio_lote(subtemas, hoy) if subtemas else []
+
+        salida = []
+        for r in resultados:
+            anterior = r["anterior"]
+            if not anterior:
+                salida.append((r["subtema"], None, None))
+            elif anterior["tipo"] == "repasar":
+                salida.append((r["subtema"], "Repaso completado", anterior))
+            else:
+                salida.append((r["subtema"], "Nuevo tema iniciado", anterior))
+        return salida
 
     @staticmethod
-    def sugerir_nuevos_temas(materia: str, cantidad: int) -> List[Dict[str, Any]]:
-        pendientes = db.obtener_pendientes_materia(materia)
+    async def sugerir_nuevos_temas(materia: str, cantidad: int) -> List[Dict[str, Any]]:
+        pendientes = await adb.obtener_pendientes_materia(materia)
         if not pendientes:
             return []
         
         # Selección aleatoria
         seleccion = random.sample(pendientes, min(len(pendientes), cantidad))
-        return seleccion
\ No newline at end of file
+        return seleccion
+
+class TemarioService:
+
+    @staticmethod
+    def parsear_temario(texto: str) -> Tuple[List[Tuple[str, str, str]], int, int]:
+        """
+        Separa las líneas Materia/Tema/Subtema del mensaje.
+        Devuelve (tripletas únicas en orden, repetidas dentro del texto, errores de formato).
+        """
+        lineas = [l.strip() for l in texto.strip().split('\n') if '/' in l]
+        vistos = {}
+        repetidos = 0
+        errores = 0
+
+        for linea in lineas:
+            partes = linea.split('/')
+            if len(partes) < 3:
+                errores += 1
+                continue
+
+            mat = partes[0].strip()
+            tem = partes[1].strip()
+            sub = "/".join(partes[2:]).strip()
+
+            if (mat, tem, sub) in vistos:
+                repetidos += 1
+            else:
+                vistos[(mat, tem, sub)] = True
+
+        return list(vistos), repetidos, errores
+
+    @classmethod
+    async def importar_temario(cls, texto: str) -> Tuple[int, int, int]:
+        """Importa un temario completo con una verificación y una inserción por lotes."""
+        triples, repetidos, errores = cls.parsear_temario(texto)
+        existentes = await adb.existen_subtemas(triples) if triples else set()
+
+        nuevos = [t for t in triples if t not in existentes]
+        if nuevos:
+            await adb.insertar_registros([
+                {"tipo": "pendiente", "materia": mat, "tema": tem, "subtema": sub}
+                for mat, tem, sub in nuevos
+            ])
+
+        return len(nuevos), repetidos + len(existentes), errores
@@ -0,0 +1,486 @@
+# src/sqlite_backend.py
+"""
+Backend local sobre SQLite con la misma interfaz que DatabaseManager.
+Sirve para correr y medir el bot sin un proyecto de Supabase y para despliegues
+de un solo usuario. El esquema replica el de sql/005 y sql/006 (estado, historial,
+resumen y contadores de progreso), y las RPC se reproducen en transacciones locales.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from .almacen import (
+    TABLA_ESTADO, TABLA_HISTORIAL, TABLA_RESUMEN, Tramo, Triple,
+    coincide_ilike, como_cronograma, escritura, lotes, separar_filas,
+)
+
+# SQLite limita los parámetros por sentencia (999 en versiones viejas)
+LOTE_PARAMETROS = 500
+
+COLUMNAS_ESTADO = ("id", "tipo", "materia", "tema", "subtema", "fecha", "repasos_count")
+COLUMNAS_HISTORIAL = ("id", "materia", "tema", "subtema", "fecha")
+
+ESQUEMA = f"""
+create table if not exists {TABLA_ESTADO} (
+    id             integer primary key autoincrement,
+    tipo           text    not null check (tipo in ('pendiente', 'repasar', 'dominado')),
+    materia        text    not null,
+    tema           text    not null,
+    subtema        text    not null,
+    fecha          text,
+    repasos_count  integer not null default 0,
+    unique (materia, tema, subtema)
+);
+create index if not exists estudios_estado_tipo_subtema on {TABLA_ESTADO} (tipo, subtema);
+create index if not exists estudios_estado_subtema_nocase on {TABLA_ESTADO} (subtema collate nocase, tipo);
+create index if not exists estudios_estado_materia on {TABLA_ESTADO} (materia);
+create index if not exists estudios_estado_tipo_fecha on {TABLA_ESTADO} (tipo, fecha);
+
+create table if not exists {TABLA_HISTORIAL} (
+    id       integer primary key autoincrement,
+    materia  text not null,
+    tema     text not null,
+    subtema  text not null,
+    fecha    text not null
+);
+create index if not exists estudios_historial_fecha on {TABLA_HISTORIAL} (fecha);
+create index if not exists estudios_historial_materia on {TABLA_HISTORIAL} (materia);
+create index if not exists estudios_historial_tripleta on {TABLA_HISTORIAL} (materia, tema, subtema, id);
+
+create table if not exists {TABLA_RESUMEN} (
+    fecha    text    not null,
+    materia  text    not null,
+    total    integer not null,
+    primary key (fecha, materia)
+);
+
+create table if not exists progreso (
+    materia  text    not null,
+    tipo     text    not null,
+    total    integer not null default 0,
+    primary key (materia, tipo)
+);
+
+-- Mismos contadores que los triggers de sql/004, aquí por fila
+create trigger if not exists progreso_insert after insert on {TABLA_ESTADO} begin
+    insert into progreso (materia, tipo, total) values (new.materia, new.tipo, 1)
+    on conflict (materia, tipo) do update set total = total + 1;
+end;
+create trigger if not exists progreso_delete after delete on {TABLA_ESTADO} begin
+    update progreso set total = total - 1 where materia = old.materia and tipo = old.tipo;
+end;
+create trigger if not exists progreso_update after update of materia, tipo on {TABLA_ESTADO} begin
+    update progreso set total = total - 1 where materia = old.materia and tipo = old.tipo;
+    insert into progreso (materia, tipo, total) values (new.materia, new.tipo, 1)
+    on conflict (materia, tipo) do update set total = total + 1;
+end;
+
+create view if not exists estudios_conteos as
+select materia, tipo, total from progreso where total > 0;
+"""
+
+def _marcadores(n: int) -> str:
+    return ", ".join("?" * n)
+
+# Filas 'h' del historial anteriores al corte que se pueden resumir: se conserva la última
+# de cada subtema que ya salió del estado, que es lo único que prueba que existió
+# (ver existe_subtema y sql/010_compactar_conserva_graduados.sql)
+COMPACTABLE = f"""h.fecha < ? and (
+    exists (select 1 from {TABLA_ESTADO} e
+             where e.materia = h.materia and e.tema = h.tema and e.subtema = h.subtema)
+    or exists (select 1 from {TABLA_HISTORIAL} h2
+                where h2.materia = h.materia and h2.tema = h.tema and h2.subtema = h.subtema and h2.id > h.id)
+)"""
+
+def _buscar_subtema(conn: sqlite3.Connection, tipos: str, patron: str) -> Optional[sqlite3.Row]:
+    """
+    Primera fila activa cuyo subtema cumple 'subtema ilike patron' (repasos antes que
+    pendientes, luego por id). Sin comodines se compara con collate nocase, que usa el
+    índice estudios_estado_subtema_nocase; NOCASE solo pliega ASCII, así que un nombre con
+    tildes o ñ que no aparece así pasa por ilike(), que recorre el estado.
+    """
+    orden = "order by (tipo <> 'repasar'), id limit 1"
+    if "%" not in patron and "_" not in patron:
+        fila = conn.execute(
+            f"select * from {TABLA_ESTADO} where tipo in ({tipos}) and subtema = ? collate nocase {orden}", (patron,)
+        ).fetchone()
+        if fila is not None or patron.isascii():
+            return fila
+    return conn.execute(
+        f"select * from {TABLA_ESTADO} where tipo in ({tipos}) and ilike(?, subtema) {orden}", (patron,)
+    ).fetchone()
+
+class SQLiteDatabaseManager:
+    """
+    Implementación síncrona de DatabaseManager sobre un archivo SQLite (o ':memory:').
+    Usa una sola conexión compartida entre hilos y serializada con un lock; las
+    lecturas concurrentes no ganan nada con más conexiones a este tamaño de datos.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.RLock()
+        self._consultas = 0
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function("ilike", 2, coincide_ilike, deterministic=True)
+        self._conn.execute("pragma journal_mode = wal")
+        self._conn.execute("pragma synchronous = normal")
+        self._conn.executescript(ESQUEMA)
+
+    @contextmanager
+    def _transaccion(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._consultas += 1
+            self._conn.execute("begin immediate")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+            self._conn.execute("commit")
+
+    def _leer(self, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._consultas += 1
+            return [dict(r) for r in self._conn.execute(sql, tuple(params))]
+
+    def estadisticas_pool(self) -> Dict[str, int]:
+        # Una sola conexión persistente: toda consulta después de la primera la reutiliza
+        return {
+            "peticiones": self._consultas,
+            "conexiones_abiertas": 1,
+            "conexiones_reutilizadas": max(self._consultas - 1, 0),
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def aplicar_cambios(self, estado: List[Dict[str, Any]], historial: List[Dict[str, Any]],
+                        resumen: List[Dict[str, Any]], borrados: List[Dict[str, Any]]) -> int:
+        """
+        Aplica filas tal como vienen de otra base (con su id) y sus lápidas, en una transacción.
+        Lo usa EspejoLocal; los contadores de progreso se ajustan solos por los triggers.
+        Devuelve cuántas filas se aplicaron.
+        """
+        with self._transaccion() as conn:
+            for b in borrados:
+                if b["tabla"] == TABLA_RESUMEN:
+                    conn.execute(f"delete from {TABLA_RESUMEN} where fecha = ? and materia = ?", (b["fecha"], b["materia"]))
+                elif b["tabla"] in (TABLA_ESTADO, TABLA_HISTORIAL):
+                    conn.execute(f"delete from {b['tabla']} where id = ?", (b["fila_id"],))
+
+            # Borrar y volver a insertar: así los triggers ven el cambio de tipo y una
+            # fila recreada con otro id no choca con la versión vieja del mismo subtema
+            for f in estado:
+                conn.execute(
+                    f"delete from {TABLA_ESTADO} where id = ? or (materia = ? and tema = ? and subtema = ?)",
+                    (f["id"], f["materia"], f["tema"], f["subtema"]),
+                )
+            conn.executemany(
+                f"insert into {TABLA_ESTADO} ({', '.join(COLUMNAS_ESTADO)}) values ({_marcadores(len(COLUMNAS_ESTADO))})",
+                [tuple(f.get(c) for c in COLUMNAS_ESTADO) for f in estado],
+            )
+            conn.executemany(
+                f"insert or ignore into {TABLA_HISTORIAL} ({', '.join(COLUMNAS_HISTORIAL)}) "
+                f"values ({_marcadores(len(COLUMNAS_HISTORIAL))})",
+                [tuple(f[c] for c in COLUMNAS_HISTORIAL) for f in historial],
+            )
+            conn.executemany(
+                f"""insert into {TABLA_RESUMEN} (fecha, materia, total) values (?, ?, ?)
+                    on conflict (fecha, materia) do update set total = excluded.total""",
+                [(f["fecha"], f["materia"], f["total"]) for f in resumen],
+            )
+        return len(estado) + len(historial) + len(resumen) + len(borrados)
+
+    # --- Verificaciones ---
+    def existe_subtema(self, materia: str, tema: str, subtema: str) -> bool:
+        # Un subtema que ya completó su ciclo solo queda en el historial
+        for tabla in (TABLA_ESTADO, TABLA_HISTORIAL):
+            filas = self._leer(
+                f"select 1 from {tabla} where materia = ? and tema = ? and subtema = ? limit 1",
+                (materia, tema, subtema),
+            )
+            if filas:
+                return True
+        return False
+
+    def existen_subtemas(self, triples: Iterable[Triple]) -> Set[Triple]:
+        """Devuelve cuáles de las tripletas (materia, tema, subtema) ya existen, en pocas consultas."""
+        buscados = set(triples)
+        subtemas = sorted({t[2] for t in buscados})
+        existentes = set()
+        for lote in lotes(subtemas, LOTE_PARAMETROS):
+            for tabla in (TABLA_ESTADO, TABLA_HISTORIAL):
+                filas = self._leer(
+                    f"select materia, tema, subtema from {tabla} where subtema in ({_marcadores(len(lote))})", lote
+                )
+                existentes.update((r['materia'], r['tema'], r['subtema']) for r in filas)
+        return existentes & buscados
+
+    # --- Inserción / Actualización ---
+    @escritura
+    def insertar_registro(self, data: Dict[str, Any]) -> None:
+        self.insertar_registros([data])
+
+    @escritura
+    def insertar_registros(self, filas: List[Dict[str, Any]]) -> None:
+        """Inserción multi-fila; cada fila va al almacén que le corresponde. Duplicados en el estado se ignoran."""
+        estado, historial = separar_filas(filas)
+        with self._transaccion() as conn:
+            for tabla, columnas_validas, grupo, sufijo in (
+                (TABLA_ESTADO, COLUMNAS_ESTADO, estado, " on conflict (materia, tema, subtema) do nothing"),
+                (TABLA_HISTORIAL, COLUMNAS_HISTORIAL, historial, ""),
+            ):
+                # Las columnas ausentes toman su valor por defecto, como default_to_null=False
+                por_columnas: Dict[tuple, List[tuple]] = {}
+                for f in grupo:
+                    columnas = tuple(c for c in columnas_validas if c in f)
+                    por_columnas.setdefault(columnas, []).append(tuple(f[c] for c in columnas))
+                for columnas, valores in por_columnas.items():
+                    conn.executemany(
+                        f"insert into {tabla} ({', '.join(columnas)}) values ({_marcadores(len(columnas))}){sufijo}",
+                        valores,
+                    )
+
+    @escritura
+    def marcar_como_dominado(self, subtema: str) -> bool:
+        return subtema in self.marcar_dominados([subtema])
+
+    @escritura
+    def marcar_dominados(self, subtemas: List[str]) -> Set[str]:
+        """Marca varios subtemas como dominados con una sola actualización en el estado."""
+        subtemas = list(dict.fromkeys(subtemas))
+        if not subtemas:
+            return set()
+
+        hoy = date.today().isoformat()
+        marcados = set()
+        with self._transaccion() as conn:
+            for lote in lotes(subtemas, LOTE_PARAMETROS):
+                # Un subtema ya dominado no se vuelve a fechar
+                filtro = f"subtema in ({_marcadores(len(lote))}) and tipo in ('pendiente', 'repasar')"
+                marcados.update(r['subtema'] for r in conn.execute(
+                    f"select subtema from {TABLA_ESTADO} where {filtro}", lote
+                ))
+                conn.execute(f"update {TABLA_ESTADO} set tipo = 'dominado', fecha = ? where {filtro}", (hoy, *lote))
+        return marcados
+
+    @escritura
+    def procesar_estudio(self, subtema: str, hoy: str) -> Optional[Dict[str, Any]]:
+        """
+        Transición de estudio atómica (equivalente a la RPC 'procesar_estudio').
+        Devuelve {'anterior': fila, 'nuevo': fila | None} o None si no existe.
+        """
+        r = self.procesar_estudio_lote([subtema], hoy)[0]
+        return {"anterior": r["anterior"], "nuevo": r["nuevo"]} if r["anterior"] else None
+
+    @escritura
+    def procesar_estudio_lote(self, subtemas: List[str], hoy: str) -> List[Dict[str, Any]]:
+        """
+        Versión por lotes (equivalente a la RPC 'procesar_estudio_lote'): una entrada por
+        nombre pedido, {'subtema', 'anterior', 'nuevo'}, con 'anterior' en None si no se encontró.
+        """
+        with self._transaccion() as conn:
+            # Todas las elecciones se hacen sobre el estado previo, como en la CTE de Postgres
+            elegidos = []
+            for subtema in subtemas:
+                fila = _buscar_subtema(conn, "'repasar', 'pendiente'", subtema)
+                elegidos.append(dict(fila) if fila else None)
+
+            anteriores = list({a["id"]: a for a in elegidos if a}.values())
+            ids = [a["id"] for a in anteriores]
+            nuevos: Dict[int, Dict[str, Any]] = {}
+            if ids:
+                conn.executemany(
+                    f"insert into {TABLA_HISTORIAL} (materia, tema, subtema, fecha) values (?, ?, ?, ?)",
+                    [(a["materia"], a["tema"], a["subtema"], hoy) for a in anteriores],
+                )
+                for lote in lotes(ids, LOTE_PARAMETROS):
+                    filtro = f"id in ({_marcadores(len(lote))})"
+                    # Repasos que ya cumplieron su ciclo salen del estado
+                    conn.execute(
+                        f"delete from {TABLA_ESTADO} where {filtro} and tipo = 'repasar' and repasos_count >= 4", lote
+                    )
+                    # Mismos intervalos que la RPC (sql/005_estado_e_historial.sql)
+                    conn.execute(
+                        f"""update {TABLA_ESTADO}
+                               set tipo = 'repasar',
+                                   fecha = date(?, '+' || case
+                                       when tipo = 'pendiente' then 1
+                                       when repasos_count = 1 then 3
+                                       when repasos_count = 2 then 7
+                                       else 30
+                                   end || ' days'),
+                                   repasos_count = case when tipo = 'pendiente' then 1 else repasos_count + 1 end
+                             where {filtro}""",
+                        (hoy, *lote),
+                    )
+                    nuevos.update((r["id"], dict(r)) for r in conn.execute(
+                        f"select * from {TABLA_ESTADO} where {filtro}", lote
+                    ))
+
+        return [
+            {"subtema": s, "anterior": a, "nuevo": nuevos.get(a["id"]) if a else None}
+            for s, a in zip(subtemas, elegidos)
+        ]
+
+    @escritura
+    def eliminar_por_id(self, registro_id: int) -> None:
+        with self._transaccion() as conn:
+            conn.execute(f"delete from {TABLA_ESTADO} where id = ?", (registro_id,))
+
+    @escritura
+    def eliminar_por_campo(self, campo: str, valor: str) -> None:
+        # El nombre de columna no puede ir como parámetro: solo se aceptan columnas conocidas
+        if campo not in COLUMNAS_ESTADO:
+            raise ValueError(f"Campo desconocido: {campo}")
+        with self._transaccion() as conn:
+            conn.execute(f"delete from {TABLA_ESTADO} where {campo} = ?", (valor,))
+            if campo in COLUMNAS_HISTORIAL:
+                conn.execute(f"delete from {TABLA_HISTORIAL} where {campo} = ?", (valor,))
+            if campo == "materia":
+                conn.execute(f"delete from {TABLA_RESUMEN} where materia = ?", (valor,))
+
+    @escritura
+    def compactar_historial(self, dias_detalle: int, simular: bool = True) -> Dict[str, Any]:
+        """
+        Resume por (día, materia) el historial anterior a 'dias_detalle' días (como la RPC 'compactar_historial').
+        Con simular=True solo calcula el reporte: filas_eliminadas, filas_resumen, bytes_liberados.
+        """
+        corte = (date.today() - timedelta(days=dias_detalle)).isoformat()
+        with self._transaccion() as conn:
+            # SQLite no expone el tamaño en disco de una fila: se aproxima con el de sus valores
+            filas, bytes_detalle = conn.execute(
+                f"""select count(*), coalesce(sum(8 + length(materia) + length(tema) + length(subtema) + length(fecha)), 0)
+                      from {TABLA_HISTORIAL} h where {COMPACTABLE}""",
+                (corte,),
+            ).fetchone()
+            resumen, bytes_resumen = conn.execute(
+                f"""select count(*), coalesce(sum(4 + length(fecha) + length(materia)), 0)
+                      from (select distinct fecha, materia from {TABLA_HISTORIAL} h where {COMPACTABLE})""",
+                (corte,),
+            ).fetchone()
+
+            if not simular:
+                conn.execute(
+                    f"""insert into {TABLA_RESUMEN} (fecha, materia, total)
+                        select fecha, materia, count(*) from {TABLA_HISTORIAL} h where {COMPACTABLE} group by fecha, materia
+                        on conflict (fecha, materia) do update set total = total + excluded.total""",
+                    (corte,),
+                )
+                conn.execute(f"delete from {TABLA_HISTORIAL} as h where {COMPACTABLE}", (corte,))
+
+        return {
+            "corte": corte,
+            "simulado": simular,
+            "filas_eliminadas": filas,
+            "filas_resumen": resumen,
+            "bytes_liberados": max(bytes_detalle - bytes_resumen, 0),
+        }
+
+    # --- Consultas ---
+    def obtener_pendientes_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return self._leer(f"select * from {TABLA_ESTADO} where tipo = 'pendiente' and materia = ?", (materia,))
+
+    def obtener_pendientes(self) -> List[Dict[str, Any]]:
+        return self._leer(f"select * from {TABLA_ESTADO} where tipo = 'pendiente'")
+
+    def obtener_repasos_para_fecha(self, fecha_limite: str) -> List[Dict[str, Any]]:
+        return self._leer(
+            f"select * from {TABLA_ESTADO} where tipo = 'repasar' and fecha <= ? order by fecha, id", (fecha_limite,)
+        )
+
+    def buscar_repaso_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._consultas += 1
+            fila = _buscar_subtema(self._conn, "'repasar'", subtema)
+        return dict(fila) if fila else None
+
+    def buscar_pendiente_especifico(self, subtema: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._consultas += 1
+            fila = _buscar_subtema(self._conn, "'pendiente'", subtema)
+        return dict(fila) if fila else None
+
+    # --- Métricas ---
+    def obtener_todos_registros(self) -> List[Dict[str, Any]]:
+        return self._leer(f"select materia, tema, subtema, tipo from {TABLA_ESTADO}")
+
+    def obtener_conteos(self) -> List[Dict[str, Any]]:
+        """Filas {materia, tipo, total} de los contadores mantenidos por triggers (vista estudios_conteos)."""
+        return self._leer("select materia, tipo, total from estudios_conteos order by materia")
+
+    @escritura
+    def reconciliar_progreso(self, aplicar: bool = True) -> List[Dict[str, Any]]:
+        """Recalcula los contadores desde la tabla base; devuelve los desvíos {materia, tipo, esperado, registrado}."""
+        with self._transaccion() as conn:
+            desvios = [dict(r) for r in conn.execute(
+                f"""with reales as (
+                        select materia, tipo, count(*) as total from {TABLA_ESTADO} group by materia, tipo
+                    ),
+                    claves as (
+                        select materia, tipo from reales union select materia, tipo from progreso
+                    )
+                    select c.materia, c.tipo,
+                           coalesce(r.total, 0) as esperado, coalesce(p.total, 0) as registrado
+                      from claves c
+                      left join reales r on r.materia = c.materia and r.tipo = c.tipo
+                      left join progreso p on p.materia = c.materia and p.tipo = c.tipo
+                     where coalesce(r.total, 0) <> coalesce(p.total, 0)"""
+            )]
+            if aplicar:
+                conn.execute("delete from progreso")
+                conn.execute(
+                    f"insert into progreso (materia, tipo, total) "
+                    f"select materia, tipo, count(*) from {TABLA_ESTADO} group by materia, tipo"
+                )
+        return desvios
+
+    def obtener_materias_unicas(self) -> List[str]:
+        return sorted(set(c['materia'] for c in self.obtener_conteos()))
+
+    def obtener_detalle_materia(self, materia: str) -> List[Dict[str, Any]]:
+        return self._leer(f"select * from {TABLA_ESTADO} where materia = ?", (materia,))
+
+    def obtener_cronograma_completo(self) -> List[Dict[str, Any]]:
+        """Obtiene tanto lo estudiado (pasado) como lo programado (futuro)"""
+        resumen = self._leer(f"select * from {TABLA_RESUMEN} order by fecha")
+        historial = self._leer(f"select * from {TABLA_HISTORIAL} order by fecha")
+        repasos = self._leer(f"select * from {TABLA_ESTADO} where tipo = 'repasar' order by fecha")
+        return como_cronograma(resumen, historial, repasos)
+
+    def obtener_temario_pagina(self, materia: str, desde: int, limite: int) -> List[Dict[str, Any]]:
+        """Filas de la materia ordenadas por (tema, subtema), de la 'desde' en adelante."""
+        return self._leer(
+            f"select * from {TABLA_ESTADO} where materia = ? order by tema, subtema limit ? offset ?",
+            (materia, limite, desde),
+        )
+
+    def obtener_cronograma(self, desde: Optional[str], hasta: Optional[str],
+                           cursor: Tramo = (0, 0, 0), limite: int = 100) -> List[Dict[str, Any]]:
+        """
+        Eventos con fecha entre 'desde' y 'hasta' (inclusive; None = sin límite), hasta
+        'limite' por fuente a partir de la posición 'cursor' (ver Tramo).
+        """
+        condiciones, params = [], []
+        if desde:
+            condiciones.append("fecha >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append("fecha <= ?")
+            params.append(hasta)
+        ventana = "".join(f" and {c}" for c in condiciones)
+        consultas = (
+            f"select * from {TABLA_RESUMEN} where 1{ventana} order by fecha, materia",
+            f"select * from {TABLA_HISTORIAL} where 1{ventana} order by fecha, id",
+            # En SQLite los NULL van primero al ordenar ascendente, como nullsfirst en Supabase
+            f"select * from {TABLA_ESTADO} where tipo = 'repasar'{ventana} order by fecha, id",
+        )
+        resumen, historial, repasos = (
+            self._leer(f"{sql} limit ? offset ?", (*params, limite, d)) for sql, d in zip(consultas, cursor)
+        )
+        return como_cronograma(resumen, historial, repasos)
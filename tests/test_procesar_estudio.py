@@ -0,0 +1,111 @@
+# tests/test_procesar_estudio.py
+"""
+Transición de estudio de SQLiteDatabaseManager, el equivalente en proceso de las RPC
+procesar_estudio y procesar_estudio_lote de sql/005_estado_e_historial.sql.
+Correr desde la raíz del repo: python -m pytest -q
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from src.almacen import TABLA_ESTADO, TABLA_HISTORIAL
+from src.sqlite_backend import SQLiteDatabaseManager
+
+HOY = "2026-01-10"
+
+@pytest.fixture
+def db():
+    base = SQLiteDatabaseManager(":memory:")
+    base.insertar_registros([
+        {"tipo": "pendiente", "materia": "Matemática", "tema": "Álgebra", "subtema": "Matrices"},
+        {"tipo": "pendiente", "materia": "Matemática", "tema": "Álgebra", "subtema": "Determinantes"},
+        {"tipo": "repasar", "materia": "Física", "tema": "Óptica", "subtema": "Lentes",
+         "fecha": "2026-01-09", "repasos_count": 1},
+    ])
+    yield base
+    base._conn.close()
+
+def _estado(db, subtema):
+    filas = db._leer(f"select * from {TABLA_ESTADO} where subtema = ?", (subtema,))
+    return filas[0] if filas else None
+
+def _historial(db):
+    return db._leer(f"select materia, tema, subtema, fecha from {TABLA_HISTORIAL} order by id")
+
+def test_pendiente_pasa_a_repasar_manana(db):
+    r = db.procesar_estudio("Matrices", HOY)
+
+    assert r["anterior"]["tipo"] == "pendiente"
+    assert (r["nuevo"]["tipo"], r["nuevo"]["fecha"], r["nuevo"]["repasos_count"]) == ("repasar", "2026-01-11", 1)
+    assert _estado(db, "Matrices")["id"] == r["anterior"]["id"]
+    assert _historial(db) == [{"materia": "Matemática", "tema": "Álgebra", "subtema": "Matrices", "fecha": HOY}]
+
+@pytest.mark.parametrize("repasos, dias", [(1, 3), (2, 7), (3, 30)])
+def test_intervalos_de_repaso(db, repasos, dias):
+    db._conn.execute(f"update {TABLA_ESTADO} set repasos_count = ? where subtema = 'Lentes'", (repasos,))
+
+    r = db.procesar_estudio("Lentes", HOY)
+
+    assert r["nuevo"]["tipo"] == "repasar"
+    assert r["nuevo"]["repasos_count"] == repasos + 1
+    assert r["nuevo"]["fecha"] == (date.fromisoformat(HOY) + timedelta(days=dias)).isoformat()
+
+def test_cuarto_repaso_gradua_y_sale_del_estado(db):
+    fechas = []
+    for _ in range(4):
+        r = db.procesar_estudio("Matrices", HOY)
+        fechas.append(r["nuevo"]["fecha"])
+
+    assert fechas == ["2026-01-11", "2026-01-13", "2026-01-17", "2026-02-09"]
+    r = db.procesar_estudio("Matrices", HOY)
+    assert r["anterior"]["repasos_count"] == 4
+    assert r["nuevo"] is None
+    assert _estado(db, "Matrices") is None
+    assert len(_historial(db)) == 5
+    # El historial sigue probando que el subtema existió
+    assert db.existe_subtema("Matemática", "Álgebra", "Matrices")
+    assert db.procesar_estudio("Matrices", HOY) is None
+
+def test_nombres_sin_distinguir_mayusculas(db):
+    assert db.procesar_estudio("mATRICES", HOY)["anterior"]["subtema"] == "Matrices"
+    assert db.procesar_estudio("lentes", HOY)["anterior"]["subtema"] == "Lentes"
+    # ILIKE pliega también las letras acentuadas
+    db.insertar_registro({"tipo": "pendiente", "materia": "Física", "tema": "Óptica", "subtema": "Óptica geométrica"})
+    assert db.procesar_estudio("óPTICA GEOMÉTRICA", HOY)["anterior"]["subtema"] == "Óptica geométrica"
+
+def test_comodines_como_ilike(db):
+    r = db.procesar_estudio("Deter%", HOY)
+    assert r["anterior"]["subtema"] == "Determinantes"
+
+def test_repaso_antes_que_pendiente(db):
+    db.insertar_registro({"tipo": "pendiente", "materia": "Química", "tema": "Óptica", "subtema": "lentes"})
+
+    r = db.procesar_estudio("LENTES", HOY)
+
+    assert (r["anterior"]["materia"], r["anterior"]["tipo"]) == ("Física", "repasar")
+
+def test_lote_con_nombres_repetidos_procesa_una_vez(db):
+    resultados = db.procesar_estudio_lote(["Matrices", "matrices", "Lentes"], HOY)
+
+    assert [r["subtema"] for r in resultados] == ["Matrices", "matrices", "Lentes"]
+    assert resultados[0]["anterior"]["id"] == resultados[1]["anterior"]["id"]
+    # Ambas entradas ven el mismo estado previo y el mismo resultado
+    assert resultados[0]["anterior"]["tipo"] == resultados[1]["anterior"]["tipo"] == "pendiente"
+    assert resultados[0]["nuevo"] == resultados[1]["nuevo"]
+    assert _estado(db, "Matrices")["repasos_count"] == 1
+    assert [h["subtema"] for h in _historial(db)] == ["Matrices", "Lentes"]
+
+def test_nombres_desconocidos(db):
+    resultados = db.procesar_estudio_lote(["No existe", "Matrices"], HOY)
+
+    assert resultados[0] == {"subtema": "No existe", "anterior": None, "nuevo": None}
+    assert resultados[1]["nuevo"]["tipo"] == "repasar"
+    assert db.procesar_estudio("No existe", HOY) is None
+    assert [h["subtema"] for h in _historial(db)] == ["Matrices"]
+
+def test_dominados_no_se_estudian(db):
+    db.marcar_dominados(["Determinantes"])
+
+    assert db.procesar_estudio("Determinantes", HOY) is None
+    assert _estado(db, "Determinantes")["tipo"] == "dominado"
+    assert _historial(db) == []